@@ -10,19 +10,42 @@ import ast
 import subprocess
 import platform
 import keyword
+import signal
+import textwrap
+import time
+import hashlib
+import threading
+import linecache
+import io
+import codecs
+import json
+import tokenize
+import sqlite3
+import multiprocessing
+import shutil
+import tempfile
+from bisect import bisect_left, bisect_right, insort
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+from heapq import nlargest, nsmallest
+from math import log1p
+from types import MappingProxyType
 from typing import List, Dict, Optional, Tuple, Any, Set
 
 from PyQt5.QtCore import (
-    QObject, Qt, QThread, pyqtSignal, QTimer, QSettings, QRect,
-    QProcess, QStringListModel, QSize, QPoint, QProcessEnvironment
+    QObject, Qt, QThread, pyqtSignal, pyqtSlot, QTimer, QSettings, QRect,
+    QProcess, QStringListModel, QSize, QPoint, QProcessEnvironment,
+    QAbstractItemModel, QAbstractListModel, QModelIndex, QPersistentModelIndex,
+    QStandardPaths
 )
 from PyQt5.QtWidgets import (
 QApplication, QMainWindow, QWidget, QVBoxLayout, QHBoxLayout,
-QSplitter, QTreeWidget, QTreeWidgetItem, QComboBox,
+QSplitter, QTreeView, QListView, QComboBox,
 QToolBar, QAction, QFileDialog, QMessageBox, QTabWidget,
 QLabel, QPushButton, QLineEdit, QDialog, QDialogButtonBox,
 QCheckBox, QGroupBox, QGridLayout, QPlainTextEdit,
-QStatusBar, QProgressBar, QMenu, QListWidget,
+QStatusBar, QProgressBar, QMenu, QListWidget, QListWidgetItem,
 QCompleter, QTextBrowser, QColorDialog, QFontDialog,
 QInputDialog, QTextEdit
 )
@@ -36,16 +59,76 @@ from PyQt5.QtGui import (
 # Syntax Highlighter
 # =============================
 
-class PythonSyntaxHighlighter(QSyntaxHighlighter):
-    """Advanced Python syntax highlighter with multiple themes"""
+class HighlightRuleSet:
+    """Immutable formats for one theme, built once and shared by every highlighter"""
+
+    PALETTES = {
+        'dark': {
+            'keyword': (86, 156, 214),
+            'builtin': (220, 220, 170),
+            'string': (206, 145, 120),
+            'number': (181, 206, 168),
+            'comment': (106, 153, 85),
+            'function': (220, 220, 170),
+            'class': (78, 201, 176),
+            'operator': (212, 212, 212),
+            'decorator': (255, 198, 109),
+            'self': (148, 161, 255),
+            'escape': (215, 186, 125),
+            'parameter': (156, 220, 254),
+            'local': (156, 220, 254),
+            'attribute': (190, 200, 215),
+            'module': (86, 182, 194),
+        },
+        'light': {
+            'keyword': (0, 0, 255),
+            'builtin': (128, 0, 128),
+            'string': (163, 21, 21),
+            'number': (9, 134, 88),
+            'comment': (0, 128, 0),
+            'function': (128, 0, 128),
+            'class': (0, 128, 128),
+            'operator': (0, 0, 0),
+            'decorator': (128, 128, 0),
+            'self': (0, 0, 255),
+            'escape': (238, 0, 0),
+            'parameter': (0, 16, 128),
+            'local': (0, 16, 128),
+            'attribute': (121, 94, 38),
+            'module': (38, 127, 153),
+        },
+    }
+    # kind -> (bold, italic)
+    STYLES = {
+        'keyword': (True, False), 'self': (True, False), 'comment': (False, True),
+        'function': (True, False), 'class': (True, False), 'parameter': (False, True),
+    }
+
+    _cache: Dict[str, 'HighlightRuleSet'] = {}
+
+    __slots__ = ('theme', 'formats', 'name_formats')
+
+    def __init__(self, theme: str):
+        palette = self.PALETTES['dark'] if theme == 'dark' else self.PALETTES['light']
+        formats = {}
+        for kind, rgb in palette.items():
+            bold, italic = self.STYLES.get(kind, (False, False))
+            formats[kind] = self._make_format(QColor(*rgb), bold, italic)
+
+        # Identifiers are classified with a dict lookup instead of one regex per word
+        name_formats = {}
+        for b in PythonSyntaxHighlighter.BUILTINS:
+            name_formats[b] = formats['builtin']
+        for word in PythonSyntaxHighlighter.KEYWORDS:
+            name_formats[word] = formats['keyword']
+        name_formats['self'] = formats['self']
 
-    def __init__(self, parent=None, theme="dark"):
-        super().__init__(parent)
         self.theme = theme
-        self.highlighting_rules: List[Tuple[re.Pattern, QTextCharFormat]] = []
-        self.setup_highlighting_rules()
+        self.formats = MappingProxyType(formats)
+        self.name_formats = MappingProxyType(name_formats)
 
-    def _make_format(self, color: QColor, bold=False, italic=False) -> QTextCharFormat:
+    @staticmethod
+    def _make_format(color: QColor, bold=False, italic=False) -> QTextCharFormat:
         f = QTextCharFormat()
         f.setForeground(QBrush(color))
         if bold:
@@ -54,142 +137,280 @@ class PythonSyntaxHighlighter(QSyntaxHighlighter):
             f.setFontItalic(True)
         return f
 
-    def setup_highlighting_rules(self):
-        """Setup highlighting rules based on theme"""
-        self.highlighting_rules = []
-
-        if self.theme == "dark":
-            colors = {
-                'keyword': QColor(86, 156, 214),
-                'builtin': QColor(220, 220, 170),
-                'string': QColor(206, 145, 120),
-                'number': QColor(181, 206, 168),
-                'comment': QColor(106, 153, 85),
-                'function': QColor(220, 220, 170),
-                'class': QColor(78, 201, 176),
-                'operator': QColor(212, 212, 212),
-                'decorator': QColor(255, 198, 109),
-                'self': QColor(148, 161, 255),
-            }
-        else:
-            colors = {
-                'keyword': QColor(0, 0, 255),
-                'builtin': QColor(128, 0, 128),
-                'string': QColor(163, 21, 21),
-                'number': QColor(9, 134, 88),
-                'comment': QColor(0, 128, 0),
-                'function': QColor(128, 0, 128),
-                'class': QColor(0, 128, 128),
-                'operator': QColor(0, 0, 0),
-                'decorator': QColor(128, 128, 0),
-                'self': QColor(0, 0, 255),
-            }
-
-        # Keywords
-        keyword_format = self._make_format(colors['keyword'], bold=True)
-        python_keywords = sorted(set(keyword.kwlist + ['True', 'False', 'None']))
-        for word in python_keywords:
-            pattern = re.compile(r'\b' + re.escape(word) + r'\b')
-            self.highlighting_rules.append((pattern, keyword_format))
-
-        # Builtins
-        builtin_format = self._make_format(colors['builtin'])
-        builtins_list = [
-            'abs', 'all', 'any', 'bin', 'bool', 'bytearray', 'bytes', 'callable',
-            'chr', 'classmethod', 'compile', 'complex', 'delattr', 'dict', 'dir',
-            'divmod', 'enumerate', 'eval', 'exec', 'filter', 'float', 'format',
-            'frozenset', 'getattr', 'globals', 'hasattr', 'hash', 'help', 'hex',
-            'id', 'input', 'int', 'isinstance', 'issubclass', 'iter', 'len',
-            'list', 'locals', 'map', 'max', 'memoryview', 'min', 'next', 'object',
-            'oct', 'open', 'ord', 'pow', 'print', 'property', 'range', 'repr',
-            'reversed', 'round', 'set', 'setattr', 'slice', 'sorted', 'staticmethod',
-            'str', 'sum', 'super', 'tuple', 'type', 'vars', 'zip', '__import__'
-        ]
-        for b in builtins_list:
-            self.highlighting_rules.append((re.compile(r'\b' + re.escape(b) + r'\b'), builtin_format))
-
-        # self
-        self_format = self._make_format(colors['self'], bold=True)
-        self.highlighting_rules.append((re.compile(r'\bself\b'), self_format))
-
-        # Strings (single-line)
-        string_format = self._make_format(colors['string'])
-        self.highlighting_rules.append((re.compile(r'"([^"\\\n]|\\.)*"'), string_format))
-        self.highlighting_rules.append((re.compile(r"'([^'\\\n]|\\.)*'"), string_format))
-        self.highlighting_rules.append((re.compile(r'r"([^"\\\n]|\\.)*"'), string_format))
-        self.highlighting_rules.append((re.compile(r"r'([^'\\\n]|\\.)*'"), string_format))
-        self.highlighting_rules.append((re.compile(r'R"([^"\\\n]|\\.)*"'), string_format))
-        self.highlighting_rules.append((re.compile(r"R'([^'\\\n]|\\.)*'"), string_format))
-        self.highlighting_rules.append((re.compile(r'f"([^"\\\n]|\\.)*"'), string_format))
-        self.highlighting_rules.append((re.compile(r"f'([^'\\\n]|\\.)*'"), string_format))
-        self.highlighting_rules.append((re.compile(r'F"([^"\\\n]|\\.)*"'), string_format))
-        self.highlighting_rules.append((re.compile(r"F'([^'\\\n]|\\.)*'"), string_format))
-
-        # Numbers
-        number_format = self._make_format(colors['number'])
-        self.highlighting_rules.append((re.compile(r'\b\d+\.?\d*([eE][+-]?\d+)?\b'), number_format))
-        self.highlighting_rules.append((re.compile(r'\b0[xX][0-9a-fA-F]+\b'), number_format))
-        self.highlighting_rules.append((re.compile(r'\b0[bB][01]+\b'), number_format))
-        self.highlighting_rules.append((re.compile(r'\b0[oO][0-7]+\b'), number_format))
-
-        # Comments
-        comment_format = self._make_format(colors['comment'], italic=True)
-        self.highlighting_rules.append((re.compile(r'#.*$'), comment_format))
-
-        # defs/classes/decorators/operators
-        function_format = self._make_format(colors['function'], bold=True)
-        self.highlighting_rules.append((re.compile(r'\bdef\s+(\w+)'), function_format))
-        class_format = self._make_format(colors['class'], bold=True)
-        self.highlighting_rules.append((re.compile(r'\bclass\s+(\w+)'), class_format))
-        decorator_format = self._make_format(colors['decorator'])
-        self.highlighting_rules.append((re.compile(r'@\w+'), decorator_format))
-        operator_format = self._make_format(colors['operator'])
-        for op in [r'\+\+', r'--', r'\+', r'-', r'\*', r'/', r'//', r'%', r'\*\*',
-                   r'==', r'!=', r'<=', r'>=', r'<', r'>', r'=', r'<<', r'>>',
-                   r'&', r'\|', r'\^', r'~']:
-            self.highlighting_rules.append((re.compile(op), operator_format))
-
-        # For multi-line strings
-        self.triple_double = re.compile(r'"""')
-        self.triple_single = re.compile(r"'''")
-        self._ml_string_format = self._make_format(QColor(206, 145, 120))
+    @classmethod
+    def for_theme(cls, theme: str) -> 'HighlightRuleSet':
+        rules = cls._cache.get(theme)
+        if rules is None:
+            rules = cls._cache[theme] = cls(theme)
+        return rules
 
-    def highlightBlock(self, text: str):
-        for pattern, fmt in self.highlighting_rules:
-            try:
-                for match in pattern.finditer(text):
-                    start, end = match.span()
-                    self.setFormat(start, end - start, fmt)
-            except re.error:
-                pass
+class PythonSyntaxHighlighter(QSyntaxHighlighter):
+    """Advanced Python syntax highlighter with multiple themes"""
 
-        # Multiline triple-quoted strings
-        self.setCurrentBlockState(0)
-        in_multiline = self.previousBlockState() == 1
-        for triple in (self.triple_double, self.triple_single):
-            start = 0
-            if not in_multiline:
-                m = triple.search(text, start)
-                start = m.start() if m else -1
-            else:
-                start = 0
-
-            while start >= 0:
-                m_end = triple.search(text, start + 3)
-                if m_end:
-                    end_index = m_end.end()
-                    length = end_index - start
-                    self.setCurrentBlockState(0)
+    KEYWORDS = sorted(set(keyword.kwlist + ['True', 'False', 'None']))
+    BUILTINS = [
+        'abs', 'all', 'any', 'bin', 'bool', 'bytearray', 'bytes', 'callable',
+        'chr', 'classmethod', 'compile', 'complex', 'delattr', 'dict', 'dir',
+        'divmod', 'enumerate', 'eval', 'exec', 'filter', 'float', 'format',
+        'frozenset', 'getattr', 'globals', 'hasattr', 'hash', 'help', 'hex',
+        'id', 'input', 'int', 'isinstance', 'issubclass', 'iter', 'len',
+        'list', 'locals', 'map', 'max', 'memoryview', 'min', 'next', 'object',
+        'oct', 'open', 'ord', 'pow', 'print', 'property', 'range', 'repr',
+        'reversed', 'round', 'set', 'setattr', 'slice', 'sorted', 'staticmethod',
+        'str', 'sum', 'super', 'tuple', 'type', 'vars', 'zip', '__import__'
+    ]
+
+    # One combined tokenizer. Alternatives are listed in priority order, so every
+    # span of a line is matched (and formatted) exactly once. String bodies are
+    # scanned separately by _scan_string so their state can span lines.
+    TOKEN_RE = re.compile('|'.join([
+        r'(?P<comment>#.*)',
+        r'(?P<prefix>[rRbBuUfF]{0,2})(?P<quote>"""' + r"""|'''|"|')""",
+        r'(?P<decorator>@\w+)',
+        r'\b(?P<defkw>def|class)\s+(?P<defname>\w+)',
+        r'(?P<number>\b(?:0[xX][0-9a-fA-F]+|0[bB][01]+|0[oO][0-7]+|\d+\.?\d*(?:[eE][+-]?\d+)?)\b)',
+        r'(?P<name>[^\W\d]\w*)',
+        r'(?P<bracket>[()\[\]{}])',
+        r'(?P<operator>\*\*|//|==|!=|<=|>=|<<|>>|[-+*/%<>=&|^~])',
+    ]))
+
+    # Lexer state carried between blocks (QTextBlock.userState):
+    #   bits 0-2  open string: 0 none, 1 """, 2 ''', 3 " or 4 ' continued by a backslash
+    #   bit  3    raw string
+    #   bit  4    f-string
+    #   bits 5-8  bracket depth inside an f-string replacement field
+    #   bits 9+   bracket depth of the surrounding code
+    STRING_QUOTES = {1: '"""', 2: "'''", 3: '"', 4: "'"}
+    QUOTE_KINDS = {'"""': 1, "'''": 2, '"': 3, "'": 4}
+    RAW_FLAG = 0x08
+    FSTRING_FLAG = 0x10
+    FIELD_SHIFT = 5
+    FIELD_MASK = 0x0F
+    PAREN_SHIFT = 9
+    PAREN_MAX = 0x3FF
+
+    # A line starting like this at column 0 is never inside brackets in real code;
+    # it resynchronizes the bracket depth so an unbalanced '(' stops cascading there.
+    TOP_LEVEL_RE = re.compile(r'(?:(?:async\s+)?def|class|import|from)\b|@')
+
+    # Next character of interest inside a string body, per (quote char, f-string)
+    _BODY_RE = {
+        (q, f): re.compile('[\\\\' + q + ('{}' if f else '') + ']')
+        for q in ('"', "'") for f in (False, True)
+    }
+    ESCAPE_RE = re.compile(r'\\(?:x[0-9a-fA-F]{2}|u[0-9a-fA-F]{4}|U[0-9a-fA-F]{8}|N\{[\w \-]*\}|[0-7]{1,3}|.)')
+
+    @classmethod
+    def encode_state(cls, kind: int, raw: bool, fstr: bool, field_depth: int, parens: int) -> int:
+        if not kind:
+            raw = fstr = False
+            field_depth = 0
+        return (kind | (cls.RAW_FLAG if raw else 0) | (cls.FSTRING_FLAG if fstr else 0)
+                | (min(field_depth, cls.FIELD_MASK) << cls.FIELD_SHIFT)
+                | (min(parens, cls.PAREN_MAX) << cls.PAREN_SHIFT))
+
+    @classmethod
+    def decode_state(cls, state: int) -> Tuple[int, bool, bool, int, int]:
+        """(string kind, raw, f-string, field depth, paren depth) of a block state"""
+        if state < 0:
+            return 0, False, False, 0, 0
+        return (state & 0x07, bool(state & cls.RAW_FLAG), bool(state & cls.FSTRING_FLAG),
+                (state >> cls.FIELD_SHIFT) & cls.FIELD_MASK, state >> cls.PAREN_SHIFT)
+
+    def __init__(self, parent=None, theme="dark"):
+        super().__init__(parent)
+        self.theme = theme
+        self.rules: Optional[HighlightRuleSet] = None
+        # Deferred mode: blocks from _frontier on are colored later, in slices
+        self._deferred = False
+        self._frontier = 0
+        self._forced_block = -1
+        # Semantic overlay from the background analysis: {line: [(col, name, kind)]}
+        self._semantic: Dict[int, List[Tuple[int, str, str]]] = {}
+        self.setup_highlighting_rules()
+
+    # Deferred (time-sliced) highlighting
+    def begin_deferred(self):
+        """Stop highlighting synchronously; blocks are colored by highlight_next_blocks()"""
+        self._deferred = True
+        self._frontier = 0
+
+    def is_deferred(self) -> bool:
+        return self._deferred
+
+    def frontier(self) -> int:
+        return self._frontier
+
+    def shift_frontier(self, first_block: int, delta: int):
+        """Keep the frontier on the same text after lines were inserted/removed before it"""
+        if self._deferred and first_block < self._frontier:
+            self._frontier = max(first_block, self._frontier + delta)
+
+    def highlight_block(self, block):
+        """Color one block ahead of the frontier (e.g. a visible one)"""
+        self._forced_block = block.blockNumber()
+        try:
+            self.rehighlightBlock(block)
+        finally:
+            self._forced_block = -1
+
+    def highlight_next_blocks(self, count: int) -> bool:
+        """Advance the frontier by up to count blocks; returns False when done"""
+        if not self._deferred:
+            return False
+        block = self.document().findBlockByNumber(self._frontier)
+        for _ in range(count):
+            if not block.isValid():
+                self._deferred = False
+                return False
+            self._frontier += 1
+            self.rehighlightBlock(block)
+            block = block.next()
+        return True
+
+    def set_semantic_tokens(self, tokens: Dict[int, List[Tuple[int, str, str]]]):
+        """Install a new semantic overlay, re-coloring only the lines whose tokens changed"""
+        old, self._semantic = self._semantic, tokens
+        doc = self.document()
+        for line in sorted(ln for ln in old.keys() | tokens.keys() if old.get(ln) != tokens.get(ln)):
+            if self._deferred and line >= self._frontier:
+                break
+            block = doc.findBlockByNumber(line)
+            if block.isValid():
+                self.rehighlightBlock(block)
+
+    def set_theme(self, theme: str):
+        """Switch to the shared rule set of another theme (no recompilation)"""
+        self.theme = theme
+        self.rules = HighlightRuleSet.for_theme(theme)
+
+    def setup_highlighting_rules(self):
+        """Setup highlighting formats based on theme"""
+        self.rules = HighlightRuleSet.for_theme(self.theme)
+
+    def _scan_string(self, text: str, pos: int, kind: int, raw: bool, fstr: bool) -> Tuple[int, int, bool]:
+        """Format a string body from pos. Returns (end, kind still open or 0, entered a {field})"""
+        fmts = self.rules.formats
+        string_format = fmts['string']
+        quote = self.STRING_QUOTES[kind]
+        search = self._BODY_RE[(quote[0], fstr)].search
+        n = len(text)
+        start = i = pos
+        while True:
+            m = search(text, i)
+            if not m:
+                break
+            i = m.start()
+            c = text[i]
+            if c == '\\':
+                if i + 1 >= n:
+                    # Trailing backslash: the string continues on the next line
+                    self.setFormat(start, n - start, string_format)
+                    return n, kind, False
+                if not raw:
+                    end = self.ESCAPE_RE.match(text, i).end()
+                    self.setFormat(start, i - start, string_format)
+                    self.setFormat(i, end - i, fmts['escape'])
+                    start = i = end
+                else:
+                    i += 2
+            elif c == '{' or c == '}':
+                if i + 1 < n and text[i + 1] == c:
+                    i += 2
+                elif c == '{':
+                    self.setFormat(start, i + 1 - start, string_format)
+                    return i + 1, kind, True
                 else:
-                    self.setCurrentBlockState(1)
-                    length = len(text) - start
-                self.setFormat(start, length, self._ml_string_format)
+                    i += 1
+            elif text.startswith(quote, i):
+                end = i + len(quote)
+                self.setFormat(start, end - start, string_format)
+                return end, 0, False
+            else:
+                i += 1
+        self.setFormat(start, n - start, string_format)
+        # Only triple-quoted strings survive the end of the line on their own
+        return n, (kind if kind <= 2 else 0), False
 
-                if m_end:
-                    m2 = triple.search(text, end_index)
-                    start = m2.start() if m2 else -1
+    def highlightBlock(self, text: str):
+        if self._deferred:
+            number = self.currentBlock().blockNumber()
+            # Leaving the state untouched also stops Qt from cascading further
+            if number >= self._frontier and number != self._forced_block:
+                return
+        rules = self.rules
+        fmts = rules.formats
+        name_formats = rules.name_formats
+        string_format = fmts['string']
+        kind, raw, fstr, field_depth, parens = self.decode_state(self.previousBlockState())
+        if parens and not kind and self.TOP_LEVEL_RE.match(text):
+            parens = 0
+        n = len(text)
+        pos = 0
+        search = self.TOKEN_RE.search
+
+        while True:
+            if kind and not field_depth:
+                pos, kind, entered_field = self._scan_string(text, pos, kind, raw, fstr)
+                if entered_field:
+                    field_depth = 1
+                elif kind:
+                    break
+                continue
+            if pos >= n:
+                break
+            m = search(text, pos)
+            if not m:
+                break
+            tk = m.lastgroup
+            start, end = m.span()
+            if tk == 'name':
+                fmt = name_formats.get(m.group())
+                if fmt is not None:
+                    self.setFormat(start, end - start, fmt)
+            elif tk == 'bracket':
+                ch = text[start]
+                if field_depth:
+                    if ch in '([{':
+                        field_depth += 1
+                    else:
+                        field_depth -= 1
+                        if not field_depth:
+                            # The closing brace of a replacement field belongs to the string
+                            self.setFormat(start, 1, string_format)
+                elif ch in '([{':
+                    parens += 1
+                elif parens:
+                    parens -= 1
+            elif tk == 'quote':
+                prefix = m.group('prefix').lower()
+                self.setFormat(start, end - start, string_format)
+                quote_kind = self.QUOTE_KINDS[m.group('quote')]
+                if field_depth:
+                    # A string nested in a replacement field ends on this line
+                    end, _open, _field = self._scan_string(text, end, quote_kind, 'r' in prefix, False)
                 else:
-                    start = -1
+                    kind, raw, fstr = quote_kind, 'r' in prefix, 'f' in prefix
+            elif tk == 'defname':
+                self.setFormat(start, m.end('defkw') - start, fmts['keyword'])
+                name_fmt = fmts['class'] if m.group('defkw') == 'class' else fmts['function']
+                self.setFormat(m.start('defname'), end - m.start('defname'), name_fmt)
+            else:
+                self.setFormat(start, end - start, fmts[tk])
+            pos = end
+
+        if kind > 2 and field_depth:
+            # Unterminated replacement field in a single-quoted f-string
+            kind = 0
+        if self._semantic:
+            tokens = self._semantic.get(self.currentBlock().blockNumber())
+            if tokens:
+                for col, name, sem_kind in tokens:
+                    # Tokens may lag behind the text until the next analysis; only
+                    # apply those that still match
+                    if text.startswith(name, col):
+                        self.setFormat(col, len(name), fmts[sem_kind])
+        self.setCurrentBlockState(self.encode_state(kind, raw, fstr, field_depth, parens))
 
 # =============================
 # Code Editor & Gutter
@@ -226,8 +447,312 @@ class LineNumberArea(QWidget):
                 bottom = top + editor.blockBoundingRect(block).height()
         super().mousePressEvent(event)
 
+class CompletionEngine:
+    """Ranked identifier completion over the words of all open documents"""
+    KIND_WEIGHTS = {
+        'class': 3.0, 'function': 3.0, 'method': 2.5, 'constant': 2.0,
+        'import': 2.0, 'variable': 1.5, 'keyword': 1.0, 'builtin': 1.0,
+    }
+    PROXIMITY_WEIGHT = 4.0
+    CASE_MATCH_BONUS = 0.5
+    SCAN_LIMIT = 2000         # wider prefix ranges are served from a ranked list
+    RANKED_DEPTH = 128
+    RANKED_CACHE_SIZE = 64
+    BULK_CHANGES = 1000
+
+    _instance: Optional['CompletionEngine'] = None
+
+    def __init__(self):
+        self._counts: Dict[str, int] = {}
+        self._keys: List[Tuple[str, str]] = []
+        self._static_kinds: Dict[str, str] = {}
+        self._symbols: Dict[Any, Dict[str, str]] = {}
+        self._kinds: Dict[str, str] = {}
+        # prefix -> [floor, [(-base score, word), ...] ascending]; no word
+        # missing from the list scores above floor
+        self._ranked: Dict[str, list] = {}
+
+    @classmethod
+    def instance(cls) -> 'CompletionEngine':
+        if cls._instance is None:
+            cls._instance = cls()
+            cls._instance.add_static(keyword.kwlist, 'keyword')
+            cls._instance.add_static(PythonSyntaxHighlighter.BUILTINS, 'builtin')
+        return cls._instance
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def __contains__(self, word: str) -> bool:
+        return word in self._counts or word in self._static_kinds
+
+    def _insert_key(self, word: str):
+        key = (word.lower(), word)
+        i = bisect_left(self._keys, key)
+        if i == len(self._keys) or self._keys[i] != key:
+            self._keys.insert(i, key)
+
+    def _remove_key(self, word: str):
+        key = (word.lower(), word)
+        i = bisect_left(self._keys, key)
+        if i < len(self._keys) and self._keys[i] == key:
+            del self._keys[i]
+
+    def add_static(self, words, kind: str):
+        for w in words:
+            if w not in self:
+                self._insert_key(w)
+            self._static_kinds[w] = kind
+        self._ranked.clear()
+
+    def update_counts(self, deltas: Dict[str, int]):
+        """Apply occurrence count changes reported by a document's word index"""
+        counts = self._counts
+        fresh, gone, changed = [], [], []
+        for w, d in deltas.items():
+            if not d:
+                continue
+            changed.append(w)
+            old = counts.get(w, 0)
+            new = old + d
+            if new > 0:
+                counts[w] = new
+                if not old and w not in self._static_kinds:
+                    fresh.append(w)
+            else:
+                counts.pop(w, None)
+                if old and w not in self._static_kinds:
+                    gone.append(w)
+        if len(fresh) + len(gone) > self.BULK_CHANGES:
+            gone_keys = {(w.lower(), w) for w in gone}
+            keys = [k for k in self._keys if k not in gone_keys] if gone_keys else self._keys
+            keys.extend((w.lower(), w) for w in fresh)
+            keys.sort()
+            self._keys = keys
+        else:
+            for w in gone:
+                self._remove_key(w)
+            for w in fresh:
+                self._insert_key(w)
+        self._rescore(changed)
+
+    def set_symbols(self, owner, symbols: Dict[str, str]):
+        """Record the symbol kinds (from CodeStructureParser) of one document"""
+        self._symbols[owner] = symbols
+        self._rebuild_kinds()
+
+    def remove_owner(self, owner):
+        if self._symbols.pop(owner, None) is not None:
+            self._rebuild_kinds()
+
+    def _rebuild_kinds(self):
+        kinds: Dict[str, str] = {}
+        weights = self.KIND_WEIGHTS
+        for symbols in self._symbols.values():
+            for name, kind in symbols.items():
+                current = kinds.get(name)
+                if current is None or weights.get(kind, 0) > weights.get(current, 0):
+                    kinds[name] = kind
+        old = self._kinds
+        self._kinds = kinds
+        self._rescore([w for w in old.keys() | kinds.keys() if old.get(w) != kinds.get(w)])
+
+    @staticmethod
+    def symbol_kinds(structure: Dict) -> Dict[str, str]:
+        """Flatten a CodeStructureParser result into {name: kind}"""
+        kinds: Dict[str, str] = {}
+        for cls in structure.get('classes', []):
+            kinds[cls['name']] = 'class'
+            for m in cls.get('methods', []):
+                kinds.setdefault(m['name'], 'method')
+            for var in cls.get('variables', []):
+                kinds.setdefault(var['name'], 'variable')
+        for func in structure.get('functions', []):
+            kinds[func['name']] = 'function'
+        for const in structure.get('constants', []):
+            kinds.setdefault(const['name'], 'constant')
+        for var in structure.get('variables', []):
+            kinds.setdefault(var['name'], 'variable')
+        for imp in structure.get('imports', []):
+            name = imp.get('alias') or imp['name'].split('.')[-1 if imp.get('type') == 'from' else 0]
+            kinds.setdefault(name, 'import')
+        return kinds
+
+    def _base_score(self, word: str, prefix: str) -> float:
+        """Score without proximity: frequency, symbol kind and exact-case prefix"""
+        s = log1p(self._counts.get(word, 0)) + self.KIND_WEIGHTS.get(
+            self._kinds.get(word) or self._static_kinds.get(word), 0.0)
+        if word.startswith(prefix):
+            s += self.CASE_MATCH_BONUS
+        return s
+
+    def _rescore(self, words: List[str]):
+        """Patch the ranked lists after the base score of some words changed"""
+        if not self._ranked or not words:
+            return
+        if len(words) > self.BULK_CHANGES:
+            self._ranked.clear()
+            return
+        lowered = [(w.lower(), w) for w in words]
+        for prefix, entry in self._ranked.items():
+            low = prefix.lower()
+            ranked = entry[1]
+            for lw, w in lowered:
+                if not lw.startswith(low):
+                    continue
+                for i, item in enumerate(ranked):
+                    if item[1] == w:
+                        del ranked[i]
+                        break
+                if w in self:
+                    s = self._base_score(w, prefix)
+                    # Below the floor it is no better than the words already left out
+                    if s >= entry[0]:
+                        insort(ranked, (-s, w))
+            if len(ranked) > 2 * self.RANKED_DEPTH:
+                entry[0] = max(entry[0], -ranked[self.RANKED_DEPTH][0])
+                del ranked[self.RANKED_DEPTH:]
+
+    def _ranked_candidates(self, prefix: str, lo: int, hi: int, limit: int) -> List[str]:
+        entry = self._ranked.pop(prefix, None)
+        # Usable while the limit-th best is still known to beat every word left out
+        if entry is None or len(entry[1]) <= limit or -entry[1][limit][0] < entry[0]:
+            scored = nsmallest(self.RANKED_DEPTH + 1,
+                               ((-self._base_score(w, prefix), w) for _, w in self._keys[lo:hi]))
+            floor = -scored.pop()[0] if len(scored) > self.RANKED_DEPTH else float('-inf')
+            entry = [floor, scored]
+        self._ranked[prefix] = entry
+        while len(self._ranked) > self.RANKED_CACHE_SIZE:
+            del self._ranked[next(iter(self._ranked))]
+        return [w for _, w in entry[1][:limit + 1]]
+
+    def complete(self, prefix: str, near: Optional[Dict[str, int]] = None, limit: int = 50) -> List[str]:
+        """Top candidates starting with prefix (case-insensitive), best first"""
+        if not prefix:
+            return []
+        keys = self._keys
+        low = prefix.lower()
+        lo = bisect_left(keys, (low,))
+        hi = bisect_left(keys, (low + '\U0010ffff',), lo)
+        if lo == hi:
+            return []
+        near = near or {}
+        if hi - lo > self.SCAN_LIMIT and limit < self.RANKED_DEPTH:
+            # Only nearby words can gain on the ranked list
+            candidates = set(self._ranked_candidates(prefix, lo, hi, limit))
+            candidates.update(w for w in near if w.lower().startswith(low) and w in self)
+        else:
+            candidates = [w for _, w in keys[lo:hi]]
+        proximity = self.PROXIMITY_WEIGHT
+
+        def score(w):
+            s = self._base_score(w, prefix)
+            d = near.get(w)
+            if d is not None:
+                s += proximity / (1 + d)
+            return s
+
+        # The word being typed is in the index too; never offer it back
+        return nlargest(limit, (w for w in candidates if w != prefix), key=score)
+
+
+class CompletionWordIndex:
+    """Reference-counted words of one document, updated per edited block"""
+    WORD_RE = re.compile(r'\b\w{3,}\b')
+
+    def __init__(self, engine: CompletionEngine):
+        self._engine = engine
+        self._lines: List[List[str]] = [[]]
+        self._counts: Dict[str, int] = {}
+
+    def __contains__(self, word: str) -> bool:
+        return word in self._counts
+
+    def line_count(self) -> int:
+        return len(self._lines)
+
+    def update_blocks(self, first: int, old_count: int, new_texts: List[str]):
+        """Replace the words of blocks [first, first + old_count) with those of new_texts"""
+        findall = self.WORD_RE.findall
+        new_lines = [findall(t) for t in new_texts]
+        counts = self._counts
+        deltas: Dict[str, int] = {}
+        for words in self._lines[first:first + old_count]:
+            for w in words:
+                deltas[w] = deltas.get(w, 0) - 1
+        for words in new_lines:
+            for w in words:
+                deltas[w] = deltas.get(w, 0) + 1
+        for w, d in deltas.items():
+            c = counts.get(w, 0) + d
+            if c > 0:
+                counts[w] = c
+            else:
+                counts.pop(w, None)
+        self._lines[first:first + old_count] = new_lines
+        self._engine.update_counts(deltas)
+
+    def reset(self, texts: List[str]):
+        self.update_blocks(0, len(self._lines), texts)
+
+    def words_near(self, line: int, radius: int) -> Dict[str, int]:
+        """{word: distance in lines} for words around a 0-based line"""
+        near: Dict[str, int] = {}
+        start = max(0, line - radius)
+        for i, words in enumerate(self._lines[start:line + radius + 1], start):
+            d = abs(i - line)
+            for w in words:
+                if d < near.get(w, radius + 1):
+                    near[w] = d
+        return near
+
+class BlockRangeIndex:
+    """Line extents of the class and def blocks of one document, shifted as lines change"""
+
+    def __init__(self):
+        self._starts: List[int] = []
+        self._ends: List[int] = []
+        self.ready = False
+
+    def __len__(self) -> int:
+        return len(self._starts)
+
+    def rebuild(self, blocks: List[Tuple[int, int]]):
+        widest: Dict[int, int] = {}
+        for start, end in blocks:
+            if end > widest.get(start, start - 1):
+                widest[start] = end
+        self._starts = sorted(widest)
+        self._ends = [widest[s] for s in self._starts]
+        self.ready = True
+
+    def block_at(self, start_line: int) -> Optional[Tuple[int, int]]:
+        """(start, end) of the block whose header is on start_line"""
+        i = bisect_left(self._starts, start_line)
+        if i < len(self._starts) and self._starts[i] == start_line:
+            return start_line, self._ends[i]
+        return None
+
+    def shift(self, line: int, delta: int):
+        """Lines after the 1-based line were inserted (delta > 0) or removed (delta < 0)"""
+        if not delta or not self._starts:
+            return
+        starts, ends = self._starts, self._ends
+        for i in range(bisect_right(starts, line), len(starts)):
+            starts[i] = max(line, starts[i] + delta)
+        for i, end in enumerate(ends):
+            if end >= line:
+                ends[i] = max(starts[i], end + delta)
+
 class CodeEditor(QPlainTextEdit):
     """Enhanced code editor with numbers, breakpoints, completion, and click highlight"""
+    structure_ready = pyqtSignal(object)  # CodeStructureParser result for the current text
+
+    LARGE_FILE_LINES = 5000   # above this, highlighting runs in time slices
+    HIGHLIGHT_SLICE_MS = 8
+    ANALYSIS_DELAY_MS = 400
+    COMPLETION_LIMIT = 50     # ranked candidates shown in the popup
+    COMPLETION_RADIUS = 50    # lines around the cursor that count as "nearby"
 
     def __init__(self, parent=None):
         super().__init__(parent)
@@ -253,6 +778,31 @@ class CodeEditor(QPlainTextEdit):
         self.highlight_current_line()
         self.zoom_level = 0
 
+        # Class/def extents from the last successful parse
+        self.block_index = BlockRangeIndex()
+
+        # Progressive highlighting for very large documents
+        self._highlight_timer = QTimer(self)
+        self._highlight_timer.setInterval(0)
+        self._highlight_timer.timeout.connect(self._highlight_slice)
+        self._viewport_highlight_pending = False
+        self._last_block_count = self.blockCount()
+        self.document().contentsChange.connect(self._on_contents_change)
+        self.verticalScrollBar().valueChanged.connect(self._on_scrolled)
+
+        # Structure and semantic tokens are computed off the UI thread
+        self._analysis_generation = 0
+        self._analysis_revision = -1
+        self._pending_edit: Optional[Tuple[int, int]] = None
+        self._structure: Optional[Dict] = None
+        self._structure_revision = -1
+        self._analysis_timer = QTimer(self)
+        self._analysis_timer.setSingleShot(True)
+        self._analysis_timer.setInterval(self.ANALYSIS_DELAY_MS)
+        self._analysis_timer.timeout.connect(self.request_analysis)
+        self.textChanged.connect(self._analysis_timer.start)
+        CodeAnalysisService.instance().analysis_ready.connect(self._on_analysis_ready)
+
     def setup_editor(self):
         font = QFont("Consolas", 11)
         font.setFixedPitch(True)
@@ -270,6 +820,118 @@ class CodeEditor(QPlainTextEdit):
         self.highlighter = PythonSyntaxHighlighter(self.document())
         self.setAcceptDrops(True)
 
+    # Background analysis
+    def request_analysis(self):
+        self._analysis_revision = self.document().revision()
+        edit, self._pending_edit = self._pending_edit, None
+        self._analysis_generation = CodeAnalysisService.instance().request(id(self), self.toPlainText(), edit)
+
+    def _on_analysis_ready(self, key, generation: int, structure: Dict, tokens):
+        if key != id(self) or generation != self._analysis_generation:
+            return
+        # Results are recovered around syntax errors, so they are usable either way
+        self.completion_engine.set_symbols(id(self), CompletionEngine.symbol_kinds(structure))
+        if tokens is not None:
+            self.highlighter.set_semantic_tokens(tokens)
+        # Line numbers are only valid for the text that was analyzed; if it has
+        # changed since, a newer analysis is already scheduled
+        if self.document().revision() != self._analysis_revision:
+            return
+        self.block_index.rebuild(structure.get('blocks', []))
+        self._structure = structure
+        self._structure_revision = self._analysis_revision
+        self.structure_ready.emit(structure)
+
+    def request_structure(self):
+        """Emit structure_ready for the current text, reusing the last analysis if still current"""
+        revision = self.document().revision()
+        if self._structure is not None and self._structure_revision == revision:
+            self.structure_ready.emit(self._structure)
+            return
+        if self._analysis_revision == revision and not self._analysis_timer.isActive():
+            return  # already being analyzed; structure_ready follows
+        self._analysis_timer.stop()
+        self.request_analysis()
+
+    # Progressive highlighting
+    def set_text_progressive(self, text: str):
+        """setPlainText that colors the viewport first and the rest in time slices"""
+        if text.count('\n') >= self.LARGE_FILE_LINES:
+            self.highlighter.begin_deferred()
+        self.setPlainText(text)
+        self._schedule_highlighting()
+
+    def rehighlight_progressive(self):
+        """Re-color the whole document (e.g. after a theme change) without blocking"""
+        if self.blockCount() < self.LARGE_FILE_LINES:
+            self.highlighter.rehighlight()
+            return
+        self.highlighter.begin_deferred()
+        self._schedule_highlighting()
+
+    def _schedule_highlighting(self):
+        if self.highlighter.is_deferred():
+            self._viewport_highlight_pending = True
+            self._highlight_timer.start()
+
+    def _on_contents_change(self, position: int, _removed: int, added: int):
+        count = self.blockCount()
+        delta = count - self._last_block_count
+        self._last_block_count = count
+        doc = self.document()
+        first_block = doc.findBlock(position)
+        last_block = doc.findBlock(position + added)
+        if not last_block.isValid():
+            last_block = doc.lastBlock()
+        first = first_block.blockNumber()
+        last = last_block.blockNumber()
+        # Unchanged leading/trailing lines since the last analysis request
+        head, tail = self._pending_edit or (count, count)
+        self._pending_edit = (min(head, first), min(tail, count - 1 - last))
+        self._update_word_index(first_block, last - first + 1, delta)
+        if delta:
+            # An edit at column 0 moves the line it starts on as well
+            self.block_index.shift(first + 1 if position > first_block.position() else first, delta)
+        if self.highlighter.is_deferred():
+            # Qt cleared the formats of edited blocks past the frontier; the pass recolors them
+            if delta:
+                self.highlighter.shift_frontier(first, delta)
+            self._schedule_highlighting()
+
+    def _update_word_index(self, first_block, new_count: int, delta: int):
+        texts = []
+        block = first_block
+        for _ in range(new_count):
+            texts.append(block.text())
+            block = block.next()
+        self.word_index.update_blocks(first_block.blockNumber(), new_count - delta, texts)
+        if self.word_index.line_count() != self.blockCount():
+            # Should not happen; resynchronize from the whole document
+            self.word_index.reset(self.toPlainText().split('\n'))
+
+    def _on_scrolled(self, _value: int):
+        self._schedule_highlighting()
+
+    def _highlight_slice(self):
+        hl = self.highlighter
+        if not hl.is_deferred():
+            self._highlight_timer.stop()
+            return
+        deadline = time.perf_counter() + self.HIGHLIGHT_SLICE_MS / 1000.0
+        if self._viewport_highlight_pending:
+            self._viewport_highlight_pending = False
+            block = self.firstVisibleBlock()
+            offset = self.contentOffset()
+            bottom = self.viewport().rect().bottom()
+            while block.isValid() and self.blockBoundingGeometry(block).translated(offset).top() <= bottom:
+                if block.blockNumber() >= hl.frontier():
+                    hl.highlight_block(block)
+                block = block.next()
+        while time.perf_counter() < deadline:
+            if not hl.highlight_next_blocks(64):
+                self._highlight_timer.stop()
+                return
+
     # Group paste operations into a single undo step
     def insertFromMimeData(self, source):
         cursor = self.textCursor()
@@ -309,14 +971,22 @@ class CodeEditor(QPlainTextEdit):
             print(f"Error replacing block: {e}")
             return False
 
+    def _line_range_cursor(self, start_line: int, end_line: int) -> Optional[QTextCursor]:
+        """Cursor selecting whole lines start_line..end_line (1-based, clamped to the document)"""
+        doc = self.document()
+        start_block = doc.findBlockByNumber(max(1, start_line) - 1)
+        if not start_block.isValid():
+            return None
+        end_block = doc.findBlockByNumber(min(doc.blockCount(), max(start_line, end_line)) - 1)
+        cursor = QTextCursor(start_block)
+        cursor.setPosition(end_block.position() + end_block.length() - 1, QTextCursor.KeepAnchor)
+        return cursor
+
     def get_block_text(self, start_line: int, end_line: int) -> str:
-        try:
-            lines = self.toPlainText().splitlines()
-            sidx = max(1, start_line) - 1
-            eidx = min(len(lines), max(start_line, end_line))
-            return '\n'.join(lines[sidx:eidx])
-        except Exception:
+        cursor = self._line_range_cursor(start_line, end_line)
+        if cursor is None:
             return ""
+        return cursor.selectedText().replace('\u2029', '\n')
 
     def set_structure_highlight_color(self, qcolor: QColor):
         self._structure_color = qcolor
@@ -346,88 +1016,71 @@ class CodeEditor(QPlainTextEdit):
         self.highlight_current_line()
 
     def compute_block_range(self, start_line: int) -> Tuple[int, int]:
-        lines = self.toPlainText().splitlines()
-        n = len(lines)
-        idx = max(1, start_line) - 1
-        if idx < 0 or idx >= n:
-            return (start_line, start_line)
-
-        def indent_of(s: str) -> int:
-            s2 = s.replace('\t', '    ')
-            return len(s2) - len(s2.lstrip(' '))
-
-        header_indent = indent_of(lines[idx])
-        end_idx = idx
-        in_triple = None
-        j = idx + 1
-        while j < n:
-            line = lines[j]
-            if in_triple:
-                if in_triple in line and (line.count(in_triple) % 2 == 1):
-                    in_triple = None
-                end_idx = j
-                j += 1
-                continue
-            if '"""' in line or "'''" in line:
-                for triple in ('"""', "'''"):
-                    if line.count(triple) % 2 == 1:
-                        in_triple = triple
-                        break
-            stripped = line.strip()
-            if stripped == '':
-                end_idx = j
-                j += 1
-                continue
-            cur_indent = indent_of(line)
-            if cur_indent <= header_indent and not line.lstrip().startswith(('@',)):
-                break
-            end_idx = j
-            j += 1
-        return (idx + 1, end_idx + 1)
+        """Lines (start, end) of the class or def whose header is on start_line;
+        just the header line until the first analysis has finished"""
+        if not self.block_index.ready:
+            self.request_structure()
+        return self.block_index.block_at(start_line) or (start_line, start_line)
 
     def rename_in_range(self, start_line: int, end_line: int, old_name: str, new_name: str) -> int:
         if old_name == new_name or not old_name:
             return 0
-        lines = self.toPlainText().splitlines(True)
-        sidx = max(1, start_line) - 1
-        eidx = min(len(lines), max(start_line, end_line))
-        segment = ''.join(lines[sidx:eidx])
+        cursor = self._line_range_cursor(start_line, end_line)
+        if cursor is None:
+            return 0
+        segment = cursor.selectedText().replace('\u2029', '\n')
         try:
             pattern = re.compile(r'\b' + re.escape(old_name) + r'\b')
         except re.error:
             return 0
         new_segment, count = pattern.subn(new_name, segment)
         if count > 0:
-            cursor = self.textCursor()
-            block_start = self.document().findBlockByNumber(sidx).position()
-            if eidx - 1 >= 0:
-                last_block = self.document().findBlockByNumber(eidx - 1)
-                block_end = last_block.position() + len(last_block.text())
-            else:
-                block_end = block_start
             cursor.beginEditBlock()
-            cursor.setPosition(block_start)
-            cursor.setPosition(block_end, QTextCursor.KeepAnchor)
             cursor.insertText(new_segment)
             cursor.endEditBlock()
         return count
 
+    @staticmethod
+    def _utf16_len(text: str) -> int:
+        # Document positions count UTF-16 code units
+        return len(text.encode('utf-16-le')) // 2
+
+    def cursor_line_column(self) -> Tuple[int, int]:
+        """1-based line and 0-based character column of the cursor"""
+        cursor = self.textCursor()
+        units = cursor.block().text().encode('utf-16-le')[:2 * cursor.positionInBlock()]
+        return cursor.blockNumber() + 1, len(units.decode('utf-16-le', 'ignore'))
+
+    def replace_occurrences(self, edits: List[Tuple[int, int]], old_name: str, new_name: str) -> bool:
+        """Replace old_name at each (1-based line, 0-based column) as one undo step;
+        nothing is changed unless old_name is at every one of them"""
+        doc = self.document()
+        positions = set()
+        for line, col in edits:
+            block = doc.findBlockByNumber(line - 1)
+            text = block.text()
+            if not block.isValid() or text[col:col + len(old_name)] != old_name:
+                return False
+            positions.add(block.position() + self._utf16_len(text[:col]))
+        length = self._utf16_len(old_name)
+        cursor = QTextCursor(doc)
+        cursor.beginEditBlock()
+        for pos in sorted(positions, reverse=True):
+            cursor.setPosition(pos)
+            cursor.setPosition(pos + length, QTextCursor.KeepAnchor)
+            cursor.insertText(new_name)
+        cursor.endEditBlock()
+        return True
+
     def setup_auto_completion(self):
-        self.completer_words = set()
-        self.completer_words.update(keyword.kwlist)
-        self.completer_words.update([
-            'abs', 'all', 'any', 'bin', 'bool', 'bytearray', 'bytes', 'callable',
-            'chr', 'classmethod', 'compile', 'complex', 'delattr', 'dict', 'dir',
-            'divmod', 'enumerate', 'eval', 'exec', 'filter', 'float', 'format',
-            'frozenset', 'getattr', 'globals', 'hasattr', 'hash', 'help', 'hex',
-            'id', 'input', 'int', 'isinstance', 'issubclass', 'iter', 'len',
-            'list', 'locals', 'map', 'max', 'memoryview', 'min', 'next', 'object',
-            'oct', 'open', 'ord', 'pow', 'print', 'property', 'range', 'repr',
-            'reversed', 'round', 'set', 'setattr', 'slice', 'sorted', 'staticmethod',
-            'str', 'sum', 'super', 'tuple', 'type', 'vars', 'zip', '__import__'
-        ])
-
-        self.completer = QCompleter(sorted(list(self.completer_words)))
+        self._completer_model = QStringListModel(self)
+        self.completion_engine = CompletionEngine.instance()
+        self.word_index = CompletionWordIndex(self.completion_engine)
+
+        self.completer = QCompleter(self)
+        # Holds only the ranked candidates for the current prefix, best first
+        self.completer.setModel(self._completer_model)
+        self.completer.setModelSorting(QCompleter.UnsortedModel)
         self.completer.setWidget(self)
         self.completer.setCompletionMode(QCompleter.PopupCompletion)
         self.completer.setCaseSensitivity(Qt.CaseInsensitive)
@@ -453,6 +1106,11 @@ class CodeEditor(QPlainTextEdit):
         return sorted(self.breakpoints)
 
     # Completion
+    def release_completion_words(self):
+        """Withdraw this document's words and symbols from the shared completion engine"""
+        self.word_index.reset([])
+        self.completion_engine.remove_owner(id(self))
+
     def insert_completion(self, completion):
         cursor = self.textCursor()
         extra = len(completion) - len(self.completer.completionPrefix())
@@ -504,7 +1162,12 @@ class CodeEditor(QPlainTextEdit):
 
         completion_prefix = self.text_under_cursor()
         if len(completion_prefix) > 2:
-            self.update_completer_words()
+            near = self.word_index.words_near(self.textCursor().blockNumber(), self.COMPLETION_RADIUS)
+            candidates = self.completion_engine.complete(completion_prefix, near, self.COMPLETION_LIMIT)
+            if not candidates:
+                self.completer.popup().hide()
+                return
+            self._completer_model.setStringList(candidates)
             self.completer.setCompletionPrefix(completion_prefix)
             popup = self.completer.popup()
             popup.setCurrentIndex(self.completer.completionModel().index(0, 0))
@@ -627,14 +1290,6 @@ class CodeEditor(QPlainTextEdit):
         finally:
             cursor.endEditBlock()  # End grouping
 
-    def update_completer_words(self):
-        text = self.toPlainText()
-        words = re.findall(r'\b\w{3,}\b', text)
-        self.completer_words.update(words)
-        word_list = sorted(list(self.completer_words))
-        model = QStringListModel(word_list)
-        self.completer.setModel(model)
-
     # Zoom
     def zoom_in(self):
         self.zoom_level += 1
@@ -766,21 +1421,79 @@ class CodeEditor(QPlainTextEdit):
 # =============================
 
 class CodeStructureParser:
+    CATEGORIES = ('classes', 'functions', 'imports', 'variables', 'decorators', 'constants')
+
     @staticmethod
-    def parse_code(code_text: str) -> Dict:
+    def parse_code(code_text: str, keep_tree: bool = False) -> Dict:
+        """Parse code into the outline structure; keep_tree also returns the AST under 'tree'"""
         try:
             tree = ast.parse(code_text)
-            structure = {
-                'classes': [], 'functions': [], 'imports': [],
-                'variables': [], 'decorators': [], 'constants': []
-            }
+        except SyntaxError as e:
+            return CodeStructureParser.error_structure(e)
+        structure = CodeStructureParser.structure_of(tree)
+        if keep_tree:
+            structure['tree'] = tree
+        return structure
 
-            class CodeVisitor(ast.NodeVisitor):
-                def __init__(self):
-                    self.current_class = None
+    @staticmethod
+    def error_structure(error: SyntaxError) -> Dict:
+        return {
+            'classes': [], 'functions': [], 'imports': [],
+            'variables': [], 'decorators': [], 'constants': [],
+            'error': str(error)
+        }
 
-                def visit_ClassDef(self, node):
-                    methods, class_vars = [], []
+    @staticmethod
+    def structure_of(tree: ast.AST) -> Dict:
+        """Outline of a parsed module, or of a single top-level statement"""
+        structure = {
+            'classes': [], 'functions': [], 'imports': [],
+            'variables': [], 'decorators': [], 'constants': []
+        }
+
+        class CodeVisitor(ast.NodeVisitor):
+            def __init__(self):
+                self.current_class = None
+
+            def visit_ClassDef(self, node):
+                methods, class_vars = [], []
+                def _unparse(x):
+                    if hasattr(ast, 'unparse'):
+                        try:
+                            return ast.unparse(x)
+                        except Exception:
+                            return str(x)
+                    return str(x)
+                decorators = [_unparse(dec) for dec in node.decorator_list]
+                old_class = self.current_class
+                self.current_class = node.name
+                for item in node.body:
+                    if isinstance(item, ast.FunctionDef):
+                        method_decorators = [_unparse(dec) for dec in item.decorator_list]
+                        methods.append({
+                            'name': item.name, 'line': item.lineno,
+                            'end_line': getattr(item, 'end_lineno', item.lineno),
+                            'args': [arg.arg for arg in item.args.args],
+                            'decorators': method_decorators,
+                            'docstring': ast.get_docstring(item)
+                        })
+                    elif isinstance(item, ast.Assign):
+                        for t in item.targets:
+                            if isinstance(t, ast.Name):
+                                class_vars.append({'name': t.id, 'line': item.lineno})
+                structure['classes'].append({
+                    'name': node.name, 'line': node.lineno,
+                    'end_line': getattr(node, 'end_lineno', node.lineno),
+                    'methods': methods, 'variables': class_vars,
+                    'decorators': decorators,
+                    'docstring': ast.get_docstring(node),
+                    'bases': [_unparse(base) for base in node.bases]
+                })
+                self.current_class = old_class
+                self.generic_visit(node)
+
+            def visit_FunctionDef(self, node):
+                if not self.current_class:
                     def _unparse(x):
                         if hasattr(ast, 'unparse'):
                             try:
@@ -789,94 +1502,71 @@ class CodeStructureParser:
                                 return str(x)
                         return str(x)
                     decorators = [_unparse(dec) for dec in node.decorator_list]
-                    old_class = self.current_class
-                    self.current_class = node.name
-                    for item in node.body:
-                        if isinstance(item, ast.FunctionDef):
-                            method_decorators = [_unparse(dec) for dec in item.decorator_list]
-                            methods.append({
-                                'name': item.name, 'line': item.lineno,
-                                'args': [arg.arg for arg in item.args.args],
-                                'decorators': method_decorators,
-                                'docstring': ast.get_docstring(item)
-                            })
-                        elif isinstance(item, ast.Assign):
-                            for t in item.targets:
-                                if isinstance(t, ast.Name):
-                                    class_vars.append({'name': t.id, 'line': item.lineno})
-                    structure['classes'].append({
+                    returns = _unparse(node.returns) if node.returns else None
+                    structure['functions'].append({
                         'name': node.name, 'line': node.lineno,
-                        'methods': methods, 'variables': class_vars,
+                        'end_line': getattr(node, 'end_lineno', node.lineno),
+                        'args': [arg.arg for arg in node.args.args],
                         'decorators': decorators,
                         'docstring': ast.get_docstring(node),
-                        'bases': [_unparse(base) for base in node.bases]
+                        'returns': returns
                     })
-                    self.current_class = old_class
-                    self.generic_visit(node)
-
-                def visit_FunctionDef(self, node):
-                    if not self.current_class:
-                        def _unparse(x):
-                            if hasattr(ast, 'unparse'):
-                                try:
-                                    return ast.unparse(x)
-                                except Exception:
-                                    return str(x)
-                            return str(x)
-                        decorators = [_unparse(dec) for dec in node.decorator_list]
-                        returns = _unparse(node.returns) if node.returns else None
-                        structure['functions'].append({
-                            'name': node.name, 'line': node.lineno,
-                            'args': [arg.arg for arg in node.args.args],
-                            'decorators': decorators,
-                            'docstring': ast.get_docstring(node),
-                            'returns': returns
-                        })
-                    self.generic_visit(node)
+                self.generic_visit(node)
 
-                def visit_Import(self, node):
-                    for alias in node.names:
-                        structure['imports'].append({
-                            'name': alias.name, 'alias': alias.asname,
-                            'line': node.lineno, 'type': 'import'
-                        })
+            def visit_Import(self, node):
+                for alias in node.names:
+                    structure['imports'].append({
+                        'name': alias.name, 'alias': alias.asname,
+                        'line': node.lineno, 'type': 'import'
+                    })
 
-                def visit_ImportFrom(self, node):
-                    for alias in node.names:
-                        structure['imports'].append({
-                            'name': f"{node.module}.{alias.name}" if node.module else alias.name,
-                            'alias': alias.asname, 'line': node.lineno,
-                            'type': 'from', 'module': node.module
-                        })
+            def visit_ImportFrom(self, node):
+                for alias in node.names:
+                    structure['imports'].append({
+                        'name': f"{node.module}.{alias.name}" if node.module else alias.name,
+                        'alias': alias.asname, 'line': node.lineno,
+                        'type': 'from', 'module': node.module
+                    })
 
-                def visit_Assign(self, node):
-                    if not self.current_class:
-                        for t in node.targets:
-                            if isinstance(t, ast.Name):
-                                dest = structure['constants'] if t.id.isupper() else structure['variables']
-                                val = "..."
-                                try:
-                                    if isinstance(node.value, ast.Constant):
-                                        val = repr(node.value.value)
-                                    elif isinstance(node.value, ast.List):
-                                        val = f"[{len(node.value.elts)} items]"
-                                    elif isinstance(node.value, ast.Tuple):
-                                        val = f"({len(node.value.elts)} items)"
-                                    elif isinstance(node.value, ast.Dict):
-                                        val = f"{{{len(node.value.keys)} items}}"
-                                except Exception:
-                                    pass
-                                dest.append({'name': t.id, 'line': node.lineno, 'value': val})
-                    self.generic_visit(node)
-
-            CodeVisitor().visit(tree)
-            return structure
-        except SyntaxError as e:
-            return {
-                'classes': [], 'functions': [], 'imports': [],
-                'variables': [], 'decorators': [], 'constants': [],
-                'error': str(e)
-            }
+            def visit_Assign(self, node):
+                if not self.current_class:
+                    for t in node.targets:
+                        if isinstance(t, ast.Name):
+                            dest = structure['constants'] if t.id.isupper() else structure['variables']
+                            val = "..."
+                            try:
+                                if isinstance(node.value, ast.Constant):
+                                    val = repr(node.value.value)
+                                elif isinstance(node.value, ast.List):
+                                    val = f"[{len(node.value.elts)} items]"
+                                elif isinstance(node.value, ast.Tuple):
+                                    val = f"({len(node.value.elts)} items)"
+                                elif isinstance(node.value, ast.Dict):
+                                    val = f"{{{len(node.value.keys)} items}}"
+                            except Exception:
+                                pass
+                            dest.append({'name': t.id, 'line': node.lineno, 'value': val})
+                self.generic_visit(node)
+
+        CodeVisitor().visit(tree)
+        # (start, end) lines of every class and def, nested ones included, in line order
+        structure['blocks'] = sorted(
+            (node.lineno, getattr(node, 'end_lineno', node.lineno)) for node in ast.walk(tree)
+            if isinstance(node, (ast.ClassDef, ast.FunctionDef, ast.AsyncFunctionDef))
+        )
+        return structure
+
+    @staticmethod
+    def shifted_entry(entry: Dict, offset: int) -> Dict:
+        """Copy of an outline entry moved down by offset lines"""
+        moved = dict(entry)
+        moved['line'] += offset
+        if 'end_line' in moved:
+            moved['end_line'] += offset
+        if 'methods' in moved:
+            moved['methods'] = [CodeStructureParser.shifted_entry(m, offset) for m in moved['methods']]
+            moved['variables'] = [CodeStructureParser.shifted_entry(v, offset) for v in moved['variables']]
+        return moved
 
 class ReplaceSymbolDialog(QDialog):
     def __init__(self, kind: str, old_name: str, parent=None):
@@ -923,11 +1613,554 @@ class ReplaceBlockDialog(QDialog):
     def value(self) -> str:
         return self.text_edit.toPlainText()
 
-class EnhancedCodeNavigationTree(QTreeWidget):
+class OutlineNode:
+    """One outline row; its children are built from source the first time they are fetched"""
+    __slots__ = ('key', 'text', 'line', 'kind', 'name', 'tooltip', 'source',
+                 'parent', 'row', 'children', 'fetched')
+
+    def __init__(self, parent: Optional['OutlineNode'] = None, row: int = 0):
+        self.parent = parent
+        self.row = row
+        self.children: List['OutlineNode'] = []
+        self.fetched = False
+        self.key = self.text = ''
+        self.line = self.kind = self.name = self.tooltip = self.source = None
+
+    def assign(self, spec: tuple) -> bool:
+        """Take the fields of a row spec; True if what the view shows changed"""
+        key, text, line, kind, name, tooltip, source, _ = spec
+        changed = text != self.text or tooltip != self.tooltip
+        self.key, self.text, self.line, self.kind, self.name, self.tooltip, self.source = (
+            key, text, line, kind, name, tooltip, source)
+        return changed
+
+
+class OutlineSearchIndex:
+    """Fuzzy search over every row of one outline, fetched or not"""
+    WORD_START_BONUS = 2.0
+    CONSECUTIVE_BONUS = 3.0
+    GAP_PENALTY = 0.1  # per character skipped between two matched ones
+
+    def __init__(self, rows: List[Tuple[str, tuple]]):
+        self.rows = rows  # (parent key, row spec) in outline order
+        self.row_of = {spec[0]: i for i, (_, spec) in enumerate(rows)}
+        self._lower = [spec[1].lower() for _, spec in rows]
+        self._starts: List[Optional[Tuple[int, ...]]] = [None] * len(rows)
+        self._history: List[Tuple[str, List[int]]] = []  # narrowing queries and their matches
+
+    @staticmethod
+    def word_starts(text: str) -> Tuple[int, ...]:
+        starts = []
+        prev = ' '
+        for i, ch in enumerate(text):
+            if ch.isalnum() and (not prev.isalnum() or (ch.isupper() and prev.islower())):
+                starts.append(i)
+            prev = ch
+        return tuple(starts)
+
+    def search(self, query: str) -> Dict[int, float]:
+        """{row: score} for the rows matching query (lowercase)"""
+        history = self._history
+        while history and not query.startswith(history[-1][0]):
+            history.pop()
+        candidates = history[-1][1] if history else range(len(self.rows))
+        # A subsequence pattern that never backtracks: a[^b]*b[^c]*c
+        pattern = re.escape(query[0]) + ''.join(
+            f'[^{re.escape(ch)}]*{re.escape(ch)}' for ch in query[1:])
+        search = re.compile(pattern).search
+        lower = self._lower
+        matches = [i for i in candidates if search(lower[i])]
+        history.append((query, matches))
+        return {i: self._score(query, i) for i in matches}
+
+    def _score(self, query: str, i: int) -> float:
+        starts = self._starts[i]
+        if starts is None:
+            text = self.rows[i][1][1]
+            starts = self._starts[i] = self.word_starts(
+                text if len(text) == len(self._lower[i]) else self._lower[i])
+        return self.score_text(query, self._lower[i], starts)
+
+    @classmethod
+    def score_text(cls, query: str, text: str, starts: Tuple[int, ...]) -> Optional[float]:
+        """Score of query (lowercase) as a subsequence of text (lowercase), None if it is not"""
+        # Jumping to a word start can strand the rest of the query; fall back to plain order
+        score = cls._walk(query, text, starts, True)
+        return score if score is not None else cls._walk(query, text, starts, False)
+
+    @classmethod
+    def _walk(cls, query: str, text: str, starts: Tuple[int, ...], prefer_starts: bool) -> Optional[float]:
+        score = 0.0
+        pos = -1
+        for ch in query:
+            j = text.find(ch, pos + 1)
+            if j < 0:
+                return None
+            if prefer_starts and j != pos + 1 and j not in starts:
+                k = bisect_right(starts, pos)
+                while k < len(starts) and text[starts[k]] != ch:
+                    k += 1
+                if k < len(starts):
+                    j = starts[k]
+            if j == pos + 1 and pos >= 0:
+                score += cls.CONSECUTIVE_BONUS
+            elif j in starts:
+                score += cls.WORD_START_BONUS
+            score += 1.0 - cls.GAP_PENALTY * (j - pos - 1 if pos >= 0 else 0)
+            pos = j
+        return score
+
+
+class OutlineModel(QAbstractItemModel):
+    """Lazily fetched outline of one CodeStructureParser result, updated in place"""
+    KEY_ROLE = Qt.UserRole + 4
+    ERROR_KEY = 'error'
+
     def __init__(self, parent=None):
         super().__init__(parent)
-        self.setHeaderLabel("Code Structure")
-        self.itemClicked.connect(self.on_item_clicked)
+        self._root = OutlineNode()
+        self._root.fetched = True
+        self._expand_requests: List[OutlineNode] = []
+        self._structure: Optional[Dict] = None
+        self._query = ''
+        self._search: Optional[OutlineSearchIndex] = None
+        # parent key -> child row specs to show while a query is active
+        self._filter: Optional[Dict[str, List[tuple]]] = None
+        self.best_match: Optional[str] = None  # key of the highest scoring match
+
+    # ---- row specs ----
+
+    @staticmethod
+    def _row(key, text, line=None, kind=None, name=None, tooltip=None, source=None, expanded=False) -> tuple:
+        return key, text, line, kind, name, tooltip, source, expanded
+
+    @staticmethod
+    def _unique(seen: Dict[str, int], base: str) -> str:
+        # Redefinitions of the same name are told apart by occurrence
+        n = seen.get(base, 0)
+        seen[base] = n + 1
+        return f"{base}#{n}" if n else base
+
+    @classmethod
+    def top_rows(cls, structure: Optional[Dict]) -> List[tuple]:
+        rows = []
+        if not structure:
+            return rows
+        if 'error' in structure:
+            error_range = structure.get('error_range')
+            text = f"Syntax Error: {structure['error']}"
+            if not error_range:
+                return [cls._row(cls.ERROR_KEY, text)]
+            # The rest of the outline was recovered around the broken lines
+            rows.append(cls._row(cls.ERROR_KEY, text, error_range[0], 'error',
+                                 tooltip=f"Lines {error_range[0]}-{error_range[1]}"))
+
+        # Order: Classes -> Functions -> Others (Constants, Variables, Imports)
+        for key, text, builder, expanded in (
+                ('classes', "🏛️ Classes", cls._class_rows, True),
+                ('functions', "⚙️ Functions", cls._function_rows, True),
+                ('constants', "🔢 Constants", cls._constant_rows, True),
+                ('variables', "📊 Variables", cls._variable_rows, False),
+                ('imports', "📦 Imports", cls._import_rows, True)):
+            if structure[key]:
+                rows.append(cls._row(f"category:{key}", text, source=(builder, structure[key], ''),
+                                     expanded=expanded))
+        return rows
+
+    @classmethod
+    def _class_rows(cls, classes: List[Dict], prefix: str) -> List[tuple]:
+        seen: Dict[str, int] = {}
+        rows = []
+        for c in classes:
+            text = f"🏛️ {c['name']}"
+            if c.get('bases'):
+                text += f"({', '.join(c['bases'])})"
+            key = cls._unique(seen, f"class:{prefix}{c['name']}")
+            source = (cls._member_rows, c, key.split(':', 1)[1] + '.') if c['methods'] or c['variables'] else None
+            rows.append(cls._row(key, text, c['line'], 'class', c['name'], source=source))
+        return rows
+
+    @classmethod
+    def _member_rows(cls, c: Dict, prefix: str) -> List[tuple]:
+        seen: Dict[str, int] = {}
+        rows = [cls._row(cls._unique(seen, f"method:{prefix}{m['name']}"),
+                         f"🔧 {m['name']}({', '.join(m.get('args', []))})", m['line'], 'method', m['name'])
+                for m in c['methods']]
+        if c['variables']:
+            rows.append(cls._row(f"category:{prefix}variables", "📋 Class Variables",
+                                 source=(cls._variable_rows, c['variables'], prefix)))
+        return rows
+
+    @classmethod
+    def _function_rows(cls, functions: List[Dict], prefix: str) -> List[tuple]:
+        seen: Dict[str, int] = {}
+        return [cls._row(cls._unique(seen, f"function:{prefix}{f['name']}"),
+                         f"⚙️ {f['name']}({', '.join(f.get('args', []))})", f['line'], 'function', f['name'])
+                for f in functions]
+
+    @classmethod
+    def _constant_rows(cls, constants: List[Dict], prefix: str) -> List[tuple]:
+        seen: Dict[str, int] = {}
+        return [cls._row(cls._unique(seen, f"constant:{prefix}{c['name']}"),
+                         f"{c['name']} = {c.get('value', '...')}", c['line'], 'constant', c['name'])
+                for c in constants]
+
+    @classmethod
+    def _variable_rows(cls, variables: List[Dict], prefix: str) -> List[tuple]:
+        seen: Dict[str, int] = {}
+        kind = 'class_variable' if prefix else 'variable'
+        return [cls._row(cls._unique(seen, f"{kind}:{prefix}{v['name']}"), v['name'], v['line'], kind, v['name'])
+                for v in variables]
+
+    @classmethod
+    def _import_rows(cls, imports: List[Dict], prefix: str) -> List[tuple]:
+        seen: Dict[str, int] = {}
+        rows = []
+        for imp in imports:
+            text = f"{imp['type']}: {imp['name']}"
+            if imp.get('alias'):
+                text += f" as {imp['alias']}"
+            rows.append(cls._row(cls._unique(seen, f"import:{prefix}{text}"), text, imp['line'], 'import', imp['name']))
+        return rows
+
+    @staticmethod
+    def _build(node: OutlineNode) -> List[tuple]:
+        if node.source is None:
+            return []
+        builder, payload, prefix = node.source
+        return builder(payload, prefix)
+
+    # ---- updates ----
+
+    def _child_specs(self, node: OutlineNode) -> List[tuple]:
+        if self._filter is not None:
+            return self._filter.get(node.key, [])
+        return self._build(node)
+
+    def update_structure(self, structure: Optional[Dict]):
+        self._structure = structure
+        self._search = None
+        if self._query:
+            self._apply_query()
+        else:
+            self._sync(self._root, QModelIndex(), self.top_rows(structure))
+
+    def clear(self):
+        self.update_structure(None)
+
+    def set_query(self, query: str):
+        """Show only the rows fuzzily matching query, with their ancestors; '' shows all"""
+        query = query.lower()
+        if query == self._query:
+            return
+        self._query = query
+        if query:
+            self._apply_query(relayout=True)
+        else:
+            self._filter = None
+            self.best_match = None
+            self._relayout(self.top_rows(self._structure))
+
+    def _apply_query(self, relayout: bool = False):
+        if self._search is None:
+            self._search = OutlineSearchIndex(self._search_rows())
+        index = self._search.search(self._query) if self._search.rows else {}
+        rows, row_of = self._search.rows, self._search.row_of
+        shown: Set[int] = set()
+        for i in index:
+            while i not in shown:
+                shown.add(i)
+                parent_key = rows[i][0]
+                if not parent_key:
+                    break
+                i = row_of[parent_key]
+        shown_rows: Dict[str, List[tuple]] = {}
+        for i in sorted(shown):
+            parent_key, spec = rows[i]
+            shown_rows.setdefault(parent_key, []).append(spec)
+        self._filter = shown_rows
+        self.best_match = rows[max(index, key=lambda i: (index[i], -i))][1][0] if index else None
+        if relayout:
+            self._relayout(shown_rows.get('', []))
+        else:
+            self._sync(self._root, QModelIndex(), shown_rows.get('', []))
+
+    def _search_rows(self) -> List[Tuple[str, tuple]]:
+        """(parent key, spec) of every row in outline order, without creating nodes"""
+        rows: List[Tuple[str, tuple]] = []
+
+        def walk(parent_key: str, specs: List[tuple]):
+            for spec in specs:
+                rows.append((parent_key, spec))
+                if spec[6] is not None:
+                    builder, payload, prefix = spec[6]
+                    walk(spec[0], builder(payload, prefix))
+
+        walk('', self.top_rows(self._structure))
+        return rows
+
+    def find(self, key: str) -> QModelIndex:
+        """Index of the fetched row with key, searched breadth first"""
+        nodes = list(self._root.children)
+        for node in nodes:
+            if node.key == key:
+                return self.index_of(node)
+            nodes.extend(node.children)
+        return QModelIndex()
+
+    def take_expand_requests(self) -> List[QModelIndex]:
+        """Indexes of the rows created since the last call that start out expanded"""
+        requests, self._expand_requests = self._expand_requests, []
+        return [self.index_of(node) for node in requests if node.parent is not None]
+
+    def _sync(self, node: OutlineNode, parent_index: QModelIndex, specs: List[tuple]):
+        children = node.children
+        wanted = {spec[0] for spec in specs}
+        # Drop the rows that are gone first, a contiguous run at a time, so the
+        # survivors keep their relative order
+        i = len(children)
+        while i > 0:
+            i -= 1
+            if children[i].key in wanted:
+                continue
+            j = i
+            while j > 0 and children[j - 1].key not in wanted:
+                j -= 1
+            self.beginRemoveRows(parent_index, j, i)
+            for child in children[j:i + 1]:
+                child.parent = None
+            del children[j:i + 1]
+            self._renumber(node, j)
+            self.endRemoveRows()
+            i = j
+
+        existing = {child.key: child for child in children}
+        pos = 0
+        while pos < len(specs):
+            spec = specs[pos]
+            current = children[pos] if pos < len(children) else None
+            if current is None or current.key != spec[0]:
+                moved = existing.get(spec[0])
+                if moved is None:
+                    # A run of new rows is inserted in one go
+                    end = pos + 1
+                    while end < len(specs) and specs[end][0] not in existing:
+                        end += 1
+                    self._insert(node, parent_index, pos, specs[pos:end])
+                    pos = end
+                    continue
+                # Moved (e.g. a definition cut and pasted elsewhere)
+                src = moved.row
+                self.beginMoveRows(parent_index, src, src, parent_index, pos)
+                children.insert(pos, children.pop(src))
+                self._renumber(node, pos, src + 1)
+                self.endMoveRows()
+                current = moved
+            index = self.createIndex(pos, 0, current)
+            if current.assign(spec):
+                self.dataChanged.emit(index, index)
+            if current.fetched or (self._filter is not None and current.key in self._filter):
+                # While searching, every row with matches below it is shown open
+                if self._filter is not None:
+                    current.fetched = True
+                    self._expand_requests.append(current)
+                self._sync(current, index, self._child_specs(current))
+            pos += 1
+
+    def _relayout(self, specs: List[tuple]):
+        """Apply a sweeping change, such as a new query, as one layout change.
+
+        Row signals would make Qt re-parent every persistent index (each expanded
+        row of the view) once per inserted run; here the nodes are matched by key
+        without signals and the persistent indexes follow them in one pass.
+        """
+        self.layoutAboutToBeChanged.emit()
+        old = self.persistentIndexList()
+        nodes = [index.internalPointer() for index in old]
+        self._rebuild(self._root, specs)
+        self.changePersistentIndexList(
+            old, [self.index_of(node) if self._attached(node) else QModelIndex() for node in nodes])
+        self.layoutChanged.emit()
+
+    def _rebuild(self, node: OutlineNode, specs: List[tuple]):
+        shown = self._filter
+        existing = {child.key: child for child in node.children}
+        children = []
+        for spec in specs:
+            child = existing.pop(spec[0], None)
+            if child is None:
+                child = OutlineNode(node)
+                if spec[7] and shown is None:
+                    self._expand_requests.append(child)
+            child.assign(spec)
+            children.append(child)
+        for child in existing.values():
+            child.parent = None
+        node.children = children
+        self._renumber(node, 0)
+        for child in children:
+            if shown is not None and child.key in shown:
+                child.fetched = True
+                self._expand_requests.append(child)
+            if child.fetched:
+                self._rebuild(child, self._child_specs(child))
+
+    def _attached(self, node: OutlineNode) -> bool:
+        while node is not self._root:
+            if node.parent is None:
+                return False
+            node = node.parent
+        return True
+
+    def _insert(self, node: OutlineNode, parent_index: QModelIndex, pos: int, specs: List[tuple]):
+        shown = self._filter
+        new_nodes = []
+        for spec in specs:
+            child = OutlineNode(node)
+            child.assign(spec)
+            new_nodes.append(child)
+            if spec[7] if shown is None else spec[0] in shown:
+                self._expand_requests.append(child)
+                # Search results are few; they are filled in right away below
+                # rather than waiting for the view to fetch rows it may only lay out later
+                child.fetched = shown is not None
+        self.beginInsertRows(parent_index, pos, pos + len(new_nodes) - 1)
+        node.children[pos:pos] = new_nodes
+        self._renumber(node, pos)
+        self.endInsertRows()
+        if shown is not None:
+            for child in new_nodes:
+                if child.key in shown:
+                    self._insert(child, self.index_of(child), 0, shown[child.key])
+
+    @staticmethod
+    def _renumber(node: OutlineNode, start: int, stop: Optional[int] = None):
+        children = node.children
+        for i in range(start, len(children) if stop is None else stop):
+            children[i].row = i
+
+    # ---- QAbstractItemModel ----
+
+    def _node(self, index: QModelIndex) -> OutlineNode:
+        return index.internalPointer() if index.isValid() else self._root
+
+    def index_of(self, node: OutlineNode) -> QModelIndex:
+        if node is self._root or node.parent is None:
+            return QModelIndex()
+        return self.createIndex(node.row, 0, node)
+
+    def index(self, row: int, column: int, parent: QModelIndex = QModelIndex()) -> QModelIndex:
+        children = self._node(parent).children
+        if column != 0 or not 0 <= row < len(children):
+            return QModelIndex()
+        return self.createIndex(row, 0, children[row])
+
+    def parent(self, index: QModelIndex) -> QModelIndex:
+        if not index.isValid():
+            return QModelIndex()
+        node = index.internalPointer().parent
+        return self.index_of(node) if node is not None else QModelIndex()
+
+    def rowCount(self, parent: QModelIndex = QModelIndex()) -> int:
+        if parent.column() > 0:
+            return 0
+        return len(self._node(parent).children)
+
+    def columnCount(self, parent: QModelIndex = QModelIndex()) -> int:
+        return 1
+
+    def hasChildren(self, parent: QModelIndex = QModelIndex()) -> bool:
+        node = self._node(parent)
+        if node.fetched:
+            return bool(node.children)
+        return node.source is not None if self._filter is None else node.key in self._filter
+
+    def canFetchMore(self, parent: QModelIndex) -> bool:
+        node = self._node(parent)
+        return not node.fetched and self.hasChildren(parent)
+
+    def fetchMore(self, parent: QModelIndex):
+        node = self._node(parent)
+        if node.fetched:
+            return
+        node.fetched = True
+        specs = self._child_specs(node)
+        if specs:
+            self._insert(node, parent, 0, specs)
+
+    def data(self, index: QModelIndex, role: int = Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        node = index.internalPointer()
+        if role == Qt.DisplayRole:
+            return node.text
+        if role == Qt.UserRole:
+            return node.line
+        if role == Qt.UserRole + 2:
+            return node.kind
+        if role == Qt.UserRole + 3:
+            return node.name
+        if role == self.KEY_ROLE:
+            return node.key
+        if role == Qt.ToolTipRole:
+            return node.tooltip
+        if role == Qt.ForegroundRole and node.key == self.ERROR_KEY:
+            return QBrush(QColor(255, 0, 0))
+        return None
+
+    def headerData(self, section: int, orientation, role: int = Qt.DisplayRole):
+        if orientation == Qt.Horizontal and role == Qt.DisplayRole and section == 0:
+            return "Code Structure"
+        return None
+
+
+class SymbolListModel(QAbstractListModel):
+    """Flat symbol list for the toolbar combo, formatted only when shown"""
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._rows: List[Tuple[str, Dict, str]] = []  # (kind, entry, owning class)
+
+    def set_structure(self, structure: Optional[Dict]):
+        rows = []
+        if structure:
+            for cls in structure.get('classes', []):
+                rows.append(("Class", cls, ''))
+                rows.extend(("Method", m, cls['name']) for m in cls.get('methods', []))
+            rows.extend(("Function", func, '') for func in structure.get('functions', []))
+            rows.extend(("Variable", var, '') for var in structure.get('variables', []))
+        self.beginResetModel()
+        self._rows = rows
+        self.endResetModel()
+
+    def rowCount(self, parent: QModelIndex = QModelIndex()) -> int:
+        return 0 if parent.isValid() else len(self._rows)
+
+    def data(self, index: QModelIndex, role: int = Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        kind, entry, owner = self._rows[index.row()]
+        if role == Qt.DisplayRole:
+            if kind == "Method":
+                return f"{kind}: {owner}.{entry['name']}()"
+            if kind == "Function":
+                return f"{kind}: {entry['name']}()"
+            return f"{kind}: {entry['name']}"
+        if role == Qt.UserRole:
+            return entry['line']
+        return None
+
+
+class EnhancedCodeNavigationTree(QTreeView):
+    KEY_ROLE = OutlineModel.KEY_ROLE
+    rename_requested = pyqtSignal(int)  # line of the class or def to rename
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.outline_model = OutlineModel(self)
+        self.setModel(self.outline_model)
+        self.setUniformRowHeights(True)
+        self.clicked.connect(self.on_item_clicked)
         self.editor = None
         self.setup_context_menu()
 
@@ -948,61 +2181,68 @@ class EnhancedCodeNavigationTree(QTreeWidget):
             QColor(128, 0, 128, 80),    # Purple
         ]
         self._color_index = 0
-        self._highlighted_blocks = {}  # item_id -> (start_line, end_line, color)
+        self._highlighted_blocks = {}  # row key -> (start_line, end_line, color)
 
     def setup_context_menu(self):
         self.setContextMenuPolicy(Qt.CustomContextMenu)
         self.customContextMenuRequested.connect(self.show_context_menu)
 
     def show_context_menu(self, position):
-        item = self.itemAt(position)
-        if item:
+        index = self.indexAt(position)
+        if index.isValid():
+            # The outline may be updated while the menu is open
+            item = QPersistentModelIndex(index)
             menu = QMenu()
             jump_action = menu.addAction("Jump to Definition")
-            jump_action.triggered.connect(lambda: self.on_item_clicked(item, 0))
+            jump_action.triggered.connect(lambda: self.on_item_clicked(QModelIndex(item)))
 
             # Highlight structure block
-            kind = item.data(0, Qt.UserRole + 2)
+            kind = index.data(Qt.UserRole + 2)
             if kind in ('class', 'function', 'method'):
                 highlight_action = menu.addAction("Highlight Structure Block")
-                highlight_action.triggered.connect(lambda: self._highlight_structure_block(item))
+                highlight_action.triggered.connect(lambda: self._highlight_structure_block(QModelIndex(item)))
 
                 # Remove highlight if present
-                item_id = id(item)
-                if item_id in self._highlighted_blocks:
+                row_key = index.data(self.KEY_ROLE)
+                if row_key in self._highlighted_blocks:
                     remove_highlight_action = menu.addAction("Remove Highlight")
-                    remove_highlight_action.triggered.connect(lambda: self._remove_structure_highlight(item))
+                    remove_highlight_action.triggered.connect(
+                        lambda: self._remove_structure_highlight(QModelIndex(item)))
 
             # Replace block action
             rename_action = menu.addAction("Replace Block...")
             rename_action.setEnabled(kind in ('class', 'function', 'method'))
-            rename_action.triggered.connect(lambda: self._rename_item(item))
+            rename_action.triggered.connect(lambda: self._rename_item(QModelIndex(item)))
+            rename_symbol_action = menu.addAction("Rename Symbol...")
+            rename_symbol_action.setEnabled(kind in ('class', 'function', 'method'))
+            rename_symbol_action.triggered.connect(
+                lambda: self.rename_requested.emit(int(QModelIndex(item).data(Qt.UserRole))))
 
-            menu.exec_(self.mapToGlobal(position))
+            menu.exec_(self.viewport().mapToGlobal(position))
 
-    def _highlight_structure_block(self, item: QTreeWidgetItem):
-        if not self.editor or not item:
+    def _highlight_structure_block(self, index: QModelIndex):
+        if not self.editor or not index.isValid():
             return
-        kind = item.data(0, Qt.UserRole + 2)
+        kind = index.data(Qt.UserRole + 2)
         if kind not in ('class', 'function', 'method'):
             return
 
-        start_line = int(item.data(0, Qt.UserRole))
+        start_line = int(index.data(Qt.UserRole))
         start, end = self.editor.compute_block_range(start_line)
 
         color = self._highlight_colors[self._color_index]
         self._color_index = (self._color_index + 1) % len(self._highlight_colors)
 
-        item_id = id(item)
-        self._highlighted_blocks[item_id] = (start, end, color)
+        row_key = index.data(self.KEY_ROLE)
+        self._highlighted_blocks[row_key] = (start, end, color)
         self._apply_all_highlights()
 
-    def _remove_structure_highlight(self, item: QTreeWidgetItem):
-        if not self.editor or not item:
+    def _remove_structure_highlight(self, index: QModelIndex):
+        if not self.editor or not index.isValid():
             return
-        item_id = id(item)
-        if item_id in self._highlighted_blocks:
-            del self._highlighted_blocks[item_id]
+        row_key = index.data(self.KEY_ROLE)
+        if row_key in self._highlighted_blocks:
+            del self._highlighted_blocks[row_key]
         self._apply_all_highlights()
 
     def _apply_all_highlights(self):
@@ -1039,18 +2279,18 @@ class EnhancedCodeNavigationTree(QTreeWidget):
         if self.editor:
             self.editor.set_structure_highlight_color(color)
 
-    def _highlight_item_block(self, item: QTreeWidgetItem):
+    def _highlight_item_block(self, index: QModelIndex):
         if not self.editor:
             return
-        if not item or not item.data(0, Qt.UserRole):
+        if not index.isValid() or not index.data(Qt.UserRole):
             return
-        kind = item.data(0, Qt.UserRole + 2)
-        start_line = int(item.data(0, Qt.UserRole))
+        kind = index.data(Qt.UserRole + 2)
+        start_line = int(index.data(Qt.UserRole))
 
         self._apply_all_highlights()
 
-        item_id = id(item)
-        if item_id not in self._highlighted_blocks and kind in ('class', 'function', 'method'):
+        row_key = index.data(self.KEY_ROLE)
+        if row_key not in self._highlighted_blocks and kind in ('class', 'function', 'method'):
             start, end = self.editor.compute_block_range(start_line)
             doc_blocks = self.editor.blockCount()
             start_line = max(1, min(start, doc_blocks))
@@ -1066,15 +2306,19 @@ class EnhancedCodeNavigationTree(QTreeWidget):
                     self.editor._structure_selections.append(sel)
             self.editor.highlight_current_line()
 
-    def _rename_item(self, item: QTreeWidgetItem):
-        if not self.editor or not item:
+    def _rename_item(self, index: QModelIndex):
+        if not self.editor or not index.isValid():
             return
-        kind = item.data(0, Qt.UserRole + 2)
-        old_name = item.data(0, Qt.UserRole + 3)
+        kind = index.data(Qt.UserRole + 2)
+        old_name = index.data(Qt.UserRole + 3)
         if kind not in ('class', 'function', 'method') or not old_name:
             return
 
-        start_line = int(item.data(0, Qt.UserRole))
+        if not self.editor.block_index.ready:
+            self.editor.request_structure()
+            QMessageBox.information(self, "Replace Block", "The outline is still being analyzed; try again in a moment.")
+            return
+        start_line = int(index.data(Qt.UserRole))
         start, end = self.editor.compute_block_range(start_line)
         old_code = self.editor.get_block_text(start, end)
         dlg = ReplaceBlockDialog(kind, old_name, old_code, self)
@@ -1091,95 +2335,36 @@ class EnhancedCodeNavigationTree(QTreeWidget):
                 self.editor.setTextCursor(cursor)
                 self.editor.centerCursor()
 
-    def update_structure(self, code_text: str):
-        self.clear()
-        structure = CodeStructureParser.parse_code(code_text)
-        if 'error' in structure:
-            error_item = QTreeWidgetItem(self, [f"Syntax Error: {structure['error']}"])
-            error_item.setForeground(0, QBrush(QColor(255, 0, 0)))
-            return
-
-        # Order: Classes -> Functions -> Others (Constants, Variables, Imports)
+    def update_structure(self, structure: Dict):
+        """Reconcile the outline with a CodeStructureParser result (see OutlineModel)"""
+        self.setUpdatesEnabled(False)
+        try:
+            self.outline_model.update_structure(structure)
+            self._expand_new_rows()
+        finally:
+            self.setUpdatesEnabled(True)
+        self._refine_highlights()
 
-        # classes
-        if structure['classes']:
-            classes_item = QTreeWidgetItem(self, ["🏛️ Classes"])
-            classes_item.setExpanded(True)
-            for cls in structure['classes']:
-                class_name = f"🏛️ {cls['name']}"
-                if cls.get('bases'):
-                    class_name += f"({', '.join(cls['bases'])})"
-
-                class_item = QTreeWidgetItem(classes_item, [class_name])
-                class_item.setData(0, Qt.UserRole, cls['line'])
-                class_item.setData(0, Qt.UserRole + 2, 'class')
-                class_item.setData(0, Qt.UserRole + 3, cls['name'])
-
-                # Methods
-                for method in cls['methods']:
-                    args_str = ', '.join(method.get('args', []))
-                    method_display = f"🔧 {method['name']}({args_str})"
-                    method_item = QTreeWidgetItem(class_item, [method_display])
-                    method_item.setData(0, Qt.UserRole, method['line'])
-                    method_item.setData(0, Qt.UserRole + 2, 'method')
-                    method_item.setData(0, Qt.UserRole + 3, method['name'])
-
-                # Class variables
-                if cls['variables']:
-                    vars_item = QTreeWidgetItem(class_item, ["📋 Class Variables"])
-                    for var in cls['variables']:
-                        var_display = f"{var['name']}"
-                        vi = QTreeWidgetItem(vars_item, [var_display])
-                        vi.setData(0, Qt.UserRole, var['line'])
-                        vi.setData(0, Qt.UserRole + 2, 'class_variable')
-                        vi.setData(0, Qt.UserRole + 3, var['name'])
-
-        # functions
-        if structure['functions']:
-            functions_item = QTreeWidgetItem(self, ["⚙️ Functions"])
-            functions_item.setExpanded(True)
-            for func in structure['functions']:
-                args_str = ', '.join(func.get('args', []))
-                func_display = f"⚙️ {func['name']}({args_str})"
-                func_item = QTreeWidgetItem(functions_item, [func_display])
-                func_item.setData(0, Qt.UserRole, func['line'])
-                func_item.setData(0, Qt.UserRole + 2, 'function')
-                func_item.setData(0, Qt.UserRole + 3, func['name'])
-
-        # constants
-        if structure['constants']:
-            constants_item = QTreeWidgetItem(self, ["🔢 Constants"])
-            constants_item.setExpanded(True)
-            for const in structure['constants']:
-                display_name = f"{const['name']} = {const.get('value', '...')}"
-                item = QTreeWidgetItem(constants_item, [display_name])
-                item.setData(0, Qt.UserRole, const['line'])
-                item.setData(0, Qt.UserRole + 2, 'constant')
-                item.setData(0, Qt.UserRole + 3, const['name'])
-
-        # variables
-        if structure['variables']:
-            variables_item = QTreeWidgetItem(self, ["📊 Variables"])
-            variables_item.setExpanded(False)
-            for var in structure['variables']:
-                var_display = f"{var['name']}"
-                vi = QTreeWidgetItem(variables_item, [var_display])
-                vi.setData(0, Qt.UserRole, var['line'])
-                vi.setData(0, Qt.UserRole + 2, 'variable')
-                vi.setData(0, Qt.UserRole + 3, var['name'])
-
-        # imports
-        if structure['imports']:
-            imports_item = QTreeWidgetItem(self, ["📦 Imports"])
-            imports_item.setExpanded(True)
-            for imp in structure['imports']:
-                display_name = f"{imp['type']}: {imp['name']}"
-                if imp.get('alias'):
-                    display_name += f" as {imp['alias']}"
-                item = QTreeWidgetItem(imports_item, [display_name])
-                item.setData(0, Qt.UserRole, imp['line'])
-                item.setData(0, Qt.UserRole + 2, 'import')
-                item.setData(0, Qt.UserRole + 3, imp['name'])
+    def _refine_highlights(self):
+        """Widen highlights made before the block ranges were known"""
+        if not self.editor or not self.editor.block_index.ready:
+            return
+        refined = False
+        for key, (start, end, color) in self._highlighted_blocks.items():
+            if start == end:
+                block = self.editor.block_index.block_at(start)
+                if block and block[1] != end:
+                    self._highlighted_blocks[key] = (start, block[1], color)
+                    refined = True
+        if refined:
+            self._apply_all_highlights()
+
+    def clear(self):
+        self.outline_model.clear()
+
+    def _expand_new_rows(self):
+        for index in self.outline_model.take_expand_requests():
+            self.expand(index)
 
     def search_items(self, text: str):
         self.search_timer.stop()
@@ -1187,71 +2372,2098 @@ class EnhancedCodeNavigationTree(QTreeWidget):
         self.search_timer.start(300)
 
     def perform_search(self):
-        if not hasattr(self, 'search_text') or not self.search_text:
-            self.show_all_items()
-            return
-        text = self.search_text.lower()
-        for i in range(self.topLevelItemCount()):
-            self.hide_item_recursive(self.topLevelItem(i))
-        for i in range(self.topLevelItemCount()):
-            self.show_matching_items(self.topLevelItem(i), text)
-
-    def hide_item_recursive(self, item):
-        item.setHidden(True)
-        for i in range(item.childCount()):
-            self.hide_item_recursive(item.child(i))
-
-    def show_matching_items(self, item, search_text):
-        has_matching_child = False
-        for i in range(item.childCount()):
-            child = item.child(i)
-            if self.show_matching_items(child, search_text):
-                has_matching_child = True
-        item_matches = search_text in item.text(0).lower()
-        if item_matches or has_matching_child:
-            item.setHidden(False)
-            item.setExpanded(True)
-            return True
-        return False
-
-    def show_all_items(self):
-        for i in range(self.topLevelItemCount()):
-            self.show_item_recursive(self.topLevelItem(i))
-
-    def show_item_recursive(self, item):
-        item.setHidden(False)
-        for i in range(item.childCount()):
-            self.show_item_recursive(item.child(i))
+        model = self.outline_model
+        self.setUpdatesEnabled(False)
+        try:
+            model.set_query(getattr(self, 'search_text', ''))
+            self._expand_new_rows()
+            if model.best_match is not None:
+                best = model.find(model.best_match)
+                self.setCurrentIndex(best)
+                self.scrollTo(best)
+        finally:
+            self.setUpdatesEnabled(True)
 
-    def on_item_clicked(self, item, column):
-        if self.editor and item.data(0, Qt.UserRole):
-            line_number = int(item.data(0, Qt.UserRole))
+    def on_item_clicked(self, index: QModelIndex):
+        if self.editor and index.isValid() and index.data(Qt.UserRole):
+            line_number = int(index.data(Qt.UserRole))
             cursor = self.editor.textCursor()
             cursor.movePosition(QTextCursor.Start)
             cursor.movePosition(QTextCursor.Down, QTextCursor.MoveAnchor, line_number - 1)
             self.editor.setTextCursor(cursor)
             self.editor.centerCursor()
             self.editor.update_click_highlight()
-            self._highlight_item_block(item)
+            self._highlight_item_block(index)
             self.editor.setFocus()
 
-# =============================
-# Python Version Detector
-# =============================
+# =============================
+# Background Code Analysis
+# =============================
+
+class SemanticTokenCollector(ast.NodeVisitor):
+    """Classifies identifiers of a parsed module: parameters, locals, attributes, classes, modules"""
+
+    def __init__(self, lines: List[str], line_offset: int = 0):
+        self.lines = lines
+        self.line_offset = line_offset
+        self.tokens: Dict[int, List[Tuple[int, str, str]]] = {}
+        self._scopes: List[Tuple[str, Dict[str, str]]] = []
+
+    @classmethod
+    def collect_statement(cls, stmt: ast.AST, module_names: Dict[str, str], lines: List[str],
+                          line_offset: int = 0) -> Dict[int, List[Tuple[int, str, str]]]:
+        """Return {0-based line: [(column, name, kind), ...]} for one top-level statement.
+
+        Line keys are in the statement's own AST coordinates; lines[key + line_offset]
+        is the text of that line. module_names comes from module_bindings().
+        """
+        collector = cls(lines, line_offset)
+        collector._scopes.append(('module', module_names))
+        collector.visit(stmt)
+        for line_tokens in collector.tokens.values():
+            line_tokens.sort()
+        return collector.tokens
+
+    @classmethod
+    def module_bindings(cls, body: List[ast.AST]) -> Dict[str, str]:
+        """Names bound by the given top-level statements"""
+        return cls._bindings(body)
+
+    @staticmethod
+    def _bindings(body: List[ast.AST], params: Tuple[str, ...] = ()) -> Dict[str, str]:
+        """Names bound directly in a scope, without descending into nested scopes"""
+        names: Dict[str, str] = {}
+        declared: Set[str] = set()
+        stack = list(body)
+        while stack:
+            node = stack.pop()
+            if isinstance(node, ast.ClassDef):
+                names[node.name] = 'class'
+                stack.extend(node.decorator_list + node.bases)
+                continue
+            if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)):
+                names.setdefault(node.name, 'local')
+                stack.extend(node.decorator_list)
+                continue
+            if isinstance(node, ast.Lambda):
+                continue
+            if isinstance(node, ast.Import):
+                for alias in node.names:
+                    names[alias.asname or alias.name.split('.')[0]] = 'module'
+                continue
+            if isinstance(node, (ast.Global, ast.Nonlocal)):
+                declared.update(node.names)
+                continue
+            if isinstance(node, ast.Name) and isinstance(node.ctx, (ast.Store, ast.Del)):
+                names.setdefault(node.id, 'local')
+            stack.extend(ast.iter_child_nodes(node))
+        for p in params:
+            names[p] = 'parameter'
+        for d in declared:
+            names.pop(d, None)
+        return names
+
+    def _lookup(self, name: str) -> Optional[str]:
+        innermost = True
+        for scope_type, names in reversed(self._scopes):
+            # Class bodies are not visible from the functions nested in them
+            if scope_type == 'class' and not innermost:
+                continue
+            kind = names.get(name)
+            if kind is not None:
+                if scope_type == 'module' and kind == 'local':
+                    return None
+                return kind
+            innermost = False
+        return None
+
+    def _add(self, lineno: int, byte_col: int, name: str, kind: str):
+        idx = lineno - 1
+        text_idx = idx + self.line_offset
+        if text_idx < 0 or text_idx >= len(self.lines) or name == 'self':
+            return
+        line = self.lines[text_idx]
+        # AST columns are UTF-8 byte offsets
+        col = byte_col if line.isascii() else len(line.encode('utf-8')[:byte_col].decode('utf-8', 'ignore'))
+        self.tokens.setdefault(idx, []).append((col, name, kind))
+
+    def _visit_function(self, node, params: List[ast.arg], body: List[ast.AST]):
+        for a in params:
+            self._add(a.lineno, a.col_offset, a.arg, 'parameter')
+            if a.annotation is not None:
+                self.visit(a.annotation)
+        self._scopes.append(('function', self._bindings(body, tuple(a.arg for a in params))))
+        for stmt in body:
+            self.visit(stmt)
+        self._scopes.pop()
+
+    @staticmethod
+    def _all_args(args: ast.arguments) -> List[ast.arg]:
+        params = list(getattr(args, 'posonlyargs', [])) + list(args.args) + list(args.kwonlyargs)
+        if args.vararg:
+            params.append(args.vararg)
+        if args.kwarg:
+            params.append(args.kwarg)
+        return params
+
+    def visit_FunctionDef(self, node):
+        for dec in node.decorator_list:
+            self.visit(dec)
+        for default in node.args.defaults + [d for d in node.args.kw_defaults if d is not None]:
+            self.visit(default)
+        if node.returns is not None:
+            self.visit(node.returns)
+        self._visit_function(node, self._all_args(node.args), node.body)
+
+    visit_AsyncFunctionDef = visit_FunctionDef
+
+    def visit_Lambda(self, node):
+        for default in node.args.defaults:
+            self.visit(default)
+        self._visit_function(node, self._all_args(node.args), [node.body])
+
+    def visit_ClassDef(self, node):
+        for expr in node.decorator_list + node.bases:
+            self.visit(expr)
+        for kw in node.keywords:
+            self.visit(kw.value)
+        self._scopes.append(('class', self._bindings(node.body)))
+        for stmt in node.body:
+            self.visit(stmt)
+        self._scopes.pop()
+
+    def visit_Name(self, node):
+        kind = self._lookup(node.id)
+        if kind is not None:
+            self._add(node.lineno, node.col_offset, node.id, kind)
+
+    def visit_Attribute(self, node):
+        self.visit(node.value)
+        end_lineno = getattr(node, 'end_lineno', None)
+        if end_lineno is not None:
+            self._add(end_lineno, node.end_col_offset - len(node.attr), node.attr, 'attribute')
+
+
+class IncrementalStructureParser:
+    """Structure and semantic tokens of one document, re-parsing only the statements around each edit"""
+    # Column-0 lines that continue the statement above rather than start one
+    CLAUSE_RE = re.compile(r'(?:else|elif|except|finally)\b')
+    MAX_MERGE = 8  # following chunks tried together with one that fails on its own
+
+    def __init__(self):
+        self._stmts: List[Dict] = []
+        self._line_count = 0
+        self._module_names: Dict[str, str] = {}
+        self._parsed = False
+        # Lines unchanged at the start/end of the document since the last successful parse
+        self._same_head = 0
+        self._same_tail = 0
+
+    def note_edit(self, same_head: int, same_tail: int):
+        """Record an edit reported as unchanged leading and trailing line counts"""
+        self._same_head = min(self._same_head, same_head)
+        self._same_tail = min(self._same_tail, same_tail)
+
+    def update(self, code_text: str) -> Tuple[Dict, Any]:
+        """Return (structure, tokens) for code_text, in the format of CodeStructureParser"""
+        lines = code_text.split('\n')
+        if not self._parsed:
+            try:
+                tree = ast.parse(code_text)
+            except SyntaxError:
+                # Nothing good to fall back on: recover the whole file
+                return self._recover(lines, 0, 0, 1, len(lines), (1, 0, 0))
+            self._module_names = self._visible(SemanticTokenCollector.module_bindings(tree.body))
+            self._stmts = [self._record(node, 0, lines) for node in tree.body]
+            # Statement spans need end_lineno (Python 3.8+); without it every update is a full parse
+            self._parsed = all(getattr(node, 'end_lineno', None) is not None for node in tree.body)
+            self._accept(lines)
+            return self._assemble(self._stmts)
+
+        old_count, new_count = self._line_count, len(lines)
+        head = min(self._same_head, old_count, new_count)
+        tail = min(self._same_tail, old_count - head, new_count - head)
+        delta = new_count - old_count
+        first_changed, last_changed = head + 1, old_count - tail  # old 1-based lines
+        if first_changed > last_changed and not delta:
+            return self._assemble(self._stmts)
+
+        stmts = self._stmts
+        i = bisect_left([r['end'] for r in stmts], first_changed)
+        j = bisect_right([r['start'] for r in stmts], last_changed)
+        # A region that fails alone is retried with one more statement on each
+        # side: an 'else:' or indented lines may belong to the statement above,
+        # a decorator or backslash to the one below
+        for widen in (0, 1):
+            wi, wj, start, end = self._region(max(0, i - widen), min(len(stmts), j + widen), delta)
+            try:
+                segment = ast.parse('\n'.join(lines[start - 1:end]))
+            except SyntaxError:
+                continue
+            self._splice(lines, wi, wj, start, segment, delta)
+            self._accept(lines)
+            return self._assemble(self._stmts)
+        i, j, start, end = self._region(i, j, delta)
+        return self._recover(lines, i, j, start, end, (first_changed, last_changed, delta))
+
+    def _accept(self, lines: List[str]):
+        self._line_count = len(lines)
+        self._same_head = self._same_tail = len(lines)
+
+    def _region(self, i: int, j: int, delta: int) -> Tuple[int, int, int, int]:
+        """Widen statements [i, j) so none sharing a line ("a = 1; b = 2") is split,
+        and return them with the new 1-based lines between their untouched neighbours"""
+        stmts = self._stmts
+        while 0 < i < len(stmts) and stmts[i - 1]['end'] >= stmts[i]['start']:
+            i -= 1
+        while 0 < j < len(stmts) and stmts[j]['start'] <= stmts[j - 1]['end']:
+            j += 1
+        start = stmts[i - 1]['end'] + 1 if i > 0 else 1
+        end = (stmts[j]['start'] - 1 if j < len(stmts) else self._line_count) + delta
+        return i, j, start, end
+
+    def _splice(self, lines: List[str], i: int, j: int, start: int, segment: ast.Module, delta: int):
+        stmts = self._stmts
+        tail_stmts = stmts[j:]
+        for r in tail_stmts:
+            r['start'] += delta
+            r['end'] += delta
+            r['offset'] += delta
+        self._refresh_module_names(stmts[:i] + tail_stmts, segment.body, lines)
+        offset = start - 1
+        self._stmts = stmts[:i] + [self._record(node, offset, lines) for node in segment.body] + tail_stmts
+
+    def _refresh_module_names(self, kept: List[Dict], new_nodes: List[ast.AST], lines: List[str]):
+        module_names = self._visible(SemanticTokenCollector.module_bindings(
+            [r['node'] for r in kept] + new_nodes))
+        if module_names != self._module_names:
+            # A module-level class, function or import changed kind: every token may differ
+            self._module_names = module_names
+            for r in kept:
+                r['tokens'] = SemanticTokenCollector.collect_statement(
+                    r['node'], module_names, lines, r['offset'])
+
+    def _recover(self, lines: List[str], i: int, j: int, start: int, end: int,
+                 edit: Tuple[int, int, int]) -> Tuple[Dict, Any]:
+        """Result for statements [i, j) whose new lines start..end do not parse.
+
+        The last good statements stay untouched for the next update; the result
+        uses copies, moved by the edit's line delta where needed.
+        """
+        delta = edit[2]
+        stmts = self._stmts
+        after = [dict(r, start=r['start'] + delta, end=r['end'] + delta, offset=r['offset'] + delta)
+                 for r in stmts[j:]]
+        chunks = self._chunks(lines, start, end)
+        nodes: List[Tuple[ast.AST, int]] = []
+        broken: List[Tuple[int, int]] = []
+        error = None
+        k = 0
+        while k < len(chunks):
+            first = chunks[k][0]
+            chunk_error = None
+            for m in range(k, min(len(chunks), k + self.MAX_MERGE)):
+                try:
+                    tree = ast.parse('\n'.join(lines[first - 1:chunks[m][1]]))
+                except SyntaxError as e:
+                    if m == k:
+                        chunk_error = f"{e.msg} (line {first - 1 + (e.lineno or 1)})"
+                    continue
+                nodes.extend((node, first - 1) for node in tree.body)
+                k = m + 1
+                break
+            else:
+                broken.append(chunks[k])
+                error = error or chunk_error
+                k += 1
+
+        # Module-level names (and so the tokens of untouched statements) stay as of
+        # the last good parse until the code is valid again
+        # Where a chunk is broken, show what the statements there were last time,
+        # in place of any half of them that still parses
+        stale = [self._moved_record(r, edit) for r in stmts[i:j]]
+        stale = [r for r in stale if any(r['start'] <= b_end and b_start <= r['end'] for b_start, b_end in broken)]
+        middle = [self._record(node, offset, lines) for node, offset in nodes]
+        middle = [r for r in middle if not any(r['start'] <= o['end'] and o['start'] <= r['end'] for o in stale)]
+        middle.extend(stale)
+        middle.sort(key=lambda r: r['start'])
+        structure, tokens = self._assemble(stmts[:i] + middle + after)
+        if not broken:
+            broken = [(start, max(start, end))]
+        structure['error'] = error or f"invalid syntax (line {broken[0][0]})"
+        structure['error_range'] = (broken[0][0], broken[-1][1])
+        return structure, tokens
+
+    @staticmethod
+    def _moved_line(line: int, edit: Tuple[int, int, int]) -> int:
+        """New position of an old line; lines inside the edit stay put"""
+        _first, last_changed, delta = edit
+        return line + delta if line > last_changed else line
+
+    @classmethod
+    def _moved_record(cls, r: Dict, edit: Tuple[int, int, int]) -> Dict:
+        """Copy of an old statement record whose inside was edited"""
+        offset = r['offset']
+        moved = lambda line: max(1, cls._moved_line(line + offset, edit) - offset)
+
+        def moved_entry(e: Dict) -> Dict:
+            e = dict(e, line=moved(e['line']))
+            if 'end_line' in e:
+                e['end_line'] = moved(e['end_line'])
+            if 'methods' in e:
+                e['methods'] = [moved_entry(m) for m in e['methods']]
+                e['variables'] = [moved_entry(v) for v in e['variables']]
+            return e
+
+        fragment = {key: [moved_entry(e) for e in r['structure'][key]] for key in CodeStructureParser.CATEGORIES}
+        fragment['blocks'] = [(moved(s), moved(e)) for s, e in r['structure']['blocks']]
+        tokens = {moved(idx + 1) - 1: line_tokens for idx, line_tokens in r['tokens'].items()}
+        return dict(r, start=cls._moved_line(r['start'], edit), end=cls._moved_line(r['end'], edit),
+                    structure=fragment, tokens=tokens)
+
+    @classmethod
+    def _chunks(cls, lines: List[str], start: int, end: int) -> List[Tuple[int, int]]:
+        """Split lines start..end into likely top-level statements (1-based, inclusive)"""
+        chunks = []
+        chunk_start = start
+        decorators_only = False
+        for n in range(start, end + 1):
+            text = lines[n - 1]
+            if text[:1] in ('', ' ', '\t', '#'):
+                continue
+            if n == chunk_start:
+                decorators_only = text.startswith('@')
+                continue
+            if (decorators_only or text[0] in ')]}' or lines[n - 2].endswith('\\')
+                    or cls.CLAUSE_RE.match(text)):
+                decorators_only = decorators_only and text.startswith('@')
+            else:
+                chunks.append((chunk_start, n - 1))
+                chunk_start = n
+                decorators_only = text.startswith('@')
+        if chunk_start <= end:
+            chunks.append((chunk_start, end))
+        return chunks
+
+    @staticmethod
+    def _span(node: ast.AST) -> Tuple[int, int]:
+        start = min([node.lineno] + [d.lineno for d in getattr(node, 'decorator_list', ())])
+        return start, getattr(node, 'end_lineno', None) or node.lineno
+
+    def _record(self, node: ast.AST, offset: int, lines: List[str]) -> Dict:
+        start, end = self._span(node)
+        return {
+            'start': start + offset, 'end': end + offset, 'offset': offset, 'node': node,
+            'structure': CodeStructureParser.structure_of(node),
+            'tokens': SemanticTokenCollector.collect_statement(node, self._module_names, lines, offset),
+        }
+
+    @staticmethod
+    def _visible(bindings: Dict[str, str]) -> Dict[str, str]:
+        # Module-level 'local' names resolve to nothing, exactly like unbound ones
+        return {name: kind for name, kind in bindings.items() if kind != 'local'}
+
+    @staticmethod
+    def _assemble(stmts: List[Dict]) -> Tuple[Dict, Any]:
+        shifted = CodeStructureParser.shifted_entry
+        structure: Dict[str, Any] = {key: [] for key in CodeStructureParser.CATEGORIES}
+        blocks: List[Tuple[int, int]] = []
+        tokens: Dict[int, List[Tuple[int, str, str]]] = {}
+        for r in stmts:
+            offset = r['offset']
+            fragment = r['structure']
+            for key in CodeStructureParser.CATEGORIES:
+                entries = fragment[key]
+                if entries:
+                    structure[key].extend(entries if not offset else [shifted(e, offset) for e in entries])
+            blocks.extend(fragment['blocks'] if not offset
+                          else [(s + offset, e + offset) for s, e in fragment['blocks']])
+            for idx, line_tokens in r['tokens'].items():
+                if idx + offset in tokens:
+                    tokens[idx + offset] = sorted(tokens[idx + offset] + line_tokens)
+                else:
+                    tokens[idx + offset] = line_tokens
+        structure['blocks'] = blocks
+        return structure, tokens
+
+
+class AnalysisCache:
+    """LRU of (structure, semantic tokens) by code hash, shared by all tabs; results are read-only"""
+
+    def __init__(self, size: int = 32):
+        self._size = size
+        self._entries: 'OrderedDict[bytes, Tuple[Dict, Any]]' = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key_for(code_text: str) -> bytes:
+        return hashlib.blake2b(code_text.encode('utf-8', 'surrogatepass'), digest_size=16).digest()
+
+    def get(self, key: bytes) -> Optional[Tuple[Dict, Any]]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            return entry
+
+    def put(self, key: bytes, structure: Dict, tokens):
+        with self._lock:
+            self._entries[key] = (structure, tokens)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self._size:
+                self._entries.popitem(last=False)
+
+
+class CodeAnalysisWorker(QObject):
+    """Parses code and collects semantic tokens; lives in the analysis thread"""
+    finished = pyqtSignal(object, int, object, object)  # key, generation, structure, tokens
+    failed = pyqtSignal(object, str)  # key, message
+
+    def __init__(self, cache: AnalysisCache):
+        super().__init__()
+        self._cache = cache
+        self._latest: Dict[Any, int] = {}
+        self._documents: Dict[Any, IncrementalStructureParser] = {}
+
+    def mark_latest(self, key, generation: int):
+        # Called from the UI thread; a plain dict store is atomic under the GIL
+        self._latest[key] = generation
+
+    def forget(self, key):
+        self._latest.pop(key, None)
+        self._documents.pop(key, None)
+
+    def _is_stale(self, key, generation: int) -> bool:
+        return self._latest.get(key) != generation
+
+    @pyqtSlot(object, int, str, object)
+    def analyze(self, key, generation: int, code_text: str, edit: Optional[Tuple[int, int]]):
+        document = self._documents.get(key)
+        # Edits must reach the document even when this request is already stale
+        if document is not None and edit is not None:
+            document.note_edit(*edit)
+        if self._is_stale(key, generation):
+            return
+        cache_key = AnalysisCache.key_for(code_text)
+        cached = self._cache.get(cache_key)
+        if cached is not None and cached[1] is not None:
+            structure, tokens = cached
+        else:
+            if document is None:
+                document = self._documents[key] = IncrementalStructureParser()
+            try:
+                structure, tokens = document.update(code_text)
+            except Exception as e:
+                self._documents.pop(key, None)
+                self.failed.emit(key, f"Code analysis failed: {e}")
+                return
+            self._cache.put(cache_key, structure, tokens)
+        if not self._is_stale(key, generation):
+            self.finished.emit(key, generation, structure, tokens)
+
+
+class CodeAnalysisService(QObject):
+    """Process-wide analysis thread shared by all editors"""
+    analysis_ready = pyqtSignal(object, int, object, object)  # key, generation, structure, tokens
+    analysis_failed = pyqtSignal(object, str)  # key, message
+    _submit = pyqtSignal(object, int, str, object)
+
+    _instance: Optional['CodeAnalysisService'] = None
+
+    def __init__(self):
+        super().__init__()
+        self._generation = 0
+        self.cache = AnalysisCache()
+        self._thread = QThread()
+        self._worker = CodeAnalysisWorker(self.cache)
+        self._worker.moveToThread(self._thread)
+        self._submit.connect(self._worker.analyze)
+        self._worker.finished.connect(self.analysis_ready)
+        self._worker.failed.connect(self.analysis_failed)
+        self._thread.start()
+
+    @classmethod
+    def instance(cls) -> 'CodeAnalysisService':
+        if cls._instance is None:
+            cls._instance = cls()
+        return cls._instance
+
+    @classmethod
+    def shutdown(cls):
+        if cls._instance is not None:
+            cls._instance._thread.quit()
+            cls._instance._thread.wait(3000)
+            cls._instance = None
+
+    def request(self, key, code_text: str, edit: Optional[Tuple[int, int]] = None) -> int:
+        """Queue an analysis; any pending request for the same key becomes stale.
+
+        edit is (unchanged leading lines, unchanged trailing lines) since the
+        previous request for key, and lets the worker re-parse only that region.
+        """
+        self._generation += 1
+        self._worker.mark_latest(key, self._generation)
+        self._submit.emit(key, self._generation, code_text, edit)
+        return self._generation
+
+    def cancel(self, key):
+        self._worker.forget(key)
+
+# =============================
+# Project Symbol Index
+# =============================
+
+class SourceColumns:
+    """Character columns of AST positions in the lines of one source text"""
+    DEF_NAME_RE = re.compile(r'(?:async\s+)?(?:def|class)\s+')
+
+    def __init__(self, lines: List[str]):
+        self.lines = lines
+
+    def line(self, lineno: int) -> str:
+        return self.lines[lineno - 1] if 0 < lineno <= len(self.lines) else ''
+
+    def column(self, lineno: int, byte_col: int) -> int:
+        # AST columns count UTF-8 bytes
+        text = self.line(lineno)
+        if text.isascii():
+            return byte_col
+        return len(text.encode('utf-8')[:byte_col].decode('utf-8', 'ignore'))
+
+    def find(self, name: str, lineno: int, start: int = 0) -> int:
+        """Column of the identifier name on a line at or after start, -1 if it is not there"""
+        m = re.compile(r'(?<!\w)' + re.escape(name) + r'(?!\w)').search(self.line(lineno), start)
+        return m.start() if m else -1
+
+    def def_name(self, node: ast.AST) -> int:
+        """Column of the name of a class or def statement"""
+        col = self.column(node.lineno, node.col_offset)
+        m = self.DEF_NAME_RE.match(self.line(node.lineno), col)
+        return m.end() if m else col
+
+    def alias_start(self, node: ast.AST, alias: ast.alias) -> Tuple[int, int]:
+        """(line, column) from which to look for the names of an import alias"""
+        # alias positions exist from Python 3.10
+        line = getattr(alias, 'lineno', node.lineno)
+        return line, self.column(line, getattr(alias, 'col_offset', node.col_offset))
+
+
+class ProjectSymbolIndex:
+    """Symbols and identifier occurrences of the Python files under a project root, in SQLite; one instance per thread"""
+    SCHEMA_VERSION = 2
+    SKIP_DIRS = {'__pycache__', 'node_modules', 'site-packages', 'build', 'dist'}
+    MAX_FILE_SIZE = 4 * 1024 * 1024  # larger .py files are generated data, not code
+    MAX_FILES = 50000
+    POOL_MIN_FILES = 32  # fewer files to parse are not worth starting worker processes
+    # Occurrence kinds that bind the name, in the order go-to-definition prefers them
+    DEFINITION_KINDS = ('def', 'assign', 'import')
+    MAX_OCCURRENCES = 10000
+
+    def __init__(self, root: str, db_path: Optional[str] = None):
+        self.root = os.path.abspath(root)
+        self.db_path = db_path or self.default_db_path(self.root)
+        os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
+        self._db = sqlite3.connect(self.db_path)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._ensure_schema()
+
+    @staticmethod
+    def default_db_path(root: str) -> str:
+        base = (QStandardPaths.writableLocation(QStandardPaths.CacheLocation)
+                or os.path.join(os.path.expanduser('~'), '.cache', 'PythonIDE'))
+        digest = hashlib.blake2b(os.path.normcase(root).encode('utf-8', 'surrogatepass'), digest_size=8).hexdigest()
+        return os.path.join(base, 'symbols', f"{digest}.sqlite")
+
+    def close(self):
+        self._db.close()
+
+    def _ensure_schema(self):
+        db = self._db
+        db.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+        row = db.execute("SELECT value FROM meta WHERE key = 'schema'").fetchone()
+        if row and row[0] == str(self.SCHEMA_VERSION):
+            return
+        with db:
+            db.execute("DROP TABLE IF EXISTS refs")
+            db.execute("DROP TABLE IF EXISTS symbols")
+            db.execute("DROP TABLE IF EXISTS files")
+            db.execute("CREATE TABLE files (id INTEGER PRIMARY KEY, path TEXT UNIQUE NOT NULL,"
+                       " mtime_ns INTEGER NOT NULL, size INTEGER NOT NULL, hash BLOB)")
+            db.execute("CREATE TABLE symbols (file_id INTEGER NOT NULL, name TEXT NOT NULL,"
+                       " qualname TEXT NOT NULL, kind TEXT NOT NULL, line INTEGER NOT NULL)")
+            db.execute("CREATE INDEX symbols_file ON symbols (file_id)")
+            # Clustered by name, so a lookup reads one contiguous range
+            db.execute("CREATE TABLE refs (name TEXT NOT NULL, kind TEXT NOT NULL, file_id INTEGER NOT NULL,"
+                       " line INTEGER NOT NULL, col INTEGER NOT NULL,"
+                       " PRIMARY KEY (name, kind, file_id, line, col)) WITHOUT ROWID")
+            db.execute("CREATE INDEX refs_file ON refs (file_id)")
+            db.execute("INSERT OR REPLACE INTO meta VALUES ('schema', ?)", (str(self.SCHEMA_VERSION),))
+
+    # ---- scanning and parsing ----
+
+    def scan(self) -> Dict[str, Tuple[int, int]]:
+        """{path relative to root: (mtime_ns, size)} of the project's Python files"""
+        found: Dict[str, Tuple[int, int]] = {}
+        prefix = len(os.path.join(self.root, ''))
+        stack = [self.root]
+        while stack and len(found) < self.MAX_FILES:
+            try:
+                with os.scandir(stack.pop()) as it:
+                    entries = list(it)
+            except OSError:
+                continue
+            if any(e.name == 'pyvenv.cfg' for e in entries):
+                continue  # a virtual environment
+            for e in entries:
+                try:
+                    if e.is_dir(follow_symlinks=False):
+                        if not e.name.startswith('.') and e.name not in self.SKIP_DIRS:
+                            stack.append(e.path)
+                    elif e.name.endswith('.py') and e.is_file():
+                        st = e.stat()
+                        if st.st_size <= self.MAX_FILE_SIZE:
+                            found[e.path[prefix:]] = (st.st_mtime_ns, st.st_size)
+                except OSError:
+                    continue
+        return found
+
+    @staticmethod
+    def read_source(data: bytes) -> str:
+        return ProjectSymbolIndex.decode_source(data)[0]
+
+    @staticmethod
+    def decode_source(data: bytes) -> Tuple[str, Optional[str]]:
+        """(text, encoding) of a source file; encoding is None when the text had to be repaired"""
+        try:
+            encoding, _ = tokenize.detect_encoding(io.BytesIO(data).readline)
+            return data.decode(encoding), encoding
+        except (SyntaxError, LookupError, UnicodeDecodeError):
+            return data.decode('utf-8', 'replace'), None
+
+    @staticmethod
+    def analyze(code_text: str) -> Tuple[List[Tuple[str, str, str, int]], List[Tuple[str, int, int, str]]]:
+        """(symbols, occurrences) of code_text, from one parse; both empty if it does not parse"""
+        try:
+            tree = ast.parse(code_text)
+        except (SyntaxError, ValueError):
+            return [], []
+        return (ProjectSymbolIndex.symbols_of(CodeStructureParser.structure_of(tree)),
+                ProjectSymbolIndex.occurrences_of(tree, code_text.split('\n')))
+
+    @staticmethod
+    def symbols_of(structure: Dict) -> List[Tuple[str, str, str, int]]:
+        """(name, qualified name, kind, line) of the definitions in a CodeStructureParser result"""
+        symbols = []
+        # Methods are reported under 'functions' too, and class variables may be
+        # under 'constants'; skip those lines there
+        member_lines = set()
+        for cls in structure['classes']:
+            symbols.append((cls['name'], cls['name'], 'class', cls['line']))
+            for m in cls['methods']:
+                member_lines.add(m['line'])
+                symbols.append((m['name'], f"{cls['name']}.{m['name']}", 'method', m['line']))
+            member_lines.update(v['line'] for v in cls['variables'])
+        for func in structure['functions']:
+            if func['line'] not in member_lines:
+                symbols.append((func['name'], func['name'], 'function', func['line']))
+        for const in structure['constants']:
+            if const['line'] not in member_lines:
+                symbols.append((const['name'], const['name'], 'constant', const['line']))
+        return symbols
+
+    @staticmethod
+    def occurrences_of(tree: ast.AST, lines: List[str]) -> List[Tuple[str, int, int, str]]:
+        """(identifier, line, column, kind) of the names in tree.
+
+        kind is 'def' (class or def name), 'assign', 'import', 'param', 'name'
+        (a read) or 'attr' (an attribute read). Columns are 0-based characters.
+        """
+        columns = SourceColumns(lines)
+        column = columns.column
+
+        def find(name: str, line: int, start: int = 0) -> int:
+            return max(0, columns.find(name, line, start))
+
+        found = []
+        for node in ast.walk(tree):
+            if isinstance(node, ast.Name):
+                kind = 'name' if isinstance(node.ctx, ast.Load) else 'assign'
+                found.append((node.id, node.lineno, column(node.lineno, node.col_offset), kind))
+            elif isinstance(node, ast.Attribute):
+                end_line = getattr(node, 'end_lineno', None)
+                if end_line is None:
+                    continue  # Python < 3.8 has no end positions
+                kind = 'attr' if isinstance(node.ctx, ast.Load) else 'assign'
+                col = column(end_line, node.end_col_offset - len(node.attr.encode('utf-8')))
+                found.append((node.attr, end_line, col, kind))
+            elif isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+                found.append((node.name, node.lineno, columns.def_name(node), 'def'))
+            elif isinstance(node, ast.arg):
+                found.append((node.arg, node.lineno, column(node.lineno, node.col_offset), 'param'))
+            elif isinstance(node, (ast.Import, ast.ImportFrom)):
+                for alias in node.names:
+                    if alias.name == '*':
+                        continue
+                    line, start = columns.alias_start(node, alias)
+                    name = alias.name if isinstance(node, ast.ImportFrom) else alias.name.split('.')[0]
+                    found.append((name, line, find(name, line, start), 'import'))
+                    if alias.asname:
+                        found.append((alias.asname, line, find(alias.asname, line, start + len(alias.name)), 'import'))
+        return found
+
+    @staticmethod
+    def index_file(path: str, known_hash: Optional[bytes] = None) -> Tuple[Optional[bytes], Optional[tuple]]:
+        """(content hash, (symbols, occurrences)) of one file; the pair is None when the hash is known_hash.
+
+        Runs in the worker processes, so it only takes and returns plain data.
+        """
+        try:
+            with open(path, 'rb') as f:
+                data = f.read()
+        except OSError:
+            return None, ([], [])
+        digest = hashlib.blake2b(data, digest_size=16).digest()
+        if digest == known_hash:
+            return digest, None
+        return digest, ProjectSymbolIndex.analyze(ProjectSymbolIndex.read_source(data))
+
+    @classmethod
+    def process_pool(cls, jobs: int) -> Optional[ProcessPoolExecutor]:
+        """A worker process pool for jobs files, or None if they are better done in-thread"""
+        if jobs < cls.POOL_MIN_FILES or (os.cpu_count() or 1) < 2:
+            return None
+        # spawn: forking a process that runs Qt threads is unsafe
+        return ProcessPoolExecutor(mp_context=multiprocessing.get_context('spawn'))
+
+    def _index_files(self, paths: List[str], hashes: List[Optional[bytes]], progress=None, warn=None) -> list:
+        total = len(paths)
+        try:
+            pool = self.process_pool(total)
+            if pool is not None:
+                with pool:
+                    results = []
+                    chunk = max(1, min(64, total // (4 * (os.cpu_count() or 1))))
+                    for result in pool.map(self.index_file, paths, hashes, chunksize=chunk):
+                        results.append(result)
+                        if progress and len(results) % 256 == 0:
+                            progress(len(results), total)
+                    return results
+        except (OSError, BrokenProcessPool) as e:
+            if warn:
+                warn(f"Process pool unavailable, indexing in-thread: {e}")
+        results = []
+        for path, known in zip(paths, hashes):
+            results.append(self.index_file(path, known))
+            if progress and len(results) % 256 == 0:
+                progress(len(results), total)
+        return results
+
+    # ---- updating ----
+
+    def refresh(self, progress=None, warn=None) -> Tuple[int, int]:
+        """Bring the index up to date with the disk; returns (files, files re-parsed).
+        progress(done, total) is called as files are parsed, warn(message) on a fallback."""
+        db = self._db
+        known = {path: (file_id, mtime_ns, size, digest) for file_id, path, mtime_ns, size, digest
+                 in db.execute("SELECT id, path, mtime_ns, size, hash FROM files")}
+        found = self.scan()
+        gone = [known[p][0] for p in known.keys() - found.keys()]
+        stale = [p for p, stat in found.items() if p not in known or known[p][1:3] != stat]
+        results = self._index_files([os.path.join(self.root, p) for p in stale],
+                                    [known[p][3] if p in known else None for p in stale], progress, warn)
+        parsed = 0
+        with db:
+            for file_id in gone:
+                self._delete(file_id)
+            for rel, (digest, analysis) in zip(stale, results):
+                parsed += analysis is not None
+                self._store(rel, found[rel], digest, analysis, known.get(rel, (None,))[0])
+        return len(found), parsed
+
+    def relative_path(self, path: str) -> Optional[str]:
+        """path relative to the root, if it is a Python file under it"""
+        path = os.path.abspath(path)
+        try:
+            inside = os.path.commonpath([self.root, path]) == self.root
+        except ValueError:  # another drive
+            inside = False
+        if not inside or not path.endswith('.py'):
+            return None
+        return os.path.relpath(path, self.root)
+
+    def update_file(self, path: str) -> Optional[Tuple[str, list]]:
+        """Re-index one file (e.g. after a save); (relative path, symbols) if it changed"""
+        rel = self.relative_path(path)
+        if rel is None:
+            return None
+        path = os.path.join(self.root, rel)
+        row = self._db.execute("SELECT id, hash FROM files WHERE path = ?", (rel,)).fetchone()
+        try:
+            st = os.stat(path)
+        except OSError:
+            if row:
+                with self._db:
+                    self._delete(row[0])
+                return rel, []
+            return None
+        digest, analysis = self.index_file(path, row[1] if row else None)
+        with self._db:
+            self._store(rel, (st.st_mtime_ns, st.st_size), digest, analysis, row[0] if row else None)
+        return (rel, analysis[0]) if analysis is not None else None
+
+    def _delete(self, file_id: int):
+        self._db.execute("DELETE FROM refs WHERE file_id = ?", (file_id,))
+        self._db.execute("DELETE FROM symbols WHERE file_id = ?", (file_id,))
+        self._db.execute("DELETE FROM files WHERE id = ?", (file_id,))
+
+    def _store(self, rel: str, stat: Tuple[int, int], digest: Optional[bytes],
+               analysis: Optional[tuple], file_id: Optional[int]):
+        db = self._db
+        if file_id is None:
+            file_id = db.execute("INSERT INTO files (path, mtime_ns, size, hash) VALUES (?, ?, ?, ?)",
+                                 (rel, stat[0], stat[1], digest)).lastrowid
+        else:
+            db.execute("UPDATE files SET mtime_ns = ?, size = ?, hash = ? WHERE id = ?",
+                       (stat[0], stat[1], digest, file_id))
+            if analysis is None:
+                return  # same content, only touched
+            db.execute("DELETE FROM symbols WHERE file_id = ?", (file_id,))
+            db.execute("DELETE FROM refs WHERE file_id = ?", (file_id,))
+        symbols, occurrences = analysis
+        if symbols:
+            db.executemany("INSERT INTO symbols VALUES (?, ?, ?, ?, ?)",
+                           [(file_id, name, qualname, kind, line) for name, qualname, kind, line in symbols])
+        if occurrences:
+            db.executemany("INSERT OR IGNORE INTO refs VALUES (?, ?, ?, ?, ?)",
+                           [(name, kind, file_id, line, col) for name, line, col, kind in occurrences])
+
+    def symbols(self) -> Dict[str, List[Tuple[str, str, str, int]]]:
+        """{path relative to root: [(name, qualified name, kind, line), ...]}"""
+        by_file: Dict[str, list] = {}
+        paths = dict(self._db.execute("SELECT id, path FROM files"))
+        for file_id, name, qualname, kind, line in self._db.execute(
+                "SELECT file_id, name, qualname, kind, line FROM symbols ORDER BY file_id, line"):
+            by_file.setdefault(paths[file_id], []).append((name, qualname, kind, line))
+        return by_file
+
+    def occurrences(self, name: str, kinds: Optional[Tuple[str, ...]] = None) -> List[Tuple[str, int, int, str]]:
+        """(relative path, line, column, kind) of the identifier name, at most MAX_OCCURRENCES"""
+        sql = ("SELECT files.path, refs.line, refs.col, refs.kind FROM refs"
+               " JOIN files ON files.id = refs.file_id WHERE refs.name = ?")
+        params: list = [name]
+        if kinds:
+            sql += f" AND refs.kind IN ({', '.join('?' * len(kinds))})"
+            params.extend(kinds)
+        # Sorted here: ORDER BY would sort every match before the LIMIT
+        sql += " LIMIT ?"
+        params.append(self.MAX_OCCURRENCES)
+        return sorted(self._db.execute(sql, params))
+
+    def files_with(self, name: str) -> List[str]:
+        """Relative paths of the files in which the identifier name occurs"""
+        return [path for path, in self._db.execute(
+            "SELECT path FROM files WHERE id IN (SELECT DISTINCT file_id FROM refs WHERE name = ?)", (name,))]
+
+    def paths(self) -> List[str]:
+        return [path for path, in self._db.execute("SELECT path FROM files")]
+
+
+class ProjectSymbolSearch:
+    """Ranked as-you-type lookup over the symbols of a ProjectSymbolIndex"""
+    PREFIX_SCORE = 300.0
+    ACRONYM_SCORE = 250.0
+    SUBSTRING_SCORE = 200.0
+    EXACT_CASE_BONUS = 5.0
+    LENGTH_PENALTY = 0.1  # per character of name (or initials) beyond the query
+    MIN_REBUILD = 1000
+
+    def __init__(self, symbols: Dict[str, List[Tuple[str, str, str, int]]]):
+        self._build(symbols)
+
+    def _build(self, symbols: Dict[str, List[Tuple[str, str, str, int]]]):
+        self._entries: List[Optional[Tuple[str, str, str, str, int]]] = []  # (path, name, qualname, kind, line)
+        self._by_file: Dict[str, List[int]] = {}
+        self._names: List[str] = []  # distinct lowercase names, in first-seen order
+        self._name_ids: Dict[str, List[int]] = {}
+        self._grams: Dict[str, List[int]] = {}  # trigram -> positions in _names
+        self._sorted: List[str] = []
+        self._initials: List[Tuple[str, str]] = []  # (initials, name) of names with 2+ words
+        self._dead = 0
+        for rel, file_symbols in symbols.items():
+            self._add(rel, file_symbols)
+        self._sorted.sort()
+        self._initials.sort()
+
+    def __len__(self) -> int:
+        return len(self._entries) - self._dead
+
+    def file_count(self) -> int:
+        return len(self._by_file)
+
+    def _add(self, rel: str, file_symbols: List[Tuple[str, str, str, int]], keep_sorted: bool = False):
+        entries = self._entries
+        ids = self._by_file.setdefault(rel, [])
+        for name, qualname, kind, line in file_symbols:
+            ids.append(len(entries))
+            low = name.lower()
+            owners = self._name_ids.get(low)
+            if owners is None:
+                owners = self._name_ids[low] = []
+                self._add_name(name, low, keep_sorted)
+            owners.append(len(entries))
+            entries.append((rel, name, qualname, kind, line))
+
+    def _add_name(self, name: str, low: str, keep_sorted: bool):
+        position = len(self._names)
+        self._names.append(low)
+        for gram in {low[k:k + 3] for k in range(len(low) - 2)}:
+            self._grams.setdefault(gram, []).append(position)
+        add = insort if keep_sorted else list.append
+        add(self._sorted, low)
+        starts = OutlineSearchIndex.word_starts(name)
+        if len(starts) > 1 and len(name) == len(low):
+            add(self._initials, (''.join(low[k] for k in starts), low))
+
+    def replace_file(self, rel: str, file_symbols: List[Tuple[str, str, str, int]]):
+        """Swap in the symbols of one re-indexed file (none if it was deleted)"""
+        for i in self._by_file.pop(rel, ()):
+            self._entries[i] = None
+            self._dead += 1
+        if file_symbols:
+            self._add(rel, file_symbols, keep_sorted=True)
+        if self._dead > max(self.MIN_REBUILD, len(self._entries) // 2):
+            self._build(self.symbols())
+
+    def symbols(self) -> Dict[str, List[Tuple[str, str, str, int]]]:
+        by_file: Dict[str, list] = {}
+        for entry in self._entries:
+            if entry is not None:
+                by_file.setdefault(entry[0], []).append(entry[1:])
+        return by_file
+
+    def _matching_names(self, low: str) -> Dict[str, float]:
+        """{lowercase name: base score} of the names low matches"""
+        matched: Dict[str, float] = {}
+        names = self._sorted
+        lo = bisect_left(names, low)
+        for k in range(lo, bisect_left(names, low + '\U0010ffff', lo)):
+            matched[names[k]] = self.PREFIX_SCORE - self.LENGTH_PENALTY * (len(names[k]) - len(low))
+        initials = self._initials
+        lo = bisect_left(initials, (low,))
+        for k in range(lo, bisect_left(initials, (low + '\U0010ffff',), lo)):
+            acronym, name = initials[k]
+            matched.setdefault(name, self.ACRONYM_SCORE - self.LENGTH_PENALTY * (len(acronym) - len(low)))
+        if len(low) >= 3:
+            postings = min((self._grams.get(low[k:k + 3], ()) for k in range(len(low) - 2)), key=len)
+            distinct = self._names
+            for n in postings:
+                name = distinct[n]
+                if low in name and name not in matched:
+                    matched[name] = self.SUBSTRING_SCORE - self.LENGTH_PENALTY * (len(name) - len(low))
+        return matched
+
+    def search(self, query: str, limit: int = 100) -> List[Tuple[str, str, str, str, int]]:
+        """Best (path, name, qualified name, kind, line) matches of query, best first"""
+        query = query.strip()
+        owner = ''
+        if '.' in query:
+            head, member = query.rsplit('.', 1)
+            # "Owner." alone still shows the owner until a member is typed
+            owner, query = (head.lower(), member) if member else ('', head)
+        if not query:
+            return []
+        entries = self._entries
+        weights = CompletionEngine.KIND_WEIGHTS
+        scores: Dict[int, float] = {}
+        for name, base in self._matching_names(query.lower()).items():
+            for i in self._name_ids[name]:
+                entry = entries[i]
+                if entry is None:
+                    continue
+                if owner and owner not in entry[2][:len(entry[2]) - len(entry[1])].lower():
+                    continue
+                score = base + weights.get(entry[3], 0.0)
+                if query in entry[1]:
+                    score += self.EXACT_CASE_BONUS
+                scores[i] = score
+        return [entries[i] for i in nlargest(limit, scores, key=scores.__getitem__)]
+
+
+class ProjectSymbolListModel(QAbstractListModel):
+    """Results of a ProjectSymbolSearch query"""
+    KIND_LABELS = {'class': "Class", 'method': "Method", 'function': "Function", 'constant': "Constant"}
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._rows: List[Tuple[str, str, str, str, int]] = []
+
+    def set_results(self, rows: List[Tuple[str, str, str, str, int]]):
+        self.beginResetModel()
+        self._rows = rows
+        self.endResetModel()
+
+    def result(self, row: int) -> Optional[Tuple[str, str, str, str, int]]:
+        return self._rows[row] if 0 <= row < len(self._rows) else None
+
+    def rowCount(self, parent: QModelIndex = QModelIndex()) -> int:
+        return 0 if parent.isValid() else len(self._rows)
+
+    def data(self, index: QModelIndex, role: int = Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        rel, name, qualname, kind, line = self._rows[index.row()]
+        if role == Qt.DisplayRole:
+            suffix = "()" if kind in ('method', 'function') else ""
+            return f"{self.KIND_LABELS.get(kind, kind)}: {qualname}{suffix}    {rel}:{line}"
+        if role == Qt.ToolTipRole:
+            return f"{rel}, line {line}"
+        return None
+
+
+class ReferenceListModel(QAbstractListModel):
+    """Occurrences found by ProjectSymbolIndex.occurrences; line text is read only for shown rows"""
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._root = ''
+        self._rows: List[Tuple[str, int, int, str]] = []
+
+    def set_results(self, root: str, rows: List[Tuple[str, int, int, str]]):
+        self.beginResetModel()
+        self._root = root
+        self._rows = rows
+        for rel in {row[0] for row in rows}:
+            linecache.checkcache(os.path.join(root, rel))
+        self.endResetModel()
+
+    def result(self, row: int) -> Optional[Tuple[str, int, int, str]]:
+        return self._rows[row] if 0 <= row < len(self._rows) else None
+
+    def rowCount(self, parent: QModelIndex = QModelIndex()) -> int:
+        return 0 if parent.isValid() else len(self._rows)
+
+    def data(self, index: QModelIndex, role: int = Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        rel, line, col, kind = self._rows[index.row()]
+        if role == Qt.DisplayRole:
+            text = linecache.getline(os.path.join(self._root, rel), line).strip()
+            return f"{rel}:{line}:{col + 1}  [{kind}]  {text}"
+        if role == Qt.ToolTipRole:
+            return f"{rel}, line {line}, column {col + 1}"
+        return None
+
+
+class GoToSymbolDialog(QDialog):
+    """Quick pick over the project symbol index; results update on every keystroke"""
+
+    def __init__(self, search: ProjectSymbolSearch, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle("Go to Symbol in Project")
+        self.setMinimumSize(640, 420)
+        self._search = search
+        layout = QVBoxLayout(self)
+        self.line_edit = QLineEdit()
+        self.line_edit.setPlaceholderText(f"Search {len(search)} symbols in {search.file_count()} files")
+        self.line_edit.installEventFilter(self)
+        layout.addWidget(self.line_edit)
+        self.model = ProjectSymbolListModel(self)
+        self.list_view = QListView()
+        self.list_view.setModel(self.model)
+        self.list_view.setUniformItemSizes(True)
+        self.list_view.activated.connect(self.accept)
+        self.list_view.clicked.connect(self.accept)
+        layout.addWidget(self.list_view)
+        self.line_edit.textChanged.connect(self.update_results)
+        self.line_edit.returnPressed.connect(self.accept)
+
+    def update_results(self, text: str):
+        self.model.set_results(self._search.search(text))
+        if self.model.rowCount():
+            self.list_view.setCurrentIndex(self.model.index(0))
+
+    def eventFilter(self, obj, event):
+        # Arrow and page keys move through the results while typing
+        if obj is self.line_edit and event.type() == event.KeyPress and event.key() in (
+                Qt.Key_Up, Qt.Key_Down, Qt.Key_PageUp, Qt.Key_PageDown):
+            QApplication.sendEvent(self.list_view, event)
+            return True
+        return super().eventFilter(obj, event)
+
+    def selected(self) -> Optional[Tuple[str, str, str, str, int]]:
+        return self.model.result(self.list_view.currentIndex().row())
+
+
+class ProjectIndexWorker(QObject):
+    """Owns the ProjectSymbolIndex; lives in the project index thread"""
+    progress = pyqtSignal(int, int)  # files parsed, files to parse
+    ready = pyqtSignal(str, object)  # root, ProjectSymbolSearch
+    file_updated = pyqtSignal(str, str, object)  # root, relative path, symbols
+    failed = pyqtSignal(str)  # message
+
+    def __init__(self):
+        super().__init__()
+        self._index: Optional[ProjectSymbolIndex] = None
+
+    @pyqtSlot(str)
+    def open_project(self, root: str):
+        self.close()
+        try:
+            self._index = ProjectSymbolIndex(root)
+            self._index.refresh(self.progress.emit, self.failed.emit)
+            # The trigram index is built here too, off the UI thread
+            self.ready.emit(self._index.root, ProjectSymbolSearch(self._index.symbols()))
+        except (OSError, sqlite3.Error) as e:
+            self.failed.emit(f"Project indexing failed: {e}")
+            self.close()
+
+    @pyqtSlot(str)
+    def update_file(self, path: str):
+        if self._index is None:
+            return
+        try:
+            changed = self._index.update_file(path)
+        except (OSError, sqlite3.Error) as e:
+            self.failed.emit(f"Project indexing failed: {e}")
+            return
+        if changed is not None:
+            self.file_updated.emit(self._index.root, *changed)
+
+    @pyqtSlot()
+    def close(self):
+        if self._index is not None:
+            self._index.close()
+            self._index = None
+
+
+class ProjectIndexService(QObject):
+    """Process-wide project index thread"""
+    _open = pyqtSignal(str)
+    _update = pyqtSignal(str)
+    _close = pyqtSignal()
+    _rename = pyqtSignal(int, object)
+
+    _instance: Optional['ProjectIndexService'] = None
+
+    def __init__(self):
+        super().__init__()
+        self._thread = QThread()
+        self.worker = ProjectIndexWorker()
+        self.worker.moveToThread(self._thread)
+        self.rename_worker = RenameWorker()
+        self.rename_worker.moveToThread(self._thread)
+        self._open.connect(self.worker.open_project)
+        self._update.connect(self.worker.update_file)
+        self._close.connect(self.worker.close)
+        self._rename.connect(self.rename_worker.compute)
+        self._thread.start()
+
+    @classmethod
+    def instance(cls) -> 'ProjectIndexService':
+        if cls._instance is None:
+            cls._instance = cls()
+        return cls._instance
+
+    @classmethod
+    def shutdown(cls):
+        if cls._instance is not None:
+            cls._instance._close.emit()
+            cls._instance._thread.quit()
+            cls._instance._thread.wait(3000)
+            cls._instance = None
+
+    def open_project(self, root: str):
+        """Index root in the background; the worker emits ready when done"""
+        self._open.emit(root)
+
+    def update_file(self, path: str):
+        self._update.emit(path)
+
+    def compute_rename(self, request: int, jobs: List[tuple]):
+        """Rename edits for jobs in the background; rename_worker emits computed when done"""
+        self._rename.emit(request, jobs)
+
+# =============================
+# Rename Refactoring
+# =============================
+
+class NameScope:
+    """One scope of a ScopeAnalysis: 'module', 'class', 'function' or 'comprehension'"""
+    __slots__ = ('kind', 'name', 'parent', 'bindings', 'declared', 'self_name')
+
+    def __init__(self, kind: str, name: str = '', parent: Optional['NameScope'] = None):
+        self.kind = kind
+        self.name = name  # qualified name for classes
+        self.parent = parent
+        self.bindings: Dict[str, str] = {}  # name -> 'def', 'class', 'param', 'import' or 'assign'
+        self.declared: Dict[str, str] = {}  # name -> 'global' or 'nonlocal'
+        self.self_name: Optional[str] = None  # first parameter of a method
+
+
+class ScopeAnalysis(ast.NodeVisitor):
+    """Binding resolution for one module, as Python does it"""
+
+    def __init__(self, tree: ast.AST, lines: List[str], module: str = '', is_package: bool = False):
+        self.columns = SourceColumns(lines)
+        self.module = module
+        self.is_package = is_package
+        self.module_scope = NameScope('module', module)
+        self._scope = self.module_scope
+        self.names: List[Tuple[str, int, int, NameScope]] = []  # (name, line, column, scope it appears in)
+        self.attributes: List[Tuple[str, int, int, ast.expr, NameScope]] = []  # (attr, line, column, object, scope)
+        # Names imported with "from m import name as alias": (m, name, line, column)
+        self.import_sources: List[Tuple[str, str, int, int]] = []
+        self.imports: Dict[Tuple[NameScope, str], tuple] = {}  # binding -> ('module', m) or ('from', m, name)
+        self.classes: Dict[Tuple[NameScope, str], str] = {}  # binding -> qualified class name
+        self.exported: List[Tuple[str, int, int]] = []  # strings of a module-level __all__
+        self.visit(tree)
+
+    def absolute_module(self, level: int, module: Optional[str]) -> str:
+        if not level:
+            return module or ''
+        parts = self.module.split('.') if self.module else []
+        if not self.is_package:
+            parts = parts[:-1]
+        parts = parts[:max(0, len(parts) - (level - 1))]
+        return '.'.join(parts + ([module] if module else []))
+
+    # ---- collecting ----
+
+    def _bind(self, name: str, kind: str, scope: Optional[NameScope] = None) -> Optional[Tuple[NameScope, str]]:
+        scope = scope or self._scope
+        declared = scope.declared.get(name)
+        if declared == 'global':
+            scope = self.module_scope
+        elif declared == 'nonlocal':
+            return None  # bound by an enclosing function, found when resolving
+        scope.bindings.setdefault(name, kind)
+        return scope, name
+
+    def _add_name(self, name: str, line: int, col: int, scope: Optional[NameScope] = None):
+        if col >= 0:
+            self.names.append((name, line, col, scope or self._scope))
+
+    def _visit_function(self, node, name: str, params: List[ast.arg], body: List[ast.AST]):
+        scope = NameScope('function', name, self._scope)
+        is_static = any(isinstance(d, ast.Name) and d.id == 'staticmethod'
+                        for d in getattr(node, 'decorator_list', ()))
+        if self._scope.kind == 'class' and params and not is_static:
+            scope.self_name = params[0].arg
+        for a in params:
+            if a.annotation is not None:
+                self.visit(a.annotation)
+        self._scope = scope
+        for a in params:
+            self._bind(a.arg, 'param')
+            self._add_name(a.arg, a.lineno, self.columns.column(a.lineno, a.col_offset))
+        for stmt in body:
+            self.visit(stmt)
+        self._scope = scope.parent
+
+    def visit_FunctionDef(self, node):
+        for expr in node.decorator_list + node.args.defaults + [d for d in node.args.kw_defaults if d is not None]:
+            self.visit(expr)
+        if node.returns is not None:
+            self.visit(node.returns)
+        self._bind(node.name, 'def')
+        self._add_name(node.name, node.lineno, self.columns.def_name(node))
+        self._visit_function(node, node.name, SemanticTokenCollector._all_args(node.args), node.body)
+
+    visit_AsyncFunctionDef = visit_FunctionDef
+
+    def visit_Lambda(self, node):
+        for expr in node.args.defaults + [d for d in node.args.kw_defaults if d is not None]:
+            self.visit(expr)
+        self._visit_function(node, '<lambda>', SemanticTokenCollector._all_args(node.args), [node.body])
+
+    def visit_ClassDef(self, node):
+        for expr in node.decorator_list + node.bases + [kw.value for kw in node.keywords]:
+            self.visit(expr)
+        key = self._bind(node.name, 'class')
+        self._add_name(node.name, node.lineno, self.columns.def_name(node))
+        qualname = f"{self._scope.name}.{node.name}" if self._scope.kind == 'class' else node.name
+        if key is not None:
+            self.classes[key] = qualname
+        self._scope = NameScope('class', qualname, self._scope)
+        for stmt in node.body:
+            self.visit(stmt)
+        self._scope = self._scope.parent
+
+    def _visit_comprehension(self, node, elements: List[ast.AST]):
+        # The first iterable is evaluated in the enclosing scope
+        self.visit(node.generators[0].iter)
+        self._scope = NameScope('comprehension', '', self._scope)
+        for i, gen in enumerate(node.generators):
+            self.visit(gen.target)
+            if i:
+                self.visit(gen.iter)
+            for cond in gen.ifs:
+                self.visit(cond)
+        for element in elements:
+            self.visit(element)
+        self._scope = self._scope.parent
+
+    def visit_ListComp(self, node):
+        self._visit_comprehension(node, [node.elt])
+
+    visit_SetComp = visit_GeneratorExp = visit_ListComp
+
+    def visit_DictComp(self, node):
+        self._visit_comprehension(node, [node.key, node.value])
+
+    def visit_NamedExpr(self, node):
+        # := in a comprehension binds in the scope around it
+        scope = self._scope
+        while scope.kind == 'comprehension':
+            scope = scope.parent
+        self._bind(node.target.id, 'assign', scope)
+        self._add_name(node.target.id, node.target.lineno,
+                       self.columns.column(node.target.lineno, node.target.col_offset), scope)
+        self.visit(node.value)
+
+    def visit_Name(self, node):
+        if isinstance(node.ctx, (ast.Store, ast.Del)):
+            self._bind(node.id, 'assign')
+        self._add_name(node.id, node.lineno, self.columns.column(node.lineno, node.col_offset))
+
+    def visit_Attribute(self, node):
+        self.visit(node.value)
+        end_line = getattr(node, 'end_lineno', None)
+        if end_line is not None:
+            col = self.columns.column(end_line, node.end_col_offset - len(node.attr.encode('utf-8')))
+            self.attributes.append((node.attr, end_line, col, node.value, self._scope))
+
+    def _visit_declaration(self, node, kind: str):
+        start = self.columns.column(node.lineno, node.col_offset)
+        for name in node.names:
+            self._scope.declared[name] = kind
+            if kind == 'global':
+                self.module_scope.bindings.setdefault(name, 'assign')
+            self._add_name(name, node.lineno, self.columns.find(name, node.lineno, start + len(kind)))
+
+    def visit_Global(self, node):
+        self._visit_declaration(node, 'global')
+
+    def visit_Nonlocal(self, node):
+        self._visit_declaration(node, 'nonlocal')
+
+    def visit_Import(self, node):
+        for alias in node.names:
+            line, start = self.columns.alias_start(node, alias)
+            local = alias.asname or alias.name.split('.')[0]
+            key = self._bind(local, 'import')
+            if key is not None:
+                self.imports[key] = ('module', alias.name if alias.asname else local)
+            col = self.columns.find(local, line, start + (len(alias.name) if alias.asname else 0))
+            self._add_name(local, line, col)
+
+    def visit_ImportFrom(self, node):
+        source = self.absolute_module(node.level, node.module)
+        for alias in node.names:
+            if alias.name == '*':
+                continue
+            line, start = self.columns.alias_start(node, alias)
+            local = alias.asname or alias.name
+            key = self._bind(local, 'import')
+            if key is not None:
+                self.imports[key] = ('from', source, alias.name)
+            name_col = self.columns.find(alias.name, line, start)
+            if alias.asname:
+                self.import_sources.append((source, alias.name, line, name_col))
+                self._add_name(alias.asname, line, self.columns.find(alias.asname, line, max(start, name_col) + len(alias.name)))
+            else:
+                self._add_name(alias.name, line, name_col)
+
+    def _visit_bound_string(self, node, name: Optional[str]):
+        # except ... as name, and match captures, carry the name as a plain string
+        if name:
+            self._bind(name, 'assign')
+            self._add_name(name, node.lineno, self.columns.find(
+                name, node.lineno, self.columns.column(node.lineno, node.col_offset)))
+        self.generic_visit(node)
+
+    def visit_ExceptHandler(self, node):
+        if node.type is not None:
+            self.visit(node.type)
+        if node.name:
+            self._bind(node.name, 'assign')
+            start = self.columns.column(node.lineno, node.col_offset)
+            as_col = self.columns.find('as', node.lineno, start)
+            self._add_name(node.name, node.lineno, self.columns.find(node.name, node.lineno, max(start, as_col)))
+        for stmt in node.body:
+            self.visit(stmt)
+
+    def visit_MatchAs(self, node):
+        self._visit_bound_string(node, node.name)
+
+    def visit_MatchStar(self, node):
+        self._visit_bound_string(node, node.name)
+
+    def visit_MatchMapping(self, node):
+        self._visit_bound_string(node, node.rest)
+
+    def visit_Assign(self, node):
+        if self._scope is self.module_scope and any(isinstance(t, ast.Name) and t.id == '__all__'
+                                                    for t in node.targets):
+            self._collect_exported(node.value)
+        self.generic_visit(node)
+
+    def visit_AugAssign(self, node):
+        if self._scope is self.module_scope and isinstance(node.target, ast.Name) and node.target.id == '__all__':
+            self._collect_exported(node.value)
+        self.generic_visit(node)
+
+    def _collect_exported(self, value: ast.AST):
+        if isinstance(value, (ast.List, ast.Tuple)):
+            for elt in value.elts:
+                if isinstance(elt, ast.Constant) and isinstance(elt.value, str) and elt.value.isidentifier():
+                    col = self.columns.column(elt.lineno, elt.col_offset)
+                    # Only a plain quoted string is edited in place
+                    if self.columns.line(elt.lineno)[col + 1:col + 1 + len(elt.value)] == elt.value:
+                        self.exported.append((elt.value, elt.lineno, col + 1))
+
+    # ---- resolving ----
+
+    def resolve(self, scope: NameScope, name: str) -> Optional[NameScope]:
+        """The scope binding name as seen from scope; None for builtins and undefined names"""
+        declared = scope.declared.get(name)
+        if declared == 'global':
+            return self.module_scope
+        s = scope.parent if declared == 'nonlocal' else scope
+        while s is not None:
+            # Class bodies are not visible from the scopes nested in them
+            if s.kind != 'class' or s is scope:
+                if s is not scope and s.declared.get(name) == 'global':
+                    return self.module_scope
+                if name in s.bindings and s.declared.get(name) != 'nonlocal':
+                    return s
+            s = s.parent
+        return None
+
+    def module_of(self, expr: ast.AST, scope: NameScope) -> Optional[str]:
+        """Dotted module name that expr evaluates to, as far as imports tell"""
+        if isinstance(expr, ast.Attribute):
+            base = self.module_of(expr.value, scope)
+            return f"{base}.{expr.attr}" if base else None
+        if isinstance(expr, ast.Name):
+            binder = self.resolve(scope, expr.id)
+            imported = self.imports.get((binder, expr.id)) if binder else None
+            if imported:
+                return imported[1] if imported[0] == 'module' else f"{imported[1]}.{imported[2]}"
+        return None
+
+    def class_of(self, expr: ast.AST, scope: NameScope) -> Optional[Tuple[str, str]]:
+        """(module, qualified class name) that expr may evaluate to, or that self/cls is an instance of"""
+        if isinstance(expr, ast.Name):
+            binder = self.resolve(scope, expr.id)
+            if binder is None:
+                return None
+            if binder.kind == 'function' and binder.self_name == expr.id and binder.parent.kind == 'class':
+                return self.module, binder.parent.name
+            qualname = self.classes.get((binder, expr.id))
+            if qualname:
+                return self.module, qualname
+            imported = self.imports.get((binder, expr.id))
+            if imported and imported[0] == 'from':
+                return imported[1], imported[2]
+        elif isinstance(expr, ast.Attribute):
+            owner = self.class_of(expr.value, scope)
+            if owner:
+                return owner[0], f"{owner[1]}.{expr.attr}"
+            module = self.module_of(expr.value, scope)
+            if module:
+                return module, expr.attr
+        return None
+
+    def target_at(self, line: int, col: int, modules: Set[str] = frozenset()) -> Tuple[Optional[tuple], str]:
+        """(rename target, '') for the identifier at a 1-based line and 0-based column, or (None, reason).
+
+        A target is ('local', scope, name), ('global', module, name) or
+        ('member', module, class, name); modules are the project's modules.
+        """
+        for name, l, c, seen in self.names:
+            if l == line and c <= col <= c + len(name):
+                binder = self.resolve(seen, name)
+                if binder is None:
+                    return None, f"'{name}' is not defined in this project (a builtin?)"
+                imported = self.imports.get((binder, name))
+                if imported:
+                    if imported[0] == 'module':
+                        return None, "Renaming modules is not supported"
+                    if f"{imported[1]}.{name}" in modules:
+                        return None, "Renaming modules is not supported"
+                    if imported[2] == name:
+                        return ('global', imported[1], name), ''
+                    return ('local', binder, name), ''  # an "as" alias
+                if binder.kind == 'module':
+                    return ('global', self.module, name), ''
+                if binder.kind == 'class':
+                    return ('member', self.module, binder.name, name), ''
+                return ('local', binder, name), ''
+        for attr, l, c, value, seen in self.attributes:
+            if l == line and c <= col <= c + len(attr):
+                owner = self.class_of(value, seen)
+                if owner and f"{owner[0]}.{owner[1]}" not in modules:
+                    return ('member', owner[0], owner[1], attr), ''
+                module = self.module_of(value, seen)
+                if module:
+                    return ('global', module, attr), ''
+                return None, f"Cannot tell what '{attr}' belongs to here"
+        for module, name, l, c in self.import_sources:
+            if l == line and c <= col <= c + len(name):
+                return ('global', module, name), ''
+        return None, "No identifier at the cursor"
+
+    def rename_edits(self, target: tuple) -> List[Tuple[int, int, bool]]:
+        """(line, column, certain) of the occurrences of target in this module.
+
+        Uncertain ones are attributes that may or may not be the renamed member,
+        and same-named members of other classes (overrides, perhaps).
+        """
+        edits: Dict[Tuple[int, int], bool] = {}
+
+        def add(line: int, col: int, certain: bool):
+            if col >= 0:
+                edits[(line, col)] = edits.get((line, col), False) or certain
+
+        kind, name = target[0], target[-1]
+        if kind == 'local':
+            for n, l, c, seen in self.names:
+                if n == name and self.resolve(seen, n) is target[1]:
+                    add(l, c, True)
+        elif kind == 'global':
+            module = target[1]
+            own = self.module == module
+            for n, l, c, seen in self.names:
+                if n != name:
+                    continue
+                binder = self.resolve(seen, n)
+                if binder is None:
+                    continue
+                imported = self.imports.get((binder, n))
+                if own and binder is self.module_scope and not imported:
+                    add(l, c, True)
+                elif imported and imported[0] == 'from' and imported[2] == name and \
+                        imported[1] == module:
+                    add(l, c, True)
+            for source, n, l, c in self.import_sources:
+                if n == name and source == module:
+                    add(l, c, True)
+            for attr, l, c, value, seen in self.attributes:
+                if attr == name:
+                    owner = self.module_of(value, seen)
+                    if owner == module:
+                        add(l, c, True)
+            # __all__ names what this module binds, its own or re-exported
+            imported = self.imports.get((self.module_scope, name))
+            if (own and not imported) or (imported and imported[0] == 'from' and imported[2] == name
+                                          and imported[1] == module):
+                for n, l, c in self.exported:
+                    if n == name:
+                        add(l, c, True)
+        else:
+            module, cls = target[1], target[2]
+            own = self.module == module
+            for n, l, c, seen in self.names:
+                if n == name:
+                    binder = self.resolve(seen, n)
+                    if binder is not None and binder.kind == 'class':
+                        add(l, c, own and binder.name == cls)
+            for attr, l, c, value, seen in self.attributes:
+                if attr == name:
+                    owner = self.class_of(value, seen)
+                    add(l, c, owner is not None and owner[1] == cls and owner[0] == module)
+        return sorted((l, c, certain) for (l, c), certain in edits.items())
+
+
+class RenameRefactoring:
+    """Project-wide rename of one binding, with edits per file from ScopeAnalysis"""
+
+    SOURCE_ROOTS = ('src', 'lib')
+
+    @classmethod
+    def source_roots(cls, paths: List[str]) -> Set[str]:
+        """Top-level directories of paths that hold packages without being one: src/ layouts"""
+        names = {p.replace(os.sep, '/') for p in paths}
+        return {root for root in cls.SOURCE_ROOTS
+                if f"{root}/__init__.py" not in names and any(n.startswith(root + '/') for n in names)}
+
+    @staticmethod
+    def module_name(rel: str, source_roots: Set[str] = frozenset()) -> str:
+        """The dotted name rel is imported by; a project under src/ imports src/pkg/mod.py as pkg.mod"""
+        parts = os.path.splitext(rel)[0].replace(os.sep, '/').split('/')
+        if len(parts) > 1 and parts[0] in source_roots:
+            parts.pop(0)
+        if parts[-1] == '__init__':
+            parts.pop()
+        return '.'.join(parts)
+
+    @staticmethod
+    def file_edits(job: tuple) -> Tuple[str, List[Tuple[int, int, bool, str]], Optional[str]]:
+        """(path, [(line, column, certain, line text)], error) for one file.
+
+        job is (path, code or None to read the file, module, target); runs in
+        the worker processes, so it only takes and returns plain data.
+        """
+        path, code, module, target = job
+        if code is None:
+            try:
+                with open(path, 'rb') as f:
+                    code = ProjectSymbolIndex.read_source(f.read())
+            except OSError as e:
+                return path, [], str(e)
+        try:
+            tree = ast.parse(code)
+        except (SyntaxError, ValueError) as e:
+            return path, [], f"not parsed: {e}"
+        lines = code.split('\n')
+        analysis = ScopeAnalysis(tree, lines, module, os.path.basename(path) == '__init__.py')
+        return path, [(l, c, certain, lines[l - 1]) for l, c, certain in analysis.rename_edits(target)], None
+
+    @classmethod
+    def compute(cls, jobs: List[tuple], warn=None) -> list:
+        """file_edits of every job, in worker processes when there are enough; warn(message) on a fallback"""
+        try:
+            pool = ProjectSymbolIndex.process_pool(len(jobs))
+            if pool is not None:
+                with pool:
+                    return list(pool.map(cls.file_edits, jobs, chunksize=8))
+        except (OSError, BrokenProcessPool) as e:
+            if warn:
+                warn(f"Process pool unavailable, renaming in-thread: {e}")
+        return [cls.file_edits(job) for job in jobs]
+
+    @staticmethod
+    def apply_to_text(text: str, edits: List[Tuple[int, int]], old: str, new: str) -> Optional[str]:
+        """text with old replaced by new at each (line, column); None if one of them is not old"""
+        lines = text.split('\n')
+        for line, col in sorted(set(edits), reverse=True):
+            current = lines[line - 1] if 0 < line <= len(lines) else ''
+            if current[col:col + len(old)] != old:
+                return None
+            lines[line - 1] = current[:col] + new + current[col + len(old):]
+        return '\n'.join(lines)
+
+    @classmethod
+    def rewrite_files(cls, changes: Dict[str, List[Tuple[int, int]]], old: str, new: str):
+        """Apply edits to files on disk, all or none: every new text is written to
+        a temporary file beside its original before any original is replaced"""
+        written: List[Tuple[str, str]] = []
+        try:
+            for path, edits in changes.items():
+                with open(path, 'rb') as f:
+                    text, encoding = ProjectSymbolIndex.decode_source(f.read())
+                if encoding is None:
+                    raise OSError(f"{path}: cannot tell its encoding")
+                new_text = cls.apply_to_text(text, edits, old, new)
+                if new_text is None:
+                    raise OSError(f"{path}: changed since the preview")
+                fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), prefix=f".{os.path.basename(path)}.", suffix='.tmp')
+                written.append((tmp, path))
+                with os.fdopen(fd, 'wb') as f:
+                    f.write(new_text.encode(encoding))
+                    f.flush()
+                    os.fsync(f.fileno())
+                shutil.copymode(path, tmp)
+        except (OSError, UnicodeEncodeError):
+            for tmp, _ in written:
+                try:
+                    os.remove(tmp)
+                except OSError:
+                    pass
+            raise
+        for tmp, path in written:
+            os.replace(tmp, path)
+
+
+class RenameWorker(QObject):
+    """Computes rename edits; lives in the project index thread"""
+    computed = pyqtSignal(int, object)  # request, [(path, edits, error)]
+    failed = pyqtSignal(str)  # message
+
+    @pyqtSlot(int, object)
+    def compute(self, request: int, jobs: List[tuple]):
+        self.computed.emit(request, RenameRefactoring.compute(jobs, self.failed.emit))
+
+
+class RenamePreviewDialog(QDialog):
+    """Every edit of a rename, grouped by file; unchecked edits are left alone"""
+    EDIT_ROLE = Qt.UserRole + 1
+
+    def __init__(self, old_name: str, new_name: str, results: List[Tuple[str, str, list]], parent=None):
+        super().__init__(parent)
+        self.setWindowTitle(f"Rename '{old_name}' to '{new_name}'")
+        self.setMinimumSize(760, 480)
+        layout = QVBoxLayout(self)
+        total = sum(len(edits) for _, _, edits in results)
+        uncertain = sum(1 for _, _, edits in results for e in edits if not e[2])
+        summary = f"{total} occurrences in {len(results)} files."
+        if uncertain:
+            summary += f" {uncertain} unchecked: attributes and members that may be unrelated."
+        layout.addWidget(QLabel(summary))
+        self.list_widget = QListWidget()
+        self.list_widget.setFont(QFont("Consolas", 10))
+        self.list_widget.setUniformItemSizes(True)
+        bold = QFont("Consolas", 10)
+        bold.setBold(True)
+        for path, label, edits in results:
+            header = QListWidgetItem(label)
+            header.setFont(bold)
+            header.setFlags(Qt.ItemIsEnabled)
+            self.list_widget.addItem(header)
+            for line, col, certain, text in edits:
+                item = QListWidgetItem(f"    {line}:{col + 1}  {text.strip()}")
+                item.setFlags(Qt.ItemIsEnabled | Qt.ItemIsUserCheckable)
+                item.setCheckState(Qt.Checked if certain else Qt.Unchecked)
+                item.setData(self.EDIT_ROLE, (path, line, col))
+                self.list_widget.addItem(item)
+        layout.addWidget(self.list_widget)
+        btns = QDialogButtonBox()
+        self.apply_btn = btns.addButton("Apply", QDialogButtonBox.AcceptRole)
+        self.cancel_btn = btns.addButton(QDialogButtonBox.Cancel)
+        btns.accepted.connect(self.accept)
+        btns.rejected.connect(self.reject)
+        layout.addWidget(btns)
+
+    def checked_edits(self) -> Dict[str, List[Tuple[int, int]]]:
+        edits: Dict[str, List[Tuple[int, int]]] = {}
+        for i in range(self.list_widget.count()):
+            item = self.list_widget.item(i)
+            data = item.data(self.EDIT_ROLE)
+            if data and item.checkState() == Qt.Checked:
+                path, line, col = data
+                edits.setdefault(path, []).append((line, col))
+        return edits
+
+# =============================
+# Python Version Detector
+# =============================
+
+class InterpreterRegistry:
+    """Persistent, thread-safe metadata of known interpreters, so they are probed only when they change"""
+    FORMAT_VERSION = 2
+
+    _instance: Optional['InterpreterRegistry'] = None
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path or os.path.join(
+            QStandardPaths.writableLocation(QStandardPaths.CacheLocation)
+            or os.path.join(os.path.expanduser('~'), '.cache', 'PythonIDE'), 'interpreters.json')
+        self._lock = threading.Lock()
+        self._entries: Dict[str, Dict] = {}
+        self._dirty = False
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            if data.get('format') == self.FORMAT_VERSION:
+                self._entries = {e['key']: e for e in data.get('interpreters', [])}
+        except (OSError, ValueError, KeyError, AttributeError, TypeError):
+            pass
+
+    @classmethod
+    def instance(cls) -> 'InterpreterRegistry':
+        if cls._instance is None:
+            cls._instance = cls()
+        return cls._instance
+
+    @staticmethod
+    def key_of(path: str) -> str:
+        """One key per interpreter, whichever of its names path is: the binary links resolve to,
+        and for a venv its environment too, since a venv links to its base interpreter's binary"""
+        path = os.path.abspath(path)
+        target = os.path.normcase(os.path.realpath(path))
+        prefix = os.path.dirname(os.path.dirname(path))
+        if os.path.isfile(os.path.join(prefix, 'pyvenv.cfg')):
+            return f"{os.path.normcase(os.path.realpath(prefix))}{os.pathsep}{target}"
+        return target
+
+    @classmethod
+    def launch_key(cls, command: List[str]) -> Tuple[str, str]:
+        """(key, file) of a command that starts an interpreter. A launcher's arguments, as in
+        py -3.11, are part of the key; the file is the one whose changes invalidate it."""
+        path = command[0] if os.path.isabs(command[0]) else shutil.which(command[0]) or command[0]
+        key = cls.key_of(path)
+        return (' '.join([key] + command[1:]) if len(command) > 1 else key), path
+
+    @staticmethod
+    def _stamp(path: str) -> Optional[Tuple[float, int]]:
+        try:
+            st = os.stat(path)
+        except OSError:
+            return None
+        return st.st_mtime, st.st_size
+
+    def _valid(self, entry: Optional[Dict]) -> Optional[Dict]:
+        return entry if entry is not None and self._stamp(entry['path']) == (entry['mtime'], entry['size']) else None
+
+    def lookup(self, command: List[str]) -> Optional[Dict]:
+        """The entry for the interpreter command starts, if nothing has changed since it was probed"""
+        with self._lock:
+            entry = self._entries.get(self.launch_key(command)[0])
+            target = self._entries.get(entry['alias']) if entry is not None and 'alias' in entry else None
+        if target is not None:
+            # Started through a shim, wrapper or launcher: it and the interpreter must both be unchanged
+            return self._valid(target) if self._valid(entry) else None
+        return self._valid(entry)
+
+    def store(self, version: Dict, command: Optional[List[str]] = None) -> Optional[Dict]:
+        """Record a probe result (see PythonVersionDetector.probe); returns the entry.
+
+        command is how the interpreter was started. When it is not the interpreter
+        itself (a shim, a wrapper script or py -3.11), it is recorded as an alias of
+        the entry, so that looking the command up again finds it.
+        """
+        stamp = self._stamp(version['path'])
+        if stamp is None:
+            return None
+        entry = dict(version, key=self.key_of(version['path']), mtime=stamp[0], size=stamp[1])
+        alias = None
+        if command:
+            key, path = self.launch_key(command)
+            launcher = self._stamp(path)
+            if key != entry['key'] and launcher is not None:
+                alias = {'key': key, 'alias': entry['key'], 'path': path, 'mtime': launcher[0], 'size': launcher[1]}
+        with self._lock:
+            self._entries[entry['key']] = entry
+            if alias is not None:
+                self._entries[alias['key']] = alias
+            self._dirty = True
+        return entry
+
+    def store_failure(self, command: List[str]):
+        key, path = self.launch_key(command)
+        stamp = self._stamp(path)
+        if stamp is None:
+            return
+        with self._lock:
+            self._entries[key] = {'key': key, 'path': path, 'failed': True, 'mtime': stamp[0], 'size': stamp[1]}
+            self._dirty = True
+
+    def cached(self) -> List[Dict]:
+        """Entries still valid, without spawning anything"""
+        with self._lock:
+            entries = [e for e in self._entries.values() if not e.get('failed') and 'alias' not in e]
+        return [e for e in entries if self._valid(e)]
+
+    def resolve(self, path: str) -> Optional[Dict]:
+        """The entry for path, probing the interpreter only if it is unknown or changed"""
+        entry = self.lookup([path])
+        if entry is None:
+            version = PythonVersionDetector.probe(os.path.basename(path), [path])
+            if version:
+                entry = self.store(version, [path])
+            else:
+                self.store_failure([path])
+            self.save()
+        return entry if entry is not None and not entry.get('failed') else None
+
+    def version_info(self, path: str) -> Optional[Tuple[int, int]]:
+        entry = self.resolve(path)
+        key = PythonVersionDetector.version_key(entry) if entry else ()
+        return key[:2] if len(key) >= 2 and key[0] else None
+
+    def save(self) -> Optional[str]:
+        """Write the entries if they changed; returns why they could not be written"""
+        with self._lock:
+            if not self._dirty:
+                return None
+            data = {'format': self.FORMAT_VERSION, 'interpreters': list(self._entries.values())}
+            self._dirty = False
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            fd, tmp = tempfile.mkstemp(dir=os.path.dirname(self.path), suffix='.tmp')
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump(data, f, indent=1)
+            os.replace(tmp, self.path)
+        except OSError as e:
+            with self._lock:
+                self._dirty = True  # the next save tries again
+            return str(e)
+        return None
+
+
+class EnvironmentScanner:
+    """Virtual environments, conda environments and pyenv versions, read from their files on disk"""
+    VENV_DIRS = ('.venv', 'venv', 'env', '.env')
+    CONDA_ROOTS = ('anaconda3', 'miniconda3', 'miniforge3', 'mambaforge', 'anaconda', 'miniconda', 'micromamba')
+    CONDA_META_RE = re.compile(r'python-(\d+\.\d+\.\d+\w*)-[^-]+\.json$')
+    PATCHLEVEL_RE = re.compile(r'#define\s+PY_VERSION\s+"([^"]+)"')
+    LIB_RE = re.compile(r'python(\d+\.\d+)t?$')
+
+    @staticmethod
+    def _subdirs(path: str) -> List[str]:
+        try:
+            return sorted(e.path for e in os.scandir(path) if e.is_dir())
+        except OSError:
+            return []
+
+    @staticmethod
+    def executable(prefix: str) -> Optional[str]:
+        for parts in (('Scripts', 'python.exe'), ('python.exe',), ('bin', 'python3'), ('bin', 'python')):
+            path = os.path.join(prefix, *parts)
+            if os.path.isfile(path):
+                return path
+        return None
+
+    @staticmethod
+    def read_pyvenv_cfg(prefix: str) -> Dict[str, str]:
+        cfg = {}
+        try:
+            with open(os.path.join(prefix, 'pyvenv.cfg'), 'r', encoding='utf-8', errors='replace') as f:
+                for line in f:
+                    key, sep, value = line.partition('=')
+                    if sep:
+                        cfg[key.strip().lower()] = value.strip()
+        except OSError:
+            pass
+        return cfg
+
+    @classmethod
+    def version_of(cls, prefix: str, cfg: Optional[Dict[str, str]] = None, depth: int = 0) -> Optional[str]:
+        """Version of the interpreter installed at prefix, from its files"""
+        cfg = cls.read_pyvenv_cfg(prefix) if cfg is None else cfg
+        version = cfg.get('version') or cfg.get('version_info')  # venv / virtualenv and uv
+        if version:
+            return '.'.join(version.split('.')[:3])
+        for name in sorted(os.listdir(os.path.join(prefix, 'conda-meta'))) \
+                if os.path.isdir(os.path.join(prefix, 'conda-meta')) else ():
+            m = cls.CONDA_META_RE.match(name)
+            if m:
+                return m.group(1)
+        for include in cls._subdirs(os.path.join(prefix, 'include')) + [os.path.join(prefix, 'include')]:
+            try:
+                with open(os.path.join(include, 'patchlevel.h'), 'r', encoding='utf-8', errors='replace') as f:
+                    m = cls.PATCHLEVEL_RE.search(f.read())
+                if m:
+                    return m.group(1)
+            except OSError:
+                continue
+        home = cfg.get('home')
+        if home and depth < 2:
+            # An older venv: the base interpreter's version
+            base = os.path.dirname(home) if os.path.basename(home).lower() in ('bin', 'scripts') else home
+            version = cls.version_of(base, {}, depth + 1)
+            if version:
+                return version
+        for lib in cls._subdirs(os.path.join(prefix, 'lib')):
+            m = cls.LIB_RE.match(os.path.basename(lib))
+            if m:
+                return m.group(1)
+        return None
+
+    @staticmethod
+    def architecture(path: str) -> str:
+        """'64bit' or '32bit' from the ELF, PE or Mach-O header of an executable"""
+        try:
+            with open(path, 'rb') as f:
+                head = f.read(64)
+                if head[:4] == b'\x7fELF':
+                    return {1: '32bit', 2: '64bit'}.get(head[4], 'Unknown')
+                if head[:2] == b'MZ':
+                    f.seek(int.from_bytes(head[0x3c:0x40], 'little'))
+                    pe = f.read(6)
+                    if pe[:4] == b'PE\0\0':
+                        return '32bit' if int.from_bytes(pe[4:6], 'little') == 0x14c else '64bit'
+                if head[:4] in (b'\xcf\xfa\xed\xfe', b'\xca\xfe\xba\xbe'):
+                    return '64bit'
+                if head[:4] == b'\xce\xfa\xed\xfe':
+                    return '32bit'
+        except OSError:
+            pass
+        return 'Unknown'
+
+    @classmethod
+    def describe(cls, prefix: str, source: str) -> Optional[Dict]:
+        """Interpreter dict in the format of PythonVersionDetector.probe, or None"""
+        executable = cls.executable(prefix)
+        if executable is None:
+            return None
+        cfg = cls.read_pyvenv_cfg(prefix)
+        version_number = cls.version_of(prefix, cfg)
+        if not version_number or not version_number.startswith('3.'):
+            return None
+        is_venv = bool(cfg)
+        env_name = os.path.basename(prefix)
+        if source == 'conda' and not is_venv:
+            env_name = f"conda: {env_name}"
+        elif source == 'pyenv' and not is_venv:
+            env_name = f"pyenv: {env_name}"
+        return {
+            'name': os.path.basename(executable),
+            'version': f"Python {version_number}",
+            'path': executable,
+            'version_number': version_number,
+            'architecture': cls.architecture(executable),
+            'prefix': prefix,
+            'is_venv': is_venv,
+            'env_name': env_name,
+            'key': InterpreterRegistry.key_of(executable),
+        }
+
+    @classmethod
+    def prefixes(cls, roots: List[str]) -> List[Tuple[str, str]]:
+        """(prefix, source) of every environment worth describing"""
+        found: List[Tuple[str, str]] = []
+        for root in roots:
+            # A project's own environments: the root itself or a folder just below it
+            for d in [root] + cls._subdirs(root):
+                if os.path.isfile(os.path.join(d, 'pyvenv.cfg')):
+                    found.append((d, 'venv'))
+        home = os.path.expanduser('~')
+        pyenv_root = os.environ.get('PYENV_ROOT') or os.path.join(home, '.pyenv')
+        for versions in (os.path.join(pyenv_root, 'versions'), os.path.join(pyenv_root, 'pyenv-win', 'versions')):
+            for d in cls._subdirs(versions):
+                found.append((d, 'pyenv'))
+                found.extend((e, 'venv') for e in cls._subdirs(os.path.join(d, 'envs')))
+        conda_roots = [os.path.join(home, name) for name in cls.CONDA_ROOTS]
+        if os.environ.get('CONDA_EXE'):
+            conda_roots.append(os.path.dirname(os.path.dirname(os.environ['CONDA_EXE'])))
+        if os.environ.get('CONDA_PREFIX'):
+            conda_roots.append(os.environ['CONDA_PREFIX'])
+        try:
+            with open(os.path.join(home, '.conda', 'environments.txt'), 'r', encoding='utf-8') as f:
+                conda_roots.extend(line.strip() for line in f if line.strip())
+        except OSError:
+            pass
+        for d in conda_roots:
+            if os.path.isdir(os.path.join(d, 'conda-meta')):
+                found.append((d, 'conda'))
+                found.extend((e, 'conda') for e in cls._subdirs(os.path.join(d, 'envs')))
+        seen = set()
+        unique = []
+        for prefix, source in found:
+            key = os.path.normcase(os.path.realpath(prefix))
+            if key not in seen:
+                seen.add(key)
+                unique.append((prefix, source))
+        return unique
+
+    @classmethod
+    def scan(cls, roots: List[str]) -> List[Dict]:
+        return [v for v in (cls.describe(prefix, source) for prefix, source in cls.prefixes(roots)) if v]
+
 
 class PythonVersionDetector:
+    """Installed interpreters, each probed once and in parallel"""
+    # One probe per interpreter; the lines are read back by probe
+    PROBE = ('import sys, platform\n'
+             'print(platform.python_version())\n'
+             'print(platform.architecture()[0])\n'
+             'print(sys.prefix)\n'
+             'print(sys.executable)\n'
+             'print(getattr(sys, "base_prefix", sys.prefix))\n')
+    PROBE_TIMEOUT = 8
+    STOP_POLL = 0.1  # seconds between checks of should_stop while a probe runs
+    MAX_PROBES = 8  # concurrent probe processes
+
     @staticmethod
-    def get_installed_versions() -> List[Dict]:
-        versions = []
-        checked_paths = set()
-        python_names = ['python', 'python3', 'py']
+    def candidates() -> List[Tuple[str, List[str]]]:
+        """(name, command) of every distinct interpreter that may exist, without running any"""
+        python_names = ['python', 'python3']
         for major in range(3, 4):
             for minor in range(6, 14):
                 python_names.extend([f'python{major}.{minor}', f'python{major}{minor}'])
-        if platform.system() == "Windows":
-            for major in range(3, 4):
-                for minor in range(6, 14):
-                    python_names.append(f'py -{major}.{minor}')
 
         common_paths = []
         if platform.system() == "Windows":
@@ -1276,74 +4488,233 @@ class PythonVersionDetector:
                 '/opt/python/bin/python3', '/usr/bin/python', '/usr/local/bin/python'
             ])
 
-        for candidate in list(dict.fromkeys(python_names + common_paths)):
-            try:
-                if candidate.startswith('py -'):
-                    cmd = candidate.split() + ['--version']
-                else:
-                    cmd = [candidate, '--version']
-                result = subprocess.run(cmd, capture_output=True, text=True, timeout=8)
-                if result.returncode == 0:
-                    version_text = result.stdout.strip() or result.stderr.strip()
-                    if 'Python' in version_text:
-                        if candidate.startswith('py -'):
-                            path_cmd = candidate.split() + ['-c', 'import sys; print(sys.executable)']
-                        else:
-                            path_cmd = [candidate, '-c', 'import sys; print(sys.executable)']
-                        path_result = subprocess.run(path_cmd, capture_output=True, text=True, timeout=8)
-                        executable_path = path_result.stdout.strip() if path_result.returncode == 0 else candidate
-                        if executable_path in checked_paths:
-                            continue
-                        checked_paths.add(executable_path)
-                        info_cmd = path_cmd[:-1] + ['-c', 'import sys,platform;'
-                                                              'print(f"{sys.version_info.major}.{sys.version_info.minor}.{sys.version_info.micro}")\n'
-                                                              'print(platform.architecture()[0])\n'
-                                                              'print(sys.prefix)\n']
-                        info_result = subprocess.run(info_cmd, capture_output=True, text=True, timeout=8)
-                        if info_result.returncode == 0:
-                            lines = info_result.stdout.strip().splitlines()
-                            version_number = lines[0] if len(lines) > 0 else "Unknown"
-                            architecture = lines[1] if len(lines) > 1 else "Unknown"
-                            prefix = lines[2] if len(lines) > 2 else "Unknown"
-                        else:
-                            version_number = "Unknown"; architecture = "Unknown"; prefix = "Unknown"
-
-                        versions.append({
-                            'name': candidate,
-                            'version': version_text,
-                            'path': executable_path,
-                            'version_number': version_number,
-                            'architecture': architecture,
-                            'prefix': prefix
-                        })
-            except Exception:
+        found: Dict[str, Tuple[str, List[str]]] = {}
+        for candidate in python_names + common_paths:
+            path = shutil.which(candidate) if not os.path.isabs(candidate) else candidate
+            if not path or not os.path.isfile(path) or not os.access(path, os.X_OK):
                 continue
+            # python, python3 and python3.x are usually links to one binary
+            found.setdefault(InterpreterRegistry.key_of(path), (candidate, [path]))
+        commands = list(found.values())
+        # The launcher picks installs itself; they are told apart by what they report
+        if platform.system() == "Windows" and shutil.which('py'):
+            for major in range(3, 4):
+                for minor in range(6, 14):
+                    commands.append((f'py -{major}.{minor}', ['py', f'-{major}.{minor}']))
+        return commands
 
-        def version_key(v):
-            try:
-                return tuple(int(x) for x in v['version_number'].split('.'))
-            except Exception:
-                return (0, 0, 0)
+    @classmethod
+    def probe(cls, name: str, command: List[str], should_stop=lambda: False) -> Optional[Dict]:
+        """Run the probe script with command; the process is killed on timeout or once should_stop()"""
+        try:
+            process = subprocess.Popen(command + ['-c', cls.PROBE], stdout=subprocess.PIPE,
+                                       stderr=subprocess.PIPE, text=True)
+        except (OSError, subprocess.SubprocessError):
+            return None
+        deadline = time.monotonic() + cls.PROBE_TIMEOUT
+        with process:
+            while True:
+                try:
+                    stdout, _ = process.communicate(timeout=cls.STOP_POLL)
+                    break
+                except subprocess.TimeoutExpired:
+                    if should_stop() or time.monotonic() > deadline:
+                        # Not drained: a child of a wrapper script may hold the pipes open
+                        process.kill()
+                        return None
+        lines = stdout.strip().splitlines()
+        if process.returncode != 0 or len(lines) < 5:
+            return None
+        version_number, architecture, prefix, executable, base_prefix = lines[:5]
+        return {
+            'name': name,
+            'version': f"Python {version_number}",
+            'path': executable or command[0],
+            'version_number': version_number,
+            'architecture': architecture,
+            'prefix': prefix,
+            'is_venv': os.path.normcase(prefix) != os.path.normcase(base_prefix)
+        }
+
+    @classmethod
+    def discover(cls, should_stop=lambda: False, registry: Optional[InterpreterRegistry] = None,
+                 roots: List[str] = (), warn=None):
+        """Yield interpreter dicts: environments on disk and known interpreters first,
+        the rest as their probes finish. roots are searched for project environments;
+        warn(message) is called if the registry cannot be saved."""
+        registry = registry or InterpreterRegistry.instance()
+        seen = set()
+        for found in EnvironmentScanner.scan(list(roots)):
+            entry = registry.lookup([found['path']])
+            if entry is not None and not entry.get('failed'):
+                found = dict(entry, env_name=found['env_name'])  # probed details, where known
+            if found['key'] not in seen:
+                seen.add(found['key'])
+                yield found
+        to_probe = []
+        for name, command in cls.candidates():
+            entry = registry.lookup(command)
+            if entry is None:
+                to_probe.append((name, command))
+            elif not entry.get('failed') and entry['key'] not in seen:
+                seen.add(entry['key'])
+                yield entry
+        if not to_probe:
+            return
+        pool = ThreadPoolExecutor(max_workers=min(cls.MAX_PROBES, len(to_probe)))
+        try:
+            futures = {pool.submit(cls.probe, name, command, should_stop): command for name, command in to_probe}
+            for future in as_completed(futures):
+                if should_stop():
+                    break
+                version = future.result()
+                if version is None:
+                    registry.store_failure(futures[future])
+                    continue
+                entry = registry.store(version, futures[future])
+                if entry is not None and entry['key'] not in seen:
+                    seen.add(entry['key'])
+                    yield entry
+        finally:
+            pool.shutdown(wait=False, cancel_futures=True)
+            error = registry.save()
+            if error and warn:
+                warn(f"Saving interpreter registry failed: {error}")
 
-        versions.sort(key=version_key, reverse=True)
-        return versions
+    @staticmethod
+    def display_name(v: Dict) -> str:
+        text = f"{v['version']} ({v['architecture']})"
+        env_name = v.get('env_name') or (os.path.basename(v['prefix']) if v.get('is_venv') else '')
+        if env_name:
+            text += f" [{env_name}]"
+        return text
+
+    @staticmethod
+    def version_key(v: Dict) -> Tuple[int, ...]:
+        # "3.13.0rc1" sorts as 3.13.0
+        parts = re.match(r'(\d+)\.(\d+)(?:\.(\d+))?', v.get('version_number') or '')
+        return tuple(int(x or 0) for x in parts.groups()) if parts else (0, 0, 0)
+
+    @classmethod
+    def get_installed_versions(cls) -> List[Dict]:
+        return sorted(cls.discover(), key=cls.version_key, reverse=True)
+
+
+class InterpreterDiscovery(QThread):
+    """Runs PythonVersionDetector.discover off the UI thread, one signal per interpreter"""
+    found = pyqtSignal(dict)
+    failed = pyqtSignal(str)  # message
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.roots: List[str] = []  # folders searched for project environments
+
+    def run(self):
+        for version in PythonVersionDetector.discover(self.isInterruptionRequested, roots=self.roots,
+                                                      warn=self.failed.emit):
+            self.found.emit(version)
 
 # =============================
 # Enhanced Code Runner
 # =============================
 
+class WarmInterpreterPool:
+    """Interpreters started ahead of time with chosen modules already imported"""
+    WORKER_SCRIPT = '''
+import sys, os, json, runpy, importlib, traceback, threading, atexit
+for _name in sys.argv[1:]:
+    try:
+        importlib.import_module(_name)
+    except Exception:
+        pass  # the script reports it if it needs the module
+_request = json.loads(sys.stdin.readline() or 'null')
+if not _request:
+    sys.exit(0)
+os.chdir(_request['cwd'])
+_path = _request['path']
+sys.argv = [_path]
+sys.path[0] = os.path.dirname(os.path.abspath(_path))
+_code = 0
+try:
+    runpy.run_path(_path, run_name='__main__')
+except SystemExit as _e:
+    if isinstance(_e.code, int):
+        _code = _e.code
+    elif _e.code is not None:
+        print(_e.code, file=sys.stderr)
+        _code = 1
+except BaseException as _e:
+    # Show the traceback from the script down, as a cold run would
+    _tb = _e.__traceback__
+    while _tb is not None and _tb.tb_frame.f_code.co_filename != _path:
+        _tb = _tb.tb_next
+    traceback.print_exception(type(_e), _e, _tb or _e.__traceback__)
+    _code = 1
+# Exit as Python would, minus tearing down the preloaded modules
+for _thread in threading.enumerate():
+    if _thread is not threading.main_thread() and not _thread.daemon:
+        _thread.join()
+atexit._run_exitfuncs()
+sys.stdout.flush()
+sys.stderr.flush()
+os._exit(_code)
+'''
+
+    def __init__(self, size: int = 1):
+        self.size = size
+        self._key: Optional[Tuple[str, str, Tuple[str, ...]]] = None
+        self._workers: List[subprocess.Popen] = []
+
+    def prepare(self, python_path: str, working_dir: str, modules: List[str]):
+        """Keep size workers ready for these settings, dropping any started for others.
+        Raises OSError if a worker cannot be started; those already running are kept."""
+        key = (python_path, working_dir, tuple(modules))
+        if key != self._key:
+            self.shutdown()
+            self._key = key
+        self._workers = [w for w in self._workers if w.poll() is None]
+        while len(self._workers) < self.size:
+            env = dict(os.environ, PYTHONUNBUFFERED="1", PYTHONIOENCODING="utf-8")
+            self._workers.append(subprocess.Popen(
+                [python_path, '-c', self.WORKER_SCRIPT] + list(modules), cwd=working_dir, env=env,
+                stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.PIPE))
+
+    def take(self, python_path: str, working_dir: str, modules: List[str]) -> Optional[subprocess.Popen]:
+        """A ready worker for these settings, or None. Its replacement is started by the
+        next prepare, once the run is over, so the two do not compete for the CPU"""
+        if self._key != (python_path, working_dir, tuple(modules)):
+            return None
+        while self._workers:
+            worker = self._workers.pop(0)
+            if worker.poll() is None:
+                return worker
+        return None
+
+    def shutdown(self):
+        for worker in self._workers:
+            if worker.poll() is None:
+                worker.kill()
+            worker.wait()
+            for stream in (worker.stdin, worker.stdout, worker.stderr):
+                stream.close()
+        self._workers = []
+        self._key = None
+
+
 class EnhancedCodeRunner(QThread):
     output_received = pyqtSignal(str)
     error_received = pyqtSignal(str)
     finished_signal = pyqtSignal(int)
     started_signal = pyqtSignal()
 
-    def __init__(self, code: str, python_path: str, working_dir: str = None, parent=None):
+    def __init__(self, code: str, python_path: str, working_dir: str = None, parent=None,
+                 worker: Optional[subprocess.Popen] = None):
         super().__init__(parent)
         self.code = code
         self.python_path = python_path
         self.working_dir = working_dir or os.getcwd()
         self.process: Optional[QProcess] = None
+        self.worker = worker  # a WarmInterpreterPool worker to run in instead of a new process
         self.temp_file: Optional[str] = None
         self._is_running = False
 
@@ -1355,6 +4726,9 @@ class EnhancedCodeRunner(QThread):
             fd, self.temp_file = tempfile.mkstemp(suffix='.py')
             with os.fdopen(fd, 'w', encoding='utf-8') as f:
                 f.write(self.code)
+            if self.worker is not None:
+                self.run_warm()
+                return
 
             self.process = QProcess()
             self.process.setWorkingDirectory(self.working_dir)
@@ -1383,6 +4757,41 @@ class EnhancedCodeRunner(QThread):
         finally:
             self.cleanup()
 
+    def run_warm(self):
+        worker = self.worker
+        pumps = [threading.Thread(target=self._pump, args=(worker.stdout, self.output_received), daemon=True),
+                 threading.Thread(target=self._pump, args=(worker.stderr, self.error_received), daemon=True)]
+        for pump in pumps:
+            pump.start()
+        try:
+            request = json.dumps({'path': self.temp_file, 'cwd': self.working_dir}) + '\n'
+            worker.stdin.write(request.encode('utf-8'))
+            worker.stdin.flush()
+        except OSError:
+            self.error_received.emit("Warm interpreter exited before the run\n")
+        exit_code = worker.wait()
+        for pump in pumps:
+            pump.join()
+        worker.stdin.close()
+        self._is_running = False
+        self.finished_signal.emit(int(exit_code))
+
+    @staticmethod
+    def _pump(stream, signal):
+        decoder = codecs.getincrementaldecoder('utf-8')(errors='replace')
+        fd = stream.fileno()
+        while True:
+            try:
+                data = os.read(fd, 65536)
+            except OSError:
+                data = b''
+            text = decoder.decode(data, final=not data)
+            if text:
+                signal.emit(text)
+            if not data:
+                break
+        stream.close()
+
     def read_stdout(self):
         if self.process:
             data = self.process.readAllStandardOutput().data().decode('utf-8', errors='replace')
@@ -1405,6 +4814,15 @@ class EnhancedCodeRunner(QThread):
 
     def stop(self, force: bool = False):
         # Graceful terminate or force kill
+        if self.worker is not None and self.worker.poll() is None:
+            if force:
+                self.worker.kill()
+            else:
+                self.worker.terminate()
+                try:
+                    self.worker.wait(2)
+                except subprocess.TimeoutExpired:
+                    self.worker.kill()
         if self.process and self.process.state() == QProcess.Running:
             if force:
                 self.process.kill()
@@ -1429,6 +4847,365 @@ class EnhancedCodeRunner(QThread):
     def is_running(self):
         return self._is_running
 
+# =============================
+# Hot Reload
+# =============================
+
+class HotReloader:
+    """Pushes edited functions and classes into a live kernel or debug session"""
+    PATCH_SCRIPT = r'''
+import sys, types, linecache, traceback
+_MISSING = object()
+_SLOTS = (types.MemberDescriptorType, types.GetSetDescriptorType)
+
+def _chain(obj):
+    """obj and the objects it wraps: method wrappers and functools.wraps decorators"""
+    chain, seen = [], set()
+    while obj is not None and id(obj) not in seen:
+        seen.add(id(obj))
+        chain.append(obj)
+        obj = getattr(obj, '__func__', None) or getattr(obj, '__wrapped__', None)
+    return chain
+
+def _swap(old, new):
+    if not (isinstance(old, types.FunctionType) and isinstance(new, types.FunctionType)):
+        return False
+    if old.__code__.co_freevars != new.__code__.co_freevars:
+        return False  # another closure layout; the old function cannot run the new code
+    old.__code__ = new.__code__
+    old.__defaults__, old.__kwdefaults__ = new.__defaults__, new.__kwdefaults__
+    old.__doc__, old.__annotations__ = new.__doc__, new.__annotations__
+    return True
+
+def _update(old, new):
+    if isinstance(old, property) and isinstance(new, property):
+        pairs = ((old.fget, new.fget), (old.fset, new.fset), (old.fdel, new.fdel))
+        return all(a is b or (a is not None and b is not None and _update(a, b)) for a, b in pairs)
+    old_chain, new_chain = _chain(old), _chain(new)
+    # A decorator added or removed changes the wrappers: the binding must be replaced
+    if not old_chain or [type(o) for o in old_chain] != [type(n) for n in new_chain]:
+        return False
+    return _swap(old_chain[-1], new_chain[-1])
+
+def _update_class(old, new):
+    for value in new.__dict__.values():
+        for f in _chain(value.fget if isinstance(value, property) else value):
+            if isinstance(f, types.FunctionType) and '__class__' in f.__code__.co_freevars:
+                # super() and __class__ in the new methods must find the live class
+                try:
+                    f.__closure__[f.__code__.co_freevars.index('__class__')].cell_contents = old
+                except (AttributeError, TypeError):
+                    pass
+    for name, value in new.__dict__.items():
+        if name in ('__dict__', '__weakref__') or isinstance(value, _SLOTS):
+            continue
+        current = old.__dict__.get(name, _MISSING)
+        if isinstance(current, type) and isinstance(value, type) and current.__name__ == value.__name__:
+            _update_class(current, value)
+            continue
+        if current is value or (current is not _MISSING and _update(current, value)):
+            continue
+        try:
+            setattr(old, name, value)
+        except (AttributeError, TypeError):
+            pass
+
+def _hot_patch(module, definitions, filename, source):
+    if source is not None:
+        linecache.cache[filename] = (len(source), None, source.splitlines(True), filename)
+    namespace = module.__dict__
+    report = []
+    for name, line, text in definitions:
+        old = namespace.get(name, _MISSING)
+        try:
+            # Padding keeps line numbers, and so breakpoints, those of the editor
+            exec(compile('\n' * (line - 1) + text, filename, 'exec'), namespace)
+            new = namespace.get(name)
+            if old is _MISSING:
+                report.append(name + ' (added)')
+            elif isinstance(old, type) and isinstance(new, type):
+                _update_class(old, new)
+                namespace[name] = old
+                report.append(name)
+            elif _update(old, new):
+                namespace[name] = old
+                report.append(name)
+            else:
+                report.append(name + ' (rebound)')
+        except Exception:
+            traceback.print_exc()
+            report.append(name + ' (failed)')
+    print('Pushed: ' + ', '.join(report))
+
+_hot_patch(sys.modules['__main__'], DEFINITIONS, FILENAME, SOURCE)
+'''
+
+    @staticmethod
+    def definitions(code: str) -> Optional[Dict[str, Tuple[int, str]]]:
+        """{name: (first line, source)} of the top-level functions and classes,
+        decorators included; None when the code does not parse"""
+        structure = CodeStructureParser.parse_code(code, keep_tree=True)
+        if 'error' in structure:
+            return None
+        # Decorators are not part of the outline's ranges; the tree knows where they start
+        starts = {node.lineno: min([node.lineno] + [d.lineno for d in node.decorator_list])
+                  for node in structure['tree'].body
+                  if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef))}
+        lines = code.split('\n')
+        result = {}
+        for entry in structure['functions'] + structure['classes']:
+            start = starts.get(entry['line'])
+            if start is not None:
+                result[entry['name']] = (start, '\n'.join(lines[start - 1:entry['end_line']]))
+        return result
+
+    @staticmethod
+    def changed(baseline: Dict[str, Tuple[int, str]], current: Dict[str, Tuple[int, str]]) -> List[str]:
+        """Names in current whose source differs from (or is missing in) baseline, in file order"""
+        names = [name for name, (_, text) in current.items() if baseline.get(name, (0, None))[1] != text]
+        return sorted(names, key=lambda name: current[name][0])
+
+    @classmethod
+    def command(cls, current: Dict[str, Tuple[int, str]], names: List[str],
+                filename: str, source: Optional[str]) -> str:
+        """A one-line statement that applies the definitions names in the target process"""
+        payload = [(name, current[name][0], current[name][1]) for name in names]
+        return (f"exec({cls.PATCH_SCRIPT!r}, {{'__name__': '_hot_reload', 'DEFINITIONS': {payload!r}, "
+                f"'FILENAME': {filename!r}, 'SOURCE': {source!r}}})")
+
+# =============================
+# Python Kernel
+# =============================
+
+class PythonKernel(QObject):
+    """A long-lived interpreter holding one namespace, for running cells, selections and definitions"""
+    output_received = pyqtSignal(str)
+    error_received = pyqtSignal(str)
+    execution_finished = pyqtSignal(int, bool, float)  # request id, succeeded, seconds
+    busy_changed = pyqtSignal(bool)
+    finished_signal = pyqtSignal(int)  # the kernel process exited
+    MESSAGE_PREFIX = '\x1e'
+    CELL_RE = re.compile(r'^\s*#\s*%%')
+    KERNEL_SCRIPT = r'''
+import sys, os, io, ast, json, time, types, queue, threading, traceback, linecache, builtins, _thread
+_out = sys.stdout
+_lock = threading.Lock()
+
+def _send(message):
+    with _lock:
+        _out.write('\x1e' + json.dumps(message) + '\n')
+        _out.flush()
+
+class _Stream(io.TextIOBase):
+    def __init__(self, name):
+        self.name = name
+    def writable(self):
+        return True
+    def write(self, text):
+        if text:
+            _send({'stream': self.name, 'text': text})
+        return len(text)
+
+_requests = queue.Queue()
+
+def _read():
+    for line in sys.__stdin__:
+        try:
+            message = json.loads(line)
+        except ValueError:
+            continue
+        if message.get('interrupt'):
+            _thread.interrupt_main()
+        elif 'patch' in message:
+            # Applied right away, so a long computation picks up the new code as it runs
+            try:
+                exec(message['patch'], {'__name__': '_hot_reload'})
+            except Exception:
+                traceback.print_exc()
+        else:
+            _requests.put(message)
+    _requests.put(None)
+
+def _run(request):
+    filename = request['filename']
+    if request.get('source') is not None:
+        linecache.cache[filename] = (len(request['source']), None, request['source'].splitlines(True), filename)
+    # Padding keeps line numbers those of the editor
+    tree = ast.parse('\n' * (request['line'] - 1) + request['code'], filename)
+    last = tree.body.pop() if tree.body and isinstance(tree.body[-1], ast.Expr) else None
+    exec(compile(tree, filename, 'exec'), _main.__dict__)
+    if last is not None:
+        value = eval(compile(ast.Expression(last.value), filename, 'eval'), _main.__dict__)
+        if value is not None:
+            builtins._ = value
+            print(repr(value))
+
+sys.stdout, sys.stderr, sys.stdin = _Stream('stdout'), _Stream('stderr'), io.StringIO()
+sys.path[0] = sys.argv[1] if len(sys.argv) > 1 else os.getcwd()
+_main = types.ModuleType('__main__')
+_main.__dict__['__builtins__'] = builtins
+sys.modules['__main__'] = _main
+threading.Thread(target=_read, daemon=True).start()
+_send({'ready': sys.version.split()[0]})
+while True:
+    try:
+        _request = _requests.get()
+        if _request is None:
+            break
+        _start, _ok = time.perf_counter(), True
+        try:
+            _run(_request)
+        except SystemExit:
+            pass  # the kernel outlives the code it runs
+        except BaseException as _e:
+            _ok = False
+            _tb = _e.__traceback__
+            while _tb is not None and _tb.tb_frame.f_code.co_filename == '<string>':
+                _tb = _tb.tb_next
+            sys.stderr.write(''.join(traceback.format_exception(type(_e), _e, _tb)))
+        _send({'done': _request['id'], 'ok': _ok, 'seconds': time.perf_counter() - _start})
+    except KeyboardInterrupt:
+        pass  # an interrupt that arrived between requests
+'''
+
+    def __init__(self, python_path: str, working_dir: str, script_dir: Optional[str] = None, parent=None):
+        super().__init__(parent)
+        self.python_path = python_path
+        self.working_dir = working_dir
+        self.script_dir = script_dir or working_dir
+        self.process: Optional[QProcess] = None
+        self._pending: Set[int] = set()
+        self._next_id = 0
+        self._buffer = b''
+        # Source of the definitions as last run, for pushing changes (HotReloader)
+        self.definitions: Dict[str, Tuple[int, str]] = {}
+
+    def start(self):
+        self.process = QProcess(self)
+        self.process.setWorkingDirectory(self.working_dir)
+        env = QProcessEnvironment.systemEnvironment()
+        env.insert("PYTHONUNBUFFERED", "1")
+        env.insert("PYTHONIOENCODING", "utf-8")
+        self.process.setProcessEnvironment(env)
+        self.process.readyReadStandardOutput.connect(self._read_stdout)
+        self.process.readyReadStandardError.connect(self._read_stderr)
+        self.process.finished.connect(self._finished)
+        self.process.start(self.python_path, ['-c', self.KERNEL_SCRIPT, self.script_dir])
+
+    def is_running(self) -> bool:
+        return self.process is not None and self.process.state() != QProcess.NotRunning
+
+    def is_busy(self) -> bool:
+        return bool(self._pending)
+
+    def execute(self, code: str, filename: str, first_line: int = 1, source: Optional[str] = None) -> int:
+        """Queue code for the kernel; first_line is its line in the editor, source
+        the editor's text for tracebacks. Returns the request id."""
+        if not self.is_running():
+            self.start()
+        self._next_id += 1
+        was_busy = self.is_busy()
+        self._pending.add(self._next_id)
+        self._send({'id': self._next_id, 'code': code, 'filename': filename,
+                    'line': first_line, 'source': source})
+        if not was_busy:
+            self.busy_changed.emit(True)
+        return self._next_id
+
+    def push(self, command: str):
+        """Run a HotReloader command now, even while code is executing"""
+        if self.is_running():
+            self._send({'patch': command})
+
+    def interrupt(self):
+        if not self.is_running() or not self.is_busy():
+            return
+        if os.name == 'posix':
+            # A real SIGINT also wakes sleeps and blocking calls
+            os.kill(int(self.process.processId()), signal.SIGINT)
+        else:
+            self._send({'interrupt': True})
+
+    def restart(self):
+        self.shutdown()
+        self.start()
+
+    def shutdown(self):
+        if self.process is None:
+            return
+        process, self.process = self.process, None
+        process.finished.disconnect(self._finished)
+        if process.state() != QProcess.NotRunning:
+            process.closeWriteChannel()
+            if not process.waitForFinished(1000):
+                process.kill()
+                process.waitForFinished(3000)
+        process.deleteLater()
+        self._buffer = b''
+        self._clear_pending()
+
+    def _send(self, message: Dict):
+        self.process.write((json.dumps(message) + '\n').encode('utf-8'))
+
+    def _clear_pending(self):
+        if self._pending:
+            self._pending.clear()
+            self.busy_changed.emit(False)
+
+    def _read_stdout(self):
+        if not self.process:
+            return
+        self._buffer += self.process.readAllStandardOutput().data()
+        *lines, self._buffer = self._buffer.split(b'\n')
+        prefix = self.MESSAGE_PREFIX.encode()
+        raw = []
+        for line in lines:
+            # Output written around sys.stdout (os.write, C code) may leave a frame mid-line
+            before, found, frame = line.partition(prefix)
+            if not found:
+                raw.append(before.decode('utf-8', errors='replace') + '\n')
+                continue
+            if before:
+                raw.append(before.decode('utf-8', errors='replace'))
+            if raw:
+                self.output_received.emit(''.join(raw))
+                raw = []
+            try:
+                message = json.loads(frame.decode('utf-8', errors='replace'))
+            except ValueError:
+                continue
+            if 'stream' in message:
+                (self.output_received if message['stream'] == 'stdout' else self.error_received).emit(message['text'])
+            elif 'done' in message:
+                self._pending.discard(message['done'])
+                self.execution_finished.emit(message['done'], message['ok'], message['seconds'])
+                if not self._pending:
+                    self.busy_changed.emit(False)
+        if raw:
+            self.output_received.emit(''.join(raw))
+
+    def _read_stderr(self):
+        if self.process:
+            data = self.process.readAllStandardError().data().decode('utf-8', errors='replace')
+            if data:
+                self.error_received.emit(data)
+
+    def _finished(self, exit_code: int, _status):
+        self._clear_pending()
+        self.finished_signal.emit(int(exit_code))
+
+    @classmethod
+    def cell_range(cls, lines: List[str], line: int) -> Tuple[int, int]:
+        """1-based first and last line of the "# %%" cell around line; the whole
+        file when there are no markers"""
+        start = line
+        while start > 1 and not cls.CELL_RE.match(lines[start - 1]):
+            start -= 1
+        end = line
+        while end < len(lines) and not cls.CELL_RE.match(lines[end]):
+            end += 1
+        return start, end
+
 # =============================
 # Simple PDB Debugger (stable)
 # =============================
@@ -1450,6 +5227,8 @@ class SimplePdbDebugger(QObject):
         self._breakpoints: List[int] = []
         self._file_for_debug: Optional[str] = None
         self._prompt_seen = False
+        # Source of the definitions as last run, for pushing changes (HotReloader)
+        self.definitions: Dict[str, Tuple[int, str]] = {}
         # Fixed regex - removed KATEX artifacts, using simple parentheses
         self._loc_re = re.compile(r'>\s*(?P<file>.+)KATEX_INLINE_OPEN(?P<line>\d+)KATEX_INLINE_CLOSE\S*')
         self._prompt_re = re.compile(r'^KATEX_INLINE_OPENPdbKATEX_INLINE_CLOSE\s*$')
@@ -1497,6 +5276,7 @@ if __name__ == '__main__':
                 f.write(code)
             self._file_for_debug = os.path.normpath(self.temp_file)
             self._breakpoints = sorted(set(breakpoints or []))
+            self.definitions = HotReloader.definitions(code) or {}
 
             # Check Python version to decide whether to use wrapper
             python_version = self._get_python_version()
@@ -1542,21 +5322,8 @@ if __name__ == '__main__':
             self.error_received.emit(f"Debugger start failed: {e}")
 
     def _get_python_version(self) -> Optional[Tuple[int, int]]:
-        """Get the Python version of the interpreter"""
-        try:
-            result = subprocess.run(
-                [self.python_path, '-c', 'import sys; print(f"{sys.version_info.major}.{sys.version_info.minor}")'],
-                capture_output=True,
-                text=True,
-                timeout=5
-            )
-            if result.returncode == 0:
-                parts = result.stdout.strip().split('.')
-                if len(parts) >= 2:
-                    return (int(parts[0]), int(parts[1]))
-        except Exception:
-            pass
-        return None
+        """Get the Python version of the interpreter, from the registry"""
+        return InterpreterRegistry.instance().version_info(self.python_path)
 
     def _send(self, cmd: str):
         if self.process and self._running and self.process.state() == QProcess.Running:
@@ -1661,6 +5428,13 @@ if __name__ == '__main__':
     def step_out(self): self._send('return')
     def send_command(self, cmd: str): self._send(cmd)
 
+    def push(self, command: str):
+        """Run a HotReloader command; pdb reads it at the next prompt"""
+        self._send('!' + command)
+
+    def debug_filename(self) -> Optional[str]:
+        return self._file_for_debug
+
 # =============================
 # Find/Replace
 # =============================
@@ -1959,7 +5733,7 @@ class ThemeManager:
             color: {theme['foreground']};
             selection-background-color: {theme['selection']};
         }}
-        QTreeWidget {{
+        QTreeView {{
             background-color: {theme['background']};
             color: {theme['foreground']};
             alternate-background-color: {theme['line_highlight']};
@@ -2467,11 +6241,23 @@ class ProfessionalPythonIDE(QMainWindow):
         self.current_file = None
         self.current_working_dir = os.getcwd()
         self.code_runner: Optional[EnhancedCodeRunner] = None
+        self.warm_pool = WarmInterpreterPool()
+        self.warm_modules: List[str] = []
         self.debugger: Optional[SimplePdbDebugger] = None
+        self.kernels: Dict[CodeEditor, PythonKernel] = {}
+        self.debug_editor: Optional[CodeEditor] = None
         # Use consistent app/org with QApplication to make settings stable across runs
         self.settings = QSettings(QSettings.IniFormat, QSettings.UserScope, "PythonIDE", "Professional Python IDE")
         self.recent_files: List[str] = []
         self.current_theme = "dark"
+        # Folder indexed for project-wide symbols; the working directory follows the open file
+        self.project_root: Optional[str] = None
+        self.project_search: Optional[ProjectSymbolSearch] = None
+        self.project_lookup: Optional[ProjectSymbolIndex] = None  # read connection for this thread
+        self.interpreter_discovery: Optional[InterpreterDiscovery] = None
+        self._rediscover_interpreters = False  # roots changed while discovery was running
+        # (editor, document revision, occurrences) of the last unsaved buffer searched
+        self._buffer_occurrences: Optional[Tuple[Any, int, list]] = None
 
         self.left_widget: Optional[QWidget] = None
         self.main_splitter: Optional[QSplitter] = None
@@ -2492,8 +6278,29 @@ class ProfessionalPythonIDE(QMainWindow):
         self.setup_statusbar()
         self.load_settings()  # load after menus to refresh recent menu
 
-        # Interpreter detection
-        self.python_versions = PythonVersionDetector.get_installed_versions()
+        CodeAnalysisService.instance().analysis_failed.connect(self.on_analysis_failed)
+
+        # Project symbol index
+        self.project_index = ProjectIndexService.instance()
+        self.project_index.worker.progress.connect(self.on_project_index_progress)
+        self.project_index.worker.ready.connect(self.on_project_index_ready)
+        self.project_index.worker.file_updated.connect(self.on_project_file_indexed)
+        self.project_index.worker.failed.connect(self.on_project_index_failed)
+        self.project_index.rename_worker.computed.connect(self.on_rename_computed)
+        self.project_index.rename_worker.failed.connect(self.on_project_index_failed)
+        self._rename_request = 0
+        self._pending_rename: Optional[tuple] = None
+        self.open_project(self.project_root or self.current_working_dir)
+
+        # Known interpreters are listed at once; detection revalidates them and
+        # streams new ones into the combo, and startup does not wait for it
+        self.python_versions: List[Dict] = sorted(InterpreterRegistry.instance().cached(),
+                                                  key=PythonVersionDetector.version_key, reverse=True)
+        self.interpreter_discovery = InterpreterDiscovery(self)
+        self.interpreter_discovery.found.connect(self.on_python_version_found)
+        self.interpreter_discovery.finished.connect(self.on_python_discovery_finished)
+        self.interpreter_discovery.failed.connect(self.on_python_discovery_failed)
+        self.discover_interpreters()
         self.populate_python_versions()
 
         self.setWindowTitle("Professional Python IDE")
@@ -2518,6 +6325,8 @@ class ProfessionalPythonIDE(QMainWindow):
         version_layout = QVBoxLayout()
         self.python_version_combo = QComboBox()
         self.python_version_combo.currentTextChanged.connect(self.on_python_version_changed)
+        self._python_chosen = False
+        self.python_version_combo.activated.connect(self.on_python_version_activated)
         version_layout.addWidget(self.python_version_combo)
         self.python_info_label = QLabel("Select Python version")
         self.python_info_label.setWordWrap(True)
@@ -2537,6 +6346,7 @@ class ProfessionalPythonIDE(QMainWindow):
 
         self.code_tree = EnhancedCodeNavigationTree()
         self.code_tree.set_block_highlight_color(ThemeManager.structure_block_color(self.current_theme))
+        self.code_tree.rename_requested.connect(self.on_tree_rename_requested)
         left_layout.addWidget(self.code_tree)
 
         self.main_splitter.addWidget(self.left_widget)
@@ -2615,6 +6425,16 @@ class ProfessionalPythonIDE(QMainWindow):
         build_widget.setFont(QFont("Consolas", 10))
         self.build_tab_index = self.bottom_tabs.addTab(build_widget, "Build")
 
+        # References tab
+        self.references_model = ReferenceListModel(self)
+        self.references_view = QListView()
+        self.references_view.setModel(self.references_model)
+        self.references_view.setUniformItemSizes(True)
+        self.references_view.setFont(QFont("Consolas", 10))
+        self.references_view.activated.connect(self.on_reference_activated)
+        self.references_view.clicked.connect(self.on_reference_activated)
+        self.references_tab_index = self.bottom_tabs.addTab(self.references_view, "References")
+
         center_splitter.addWidget(self.bottom_tabs)
         center_splitter.setSizes([700, 300])
 
@@ -2633,6 +6453,8 @@ class ProfessionalPythonIDE(QMainWindow):
         self.open_action = QAction("&Open", self)
         self.open_action.setShortcut(QKeySequence.Open)
         self.open_action.triggered.connect(self.open_file)
+        self.open_folder_action = QAction("Open &Folder...", self)
+        self.open_folder_action.triggered.connect(self.open_folder)
         self.save_action = QAction("&Save", self)
         self.save_action.setShortcut(QKeySequence.Save)
         self.save_action.triggered.connect(self.save_file)
@@ -2650,6 +6472,10 @@ class ProfessionalPythonIDE(QMainWindow):
         self.copy_action = QAction("&Copy", self); self.copy_action.setShortcut(QKeySequence.Copy); self.copy_action.triggered.connect(self.copy)
         self.paste_action = QAction("&Paste", self); self.paste_action.setShortcut(QKeySequence.Paste); self.paste_action.triggered.connect(self.paste)
         self.find_action = QAction("&Find && Replace", self); self.find_action.setShortcut(QKeySequence.Find); self.find_action.triggered.connect(self.show_find_replace)
+        self.go_to_symbol_action = QAction("Go to Symbol in &Project...", self); self.go_to_symbol_action.setShortcut("Ctrl+T"); self.go_to_symbol_action.triggered.connect(self.go_to_project_symbol)
+        self.go_to_definition_action = QAction("Go to &Definition", self); self.go_to_definition_action.setShortcut("F12"); self.go_to_definition_action.triggered.connect(self.go_to_definition)
+        self.find_references_action = QAction("Find All &References", self); self.find_references_action.setShortcut("Shift+F12"); self.find_references_action.triggered.connect(self.find_references)
+        self.rename_symbol_action = QAction("Re&name Symbol...", self); self.rename_symbol_action.setShortcut("F2"); self.rename_symbol_action.triggered.connect(self.rename_symbol)
 
         # View
         self.toggle_tree_action = QAction("Toggle Code Structure", self)
@@ -2671,6 +6497,17 @@ class ProfessionalPythonIDE(QMainWindow):
         self.run_action = QAction("&Run", self); self.run_action.setShortcut("F5"); self.run_action.triggered.connect(self.run_code)
         #self.stop_action = QAction("&Stop", self); self.stop_action.setShortcut("Shift+F5"); self.stop_action.triggered.connect(lambda: self.stop_code(False))
         self.force_stop_action = QAction("Stop", self); self.force_stop_action.setShortcut("Ctrl+Shift+F5"); self.force_stop_action.triggered.connect(lambda: self.stop_code(True))
+        self.warm_run_action = QAction("Keep a &Warm Interpreter", self); self.warm_run_action.setCheckable(True); self.warm_run_action.toggled.connect(self.on_warm_run_toggled)
+        self.warm_modules_action = QAction("Warm Interpreter &Modules...", self); self.warm_modules_action.triggered.connect(self.edit_warm_modules)
+
+        # Kernel
+        self.run_cell_action = QAction("Run &Cell", self); self.run_cell_action.setShortcut("Ctrl+Return"); self.run_cell_action.triggered.connect(lambda: self.run_cell(False))
+        self.run_cell_advance_action = QAction("Run Cell and &Advance", self); self.run_cell_advance_action.setShortcut("Ctrl+Shift+Return"); self.run_cell_advance_action.triggered.connect(lambda: self.run_cell(True))
+        self.run_selection_action = QAction("Run &Selection or Line", self); self.run_selection_action.setShortcut("Alt+Return"); self.run_selection_action.triggered.connect(self.run_selection_in_kernel)
+        self.run_definition_action = QAction("Run &Definition", self); self.run_definition_action.setShortcut("Ctrl+Alt+Return"); self.run_definition_action.triggered.connect(self.run_definition_in_kernel)
+        self.interrupt_kernel_action = QAction("&Interrupt Kernel", self); self.interrupt_kernel_action.setShortcut("Ctrl+Shift+C"); self.interrupt_kernel_action.triggered.connect(self.interrupt_kernel)
+        self.restart_kernel_action = QAction("&Restart Kernel", self); self.restart_kernel_action.setShortcut("Ctrl+Shift+R"); self.restart_kernel_action.triggered.connect(self.restart_kernel)
+        self.push_changes_action = QAction("&Push Changes", self); self.push_changes_action.setShortcut("Ctrl+Shift+P"); self.push_changes_action.triggered.connect(self.push_changes)
 
         # Debug
         self.debug_start_action = QAction("Start Debugging", self); self.debug_start_action.setShortcut("F6"); self.debug_start_action.triggered.connect(self.start_debug)
@@ -2694,6 +6531,7 @@ class ProfessionalPythonIDE(QMainWindow):
         menubar = self.menuBar()
         file_menu = menubar.addMenu("&File")
         file_menu.addAction(self.new_action); file_menu.addAction(self.open_action)
+        file_menu.addAction(self.open_folder_action)
         file_menu.addSeparator()
         file_menu.addAction(self.save_action); file_menu.addAction(self.save_as_action)
         file_menu.addSeparator()
@@ -2708,6 +6546,10 @@ class ProfessionalPythonIDE(QMainWindow):
         for a in (self.cut_action, self.copy_action, self.paste_action): edit_menu.addAction(a)
         edit_menu.addSeparator()
         edit_menu.addAction(self.find_action)
+        edit_menu.addAction(self.go_to_symbol_action)
+        edit_menu.addAction(self.go_to_definition_action)
+        edit_menu.addAction(self.find_references_action)
+        edit_menu.addAction(self.rename_symbol_action)
         edit_menu.addAction(self.comment_action)
         edit_menu.addAction(self.format_code_action)
 
@@ -2725,12 +6567,26 @@ class ProfessionalPythonIDE(QMainWindow):
         run_menu.addAction(self.run_action)
         #run_menu.addAction(self.stop_action)
         run_menu.addAction(self.force_stop_action)
+        run_menu.addSeparator()
+        run_menu.addAction(self.warm_run_action)
+        run_menu.addAction(self.warm_modules_action)
+
+        kernel_menu = menubar.addMenu("&Kernel")
+        for a in (self.run_cell_action, self.run_cell_advance_action, self.run_selection_action,
+                  self.run_definition_action):
+            kernel_menu.addAction(a)
+        kernel_menu.addAction(self.push_changes_action)
+        kernel_menu.addSeparator()
+        kernel_menu.addAction(self.interrupt_kernel_action)
+        kernel_menu.addAction(self.restart_kernel_action)
 
         debug_menu = menubar.addMenu("&Debug")
         for a in (self.debug_start_action, self.debug_continue_action, self.debug_step_over_action,
                   self.debug_step_into_action, self.debug_step_out_action, self.debug_stop_action,
                   self.toggle_breakpoint_action):
             debug_menu.addAction(a)
+        debug_menu.addSeparator()
+        debug_menu.addAction(self.push_changes_action)
 
         tools_menu = menubar.addMenu("&Tools")
         tools_menu.addAction(self.build_exe_action)
@@ -2755,6 +6611,14 @@ class ProfessionalPythonIDE(QMainWindow):
         toolbar.addWidget(QLabel("Symbols: "))
         self.symbol_combo = QComboBox()
         self.symbol_combo.setMinimumWidth(260)
+        # Never measure every row; the popup only lays out what it shows
+        self.symbol_combo.setSizeAdjustPolicy(QComboBox.AdjustToMinimumContentsLengthWithIcon)
+        self.symbol_combo.setMinimumContentsLength(30)
+        symbol_view = QListView()
+        symbol_view.setUniformItemSizes(True)
+        symbol_view.setLayoutMode(QListView.Batched)
+        self.symbol_combo.setView(symbol_view)
+        self.symbol_combo.setModel(SymbolListModel(self.symbol_combo))
         self.symbol_combo.activated[int].connect(self.on_symbol_selected)
         toolbar.addWidget(self.symbol_combo)
 
@@ -2774,15 +6638,67 @@ class ProfessionalPythonIDE(QMainWindow):
     def populate_python_versions(self):
         self.python_version_combo.clear()
         if not self.python_versions:
-            self.python_version_combo.addItem("No Python found", None)
-            self.python_info_label.setText("No Python installations detected")
+            discovering = self.interpreter_discovery.isRunning()
+            self.python_version_combo.addItem("Detecting Python..." if discovering else "No Python found", None)
+            self.python_info_label.setText("Detecting Python installations..." if discovering
+                                           else "No Python installations detected")
             return
         for version in self.python_versions:
-            display_text = f"{version['version']} ({version['architecture']})"
-            self.python_version_combo.addItem(display_text, version)
+            self.python_version_combo.addItem(PythonVersionDetector.display_name(version), version)
         if self.python_versions:
             self.on_python_version_changed()
 
+    def on_python_version_found(self, version: Dict):
+        """Insert a discovered interpreter in version order, keeping the current selection"""
+        combo = self.python_version_combo
+        known = next((i for i, v in enumerate(self.python_versions) if v.get('key') == version.get('key')), None)
+        if known is not None:
+            if self.python_versions[known] != version:
+                # Re-probed after a change; it keeps its place in the list
+                self.python_versions[known] = version
+                combo.setItemText(known, PythonVersionDetector.display_name(version))
+                combo.setItemData(known, version)
+                self.on_python_version_changed()
+            return
+        if not self.python_versions:
+            combo.clear()
+        key = PythonVersionDetector.version_key(version)
+        row = next((i for i, v in enumerate(self.python_versions)
+                    if PythonVersionDetector.version_key(v) < key), len(self.python_versions))
+        self.python_versions.insert(row, version)
+        selected = combo.currentIndex()
+        combo.insertItem(row, PythonVersionDetector.display_name(version), version)
+        if len(self.python_versions) == 1 or (selected == 0 and row == 0 and not self._python_chosen):
+            # Until the user picks one, the newest interpreter is selected
+            combo.setCurrentIndex(0)
+        self.on_python_version_changed()
+
+    def discover_interpreters(self):
+        discovery = self.interpreter_discovery
+        if discovery is None:
+            return
+        if discovery.isRunning():
+            self._rediscover_interpreters = True
+            return
+        discovery.roots = list(dict.fromkeys(d for d in (self.project_root, self.current_working_dir) if d))
+        discovery.start()
+
+    def on_python_discovery_finished(self):
+        if self._rediscover_interpreters:
+            self._rediscover_interpreters = False
+            self.discover_interpreters()
+            return
+        if not self.python_versions:
+            self.populate_python_versions()
+        self.prepare_warm_pool(during_discovery=False)
+
+    def on_python_discovery_failed(self, message: str):
+        self.status_label.setText(message)
+
+    def on_python_version_activated(self, _index: int):
+        self._python_chosen = True
+        self.prepare_warm_pool()
+
     def on_python_version_changed(self):
         version_data = self.python_version_combo.currentData()
         if version_data:
@@ -2790,6 +6706,7 @@ class ProfessionalPythonIDE(QMainWindow):
             self.python_info_label.setText(info_text)
         else:
             self.python_info_label.setText("No Python selected")
+        self.prepare_warm_pool()
 
     def on_structure_search(self, text):
         self.code_tree.search_items(text)
@@ -2802,15 +6719,14 @@ class ProfessionalPythonIDE(QMainWindow):
         editor = CodeEditor()
         editor.set_click_highlight_color(ThemeManager.word_click_color(self.current_theme))
         self.code_tree.set_editor(editor)
-        editor.textChanged.connect(self.text_changed)
+        editor.structure_ready.connect(lambda structure, e=editor: self.on_structure_ready(e, structure))
         editor.cursorPositionChanged.connect(self.cursor_position_changed)
-        editor.highlighter.theme = self.current_theme
-        editor.highlighter.setup_highlighting_rules()
+        editor.highlighter.set_theme(self.current_theme)
         index = self.tab_widget.addTab(editor, "Untitled")
         self.tab_widget.setCurrentIndex(index)
         if self.find_replace_dialog:
             self.find_replace_dialog.set_editor(editor)
-        self.update_symbols_combo()
+        self.update_code_structure()
         return editor
 
     def open_file(self):
@@ -2836,7 +6752,7 @@ class ProfessionalPythonIDE(QMainWindow):
                 editor = current_editor
             else:
                 editor = self.new_file()
-            editor.setPlainText(content)
+            editor.set_text_progressive(content)
             editor.file_path = file_path
             file_name = os.path.basename(file_path)
             idx = self.tab_widget.currentIndex()
@@ -2847,7 +6763,6 @@ class ProfessionalPythonIDE(QMainWindow):
             self.add_recent_file(file_path)
             self.status_label.setText(f"Opened: {file_name}")
             self.update_code_structure()
-            self.update_symbols_combo()
         except Exception as e:
             QMessageBox.critical(self, "Error", f"Could not open file:\n{str(e)}")
 
@@ -2885,6 +6800,7 @@ class ProfessionalPythonIDE(QMainWindow):
                 f.write(content)
             file_name = os.path.basename(file_path)
             self.status_label.setText(f"Saved: {file_name}")
+            self.project_index.update_file(file_path)
         except Exception as e:
             QMessageBox.critical(self, "Error", f"Could not save file:\n{str(e)}")
 
@@ -2893,6 +6809,10 @@ class ProfessionalPythonIDE(QMainWindow):
             widget = self.tab_widget.widget(index)
             self.tab_widget.removeTab(index)
             if widget:
+                CodeAnalysisService.instance().cancel(id(widget))
+                self.shutdown_kernel(widget)
+                if isinstance(widget, CodeEditor):
+                    widget.release_completion_words()
                 widget.deleteLater()
         else:
             editor = self.tab_widget.widget(index)
@@ -2903,7 +6823,7 @@ class ProfessionalPythonIDE(QMainWindow):
                 self.tab_widget.setTabText(index, "Untitled")
                 self.tab_widget.setTabToolTip(index, "")
                 self.current_file = None
-        self.update_symbols_combo()
+        self.update_code_structure()
 
     def tab_changed(self, index: int):
         editor = self.tab_widget.widget(index)
@@ -2912,46 +6832,38 @@ class ProfessionalPythonIDE(QMainWindow):
             if self.find_replace_dialog:
                 self.find_replace_dialog.set_editor(editor)
             self.update_code_structure()
-            self.update_symbols_combo()
             if hasattr(editor, 'file_path'):
                 self.current_file = editor.file_path
                 self.current_working_dir = os.path.dirname(editor.file_path)
             else:
                 self.current_file = None
 
-    def text_changed(self):
-        if hasattr(self, '_update_timer'):
-            self._update_timer.stop()
-        self._update_timer = QTimer()
-        self._update_timer.setSingleShot(True)
-        self._update_timer.timeout.connect(self.update_code_structure)
-        self._update_timer.timeout.connect(self.update_symbols_combo)
-        self._update_timer.start(500)
-
     def update_code_structure(self):
+        """Refresh the outline and symbol combo; parsing happens on the analysis thread"""
         editor = self.get_current_editor()
         if editor:
-            self.code_tree.update_structure(editor.toPlainText())
+            editor.request_structure()
+        else:
+            self.code_tree.clear()
+            self.update_symbols_combo(None)
 
-    def update_symbols_combo(self):
-        if not self.symbol_combo:
+    def on_analysis_failed(self, key, message: str):
+        editor = next((self.tab_widget.widget(i) for i in range(self.tab_widget.count())
+                       if id(self.tab_widget.widget(i)) == key), None)
+        if editor is not None:
+            self.status_label.setText(f"{self.tab_widget.tabText(self.tab_widget.indexOf(editor))}: {message}")
+
+    def on_structure_ready(self, editor: CodeEditor, structure: Dict):
+        if editor is not self.get_current_editor():
+            return
+        self.code_tree.update_structure(structure)
+        self.update_symbols_combo(structure)
+
+    def update_symbols_combo(self, structure: Optional[Dict]):
+        if self.symbol_combo is None:
             return
-        editor = self.get_current_editor()
         self.symbol_combo.blockSignals(True)
-        self.symbol_combo.clear()
-        if editor:
-            structure = CodeStructureParser.parse_code(editor.toPlainText())
-            items = []
-            for cls in structure.get('classes', []):
-                items.append(("Class", cls['name'], cls['line']))
-                for m in cls.get('methods', []):
-                    items.append(("Method", f"{cls['name']}.{m['name']}()", m['line']))
-            for func in structure.get('functions', []):
-                items.append(("Function", f"{func['name']}()", func['line']))
-            for var in structure.get('variables', []):
-                items.append(("Variable", var['name'], var['line']))
-            for kind, label, line in items:
-                self.symbol_combo.addItem(f"{kind}: {label}", line)
+        self.symbol_combo.model().set_structure(structure)
         self.symbol_combo.blockSignals(False)
 
     def on_symbol_selected(self, index: int):
@@ -2960,13 +6872,18 @@ class ProfessionalPythonIDE(QMainWindow):
             return
         line_number = self.symbol_combo.itemData(index)
         if line_number:
-            cursor = editor.textCursor()
-            cursor.movePosition(QTextCursor.Start)
-            cursor.movePosition(QTextCursor.Down, QTextCursor.MoveAnchor, int(line_number) - 1)
-            editor.setTextCursor(cursor)
-            editor.centerCursor()
-            editor.update_click_highlight()
-            editor.setFocus()
+            self.go_to_line(editor, int(line_number))
+
+    def go_to_line(self, editor: CodeEditor, line_number: int, column: int = 0):
+        block = editor.document().findBlockByNumber(max(1, line_number) - 1)
+        if not block.isValid():
+            block = editor.document().lastBlock()
+        cursor = editor.textCursor()
+        cursor.setPosition(block.position() + max(0, min(column, block.length() - 1)))
+        editor.setTextCursor(cursor)
+        editor.centerCursor()
+        editor.update_click_highlight()
+        editor.setFocus()
 
     def cursor_position_changed(self):
         editor = self.get_current_editor()
@@ -2984,6 +6901,299 @@ class ProfessionalPythonIDE(QMainWindow):
         self.update_recent_menu()
         self.save_settings()  # persist immediately
 
+    def open_folder(self):
+        folder = QFileDialog.getExistingDirectory(self, "Open Folder", self.project_root or self.current_working_dir)
+        if folder:
+            self.current_working_dir = folder
+            self.open_project(folder)
+            self.save_settings()
+
+    def open_project(self, root: str):
+        root = os.path.abspath(root)
+        # Indexing a home directory or a drive would crawl unrelated trees
+        if root == os.path.expanduser('~') or os.path.dirname(root) == root:
+            return
+        self.project_root = root
+        self.project_search = None
+        self._close_project_lookup()
+        self.project_index.open_project(root)
+        # The project may bring its own .venv
+        self.discover_interpreters()
+
+    def on_project_index_progress(self, done: int, total: int):
+        self.status_label.setText(f"Indexing project: {done}/{total} files")
+
+    def on_project_index_failed(self, message: str):
+        self.status_label.setText(message)
+
+    def on_project_index_ready(self, root: str, search: ProjectSymbolSearch):
+        if root != self.project_root:
+            return
+        self.project_search = search
+        self._close_project_lookup()
+        try:
+            self.project_lookup = ProjectSymbolIndex(root)
+        except (OSError, sqlite3.Error) as e:
+            self.status_label.setText(f"Opening project index failed: {e}")
+            return
+        self.status_label.setText(f"Project index: {len(search)} symbols in {search.file_count()} files")
+
+    def _close_project_lookup(self):
+        if self.project_lookup is not None:
+            self.project_lookup.close()
+            self.project_lookup = None
+
+    def on_project_file_indexed(self, root: str, rel_path: str, symbols: List):
+        if root == self.project_root and self.project_search is not None:
+            self.project_search.replace_file(rel_path, symbols)
+
+    def go_to_project_symbol(self):
+        if self.project_search is None:
+            self.status_label.setText("Project index is not ready yet")
+            return
+        dlg = GoToSymbolDialog(self.project_search, self)
+        if dlg.exec_() != QDialog.Accepted:
+            return
+        result = dlg.selected()
+        if result is None:
+            return
+        rel, _name, _qualname, _kind, line = result
+        # The index already knows the line; the file is not parsed to find it
+        self.open_project_location(rel, line)
+
+    def open_project_location(self, rel: str, line: int, column: int = 0):
+        path = os.path.join(self.project_root, rel)
+        self.open_file_path(path)
+        editor = self.get_current_editor()
+        if editor and os.path.normcase(os.path.abspath(getattr(editor, 'file_path', '') or '')) == \
+                os.path.normcase(path):
+            self.go_to_line(editor, line, column)
+
+    def _identifier_at_cursor(self) -> Tuple[Optional[CodeEditor], str]:
+        editor = self.get_current_editor()
+        word = editor.text_under_cursor() if editor else ''
+        return editor, (word if word.isidentifier() and not keyword.iskeyword(word) else '')
+
+    def _project_occurrences(self, editor: CodeEditor, name: str,
+                             kinds: Optional[Tuple[str, ...]] = None) -> Optional[List[Tuple[str, int, int, str]]]:
+        lookup = self.project_lookup
+        try:
+            rows = lookup.occurrences(name, kinds)
+        except sqlite3.Error as e:
+            self.status_label.setText(f"Project index lookup failed: {e}")
+            return None
+        # An edited buffer is searched as it is now, not as last saved
+        path = getattr(editor, 'file_path', None)
+        rel = lookup.relative_path(path) if path and editor.document().isModified() else None
+        if rel is not None:
+            revision = editor.document().revision()
+            cached = self._buffer_occurrences
+            if cached is None or cached[0] is not editor or cached[1] != revision:
+                code = editor.toPlainText()
+                try:
+                    occurrences = ProjectSymbolIndex.occurrences_of(ast.parse(code), code.split('\n'))
+                except SyntaxError:
+                    return rows
+                cached = self._buffer_occurrences = (editor, revision, occurrences)
+            current = [(rel, line, col, kind) for ident, line, col, kind in cached[2]
+                       if ident == name and (not kinds or kind in kinds)]
+            rows = sorted([r for r in rows if r[0] != rel] + current)
+        return rows
+
+    def _show_references(self, title: str, rows: List[Tuple[str, int, int, str]]):
+        self.references_model.set_results(self.project_root, rows)
+        self.bottom_tabs.setCurrentIndex(self.references_tab_index)
+        more = "+" if len(rows) >= ProjectSymbolIndex.MAX_OCCURRENCES else ""
+        self.status_label.setText(f"{title}: {len(rows)}{more}")
+
+    def find_references(self):
+        editor, name = self._identifier_at_cursor()
+        if not name:
+            return
+        if self.project_lookup is None:
+            self.status_label.setText("Project index is not ready yet")
+            return
+        rows = self._project_occurrences(editor, name)
+        if rows is not None:
+            self._show_references(f"References to '{name}'", rows)
+
+    def go_to_definition(self):
+        editor, name = self._identifier_at_cursor()
+        if not name:
+            return
+        if self.project_lookup is None:
+            self.status_label.setText("Project index is not ready yet")
+            return
+        rows = self._project_occurrences(editor, name, ProjectSymbolIndex.DEFINITION_KINDS)
+        if rows is None:
+            return
+        # A class or def wins over assignments and imports
+        for kind in ProjectSymbolIndex.DEFINITION_KINDS:
+            candidates = [r for r in rows if r[3] == kind]
+            if candidates:
+                break
+        else:
+            self.status_label.setText(f"No definition of '{name}' found")
+            return
+        path = getattr(editor, 'file_path', None)
+        here = self.project_lookup.relative_path(path) if path else None
+        local = [r for r in candidates if r[0] == here]
+        if local:
+            # The nearest one above the cursor, else the first in the file
+            line = editor.textCursor().blockNumber() + 1
+            above = [r for r in local if r[1] <= line]
+            target = above[-1] if above else local[0]
+        elif len(candidates) == 1:
+            target = candidates[0]
+        else:
+            self._show_references(f"Definitions of '{name}'", candidates)
+            return
+        self.open_project_location(*target[:3])
+
+    def on_reference_activated(self, index: QModelIndex):
+        result = self.references_model.result(index.row())
+        if result is not None:
+            self.open_project_location(*result[:3])
+
+    def _open_editors(self) -> Dict[str, CodeEditor]:
+        editors = {}
+        for i in range(self.tab_widget.count()):
+            w = self.tab_widget.widget(i)
+            if isinstance(w, CodeEditor) and getattr(w, 'file_path', None):
+                editors[os.path.normcase(os.path.abspath(w.file_path))] = w
+        return editors
+
+    def rename_symbol(self):
+        """Rename the binding under the cursor wherever it is used: in the current
+        buffer for locals, across the project for module globals and class members"""
+        editor = self.get_current_editor()
+        if not editor:
+            return
+        code = editor.toPlainText()
+        try:
+            tree = ast.parse(code)
+        except SyntaxError as e:
+            self.status_label.setText(f"Cannot rename: {e.msg} (line {e.lineno})")
+            return
+        lookup = self.project_lookup
+        path = getattr(editor, 'file_path', None)
+        rel = lookup.relative_path(path) if lookup and path else None
+        roots = RenameRefactoring.source_roots(lookup.paths()) if rel else set()
+        modules = {RenameRefactoring.module_name(p, roots) for p in lookup.paths()} if rel else set()
+        lines = code.split('\n')
+        analysis = ScopeAnalysis(tree, lines, RenameRefactoring.module_name(rel, roots) if rel else '',
+                                 bool(rel) and os.path.basename(rel) == '__init__.py')
+        target, error = analysis.target_at(*editor.cursor_line_column(), modules)
+        if target is None:
+            self.status_label.setText(f"Cannot rename: {error}")
+            return
+        old_name = target[-1]
+        if rel and target[0] != 'local' and target[1] not in modules:
+            self.status_label.setText(f"Cannot rename: '{old_name}' is defined outside the project")
+            return
+        if not rel and target[0] != 'local':
+            if lookup is None and self.project_root:
+                self.status_label.setText("Cannot rename: the project index is not ready yet")
+                return
+            answer = QMessageBox.question(
+                self, "Rename Symbol",
+                f"'{old_name}' may be used in other files, but this file is not part of the open "
+                f"project. Only this file will be updated.\n\nRename anyway?")
+            if answer != QMessageBox.Yes:
+                return
+        new_name, ok = QInputDialog.getText(self, "Rename Symbol", f"New name for '{old_name}':", text=old_name)
+        new_name = new_name.strip()
+        if not ok or new_name == old_name:
+            return
+        if not new_name.isidentifier() or keyword.iskeyword(new_name):
+            QMessageBox.warning(self, "Rename Symbol", f"'{new_name}' is not a valid identifier.")
+            return
+
+        key = os.path.normcase(os.path.abspath(path)) if path else None
+        self._pending_rename = None
+        if not rel or target[0] == 'local':
+            edits = [(l, c, certain, lines[l - 1]) for l, c, certain in analysis.rename_edits(target)]
+            results = [(key, self.tab_widget.tabText(self.tab_widget.indexOf(editor)), edits)] if edits else []
+            self._preview_rename(old_name, new_name, results, [], {key: editor})
+        else:
+            editors = self._open_editors()
+            candidates = {os.path.normcase(os.path.join(lookup.root, r)) for r in lookup.files_with(old_name)}
+            candidates.add(key)
+            # Edited buffers are renamed as they are now; they may mention the name only since the last save
+            for k, e in editors.items():
+                if e.document().isModified() and lookup.relative_path(k) and old_name in e.toPlainText():
+                    candidates.add(k)
+            jobs = []
+            for k in sorted(candidates):
+                e = editors.get(k)
+                code_now = e.toPlainText() if e is not None and e.document().isModified() else None
+                jobs.append((k, code_now, RenameRefactoring.module_name(lookup.relative_path(k), roots), target))
+            # Files are parsed in the project index thread; the preview opens when they are
+            self._rename_request += 1
+            self._pending_rename = (self._rename_request, old_name, new_name, lookup)
+            self.project_index.compute_rename(self._rename_request, jobs)
+            self.status_label.setText(f"Finding occurrences of '{old_name}' in {len(jobs)} files...")
+
+    def on_rename_computed(self, request: int, computed: list):
+        pending = self._pending_rename
+        # A newer rename, or a project switch, supersedes this one
+        if pending is None or pending[0] != request or pending[3] is not self.project_lookup:
+            return
+        self._pending_rename = None
+        _, old_name, new_name, lookup = pending
+        results = [(k, lookup.relative_path(k), edits) for k, edits, error in computed if edits]
+        errors = [f"{lookup.relative_path(k)}: {error}" for k, _, error in computed if error]
+        # Tabs may have been opened or closed meanwhile; edits to open buffers are checked as they apply
+        self._preview_rename(old_name, new_name, results, errors, self._open_editors())
+
+    def _preview_rename(self, old_name: str, new_name: str, results: list, errors: List[str],
+                        editors: Dict[str, CodeEditor]):
+        """Show the edits of a rename and apply the ones left checked"""
+        if not results:
+            self.status_label.setText(f"No occurrences of '{old_name}' to rename")
+            return
+        if errors:
+            QMessageBox.warning(self, "Rename Symbol", "These files were skipped:\n" + "\n".join(errors[:20]))
+        dlg = RenamePreviewDialog(old_name, new_name, results, self)
+        if dlg.exec_() != QDialog.Accepted:
+            return
+        checked = dlg.checked_edits()
+        # Files on disk first, all or none; open buffers get one undo step each
+        on_disk = {k: edits for k, edits in checked.items() if k not in editors}
+        try:
+            RenameRefactoring.rewrite_files(on_disk, old_name, new_name)
+        except (OSError, UnicodeEncodeError) as e:
+            QMessageBox.critical(self, "Rename Symbol", f"Nothing was renamed:\n{e}")
+            return
+        for k in on_disk:
+            self.project_index.update_file(k)
+        failed = [k for k, edits in checked.items()
+                  if k in editors and not editors[k].replace_occurrences(edits, old_name, new_name)]
+        if failed:
+            QMessageBox.warning(self, "Rename Symbol", "These buffers changed since the preview and were left alone:\n"
+                                + "\n".join(os.path.basename(k) for k in failed))
+        count = sum(len(edits) for k, edits in checked.items() if k not in failed)
+        self.status_label.setText(f"Renamed '{old_name}' to '{new_name}': {count} occurrences in "
+                                  f"{len(checked) - len(failed)} files")
+
+    def on_tree_rename_requested(self, line: int):
+        editor = self.get_current_editor()
+        if not editor:
+            return
+        # The outline line may be a decorator's; the name follows the def
+        block = editor.document().findBlockByNumber(line - 1)
+        for _ in range(50):
+            if not block.isValid():
+                return
+            m = SourceColumns.DEF_NAME_RE.match(block.text().lstrip())
+            if m:
+                text = block.text()
+                column = len(text) - len(text.lstrip()) + m.end()
+                self.go_to_line(editor, block.blockNumber() + 1, CodeEditor._utf16_len(text[:column]))
+                self.rename_symbol()
+                return
+            block = block.next()
+
     def update_recent_menu(self):
         self.recent_menu.clear()
         valid_paths = [p for p in self.recent_files if p and os.path.exists(p)]
@@ -3133,17 +7343,192 @@ class ProfessionalPythonIDE(QMainWindow):
             self.output_text.appendPlainText("No Python interpreter selected.\n")
             return
         python_path = version_data['path']
+        worker = self.warm_pool.take(python_path, self.current_working_dir, self.warm_modules) \
+            if self.warm_run_action.isChecked() else None
         self.clear_output()
-        self.output_text.appendPlainText(f"Running with {version_data['version']}...\n")
+        self.output_text.appendPlainText(f"Running with {version_data['version']}{' (warm)' if worker else ''}...\n")
         self.output_text.appendPlainText(f"Working directory: {self.current_working_dir}\n")
         self.output_text.appendPlainText("-" * 60 + "\n")
-        self.code_runner = EnhancedCodeRunner(code, python_path, self.current_working_dir, self)
+        self.code_runner = EnhancedCodeRunner(code, python_path, self.current_working_dir, self, worker)
         self.code_runner.output_received.connect(self.append_output)
         self.code_runner.error_received.connect(self.append_error)
         self.code_runner.finished_signal.connect(self.code_finished)
         self.code_runner.started_signal.connect(self.code_started)
         self.code_runner.start()
 
+    def _kernel_for(self, editor: CodeEditor) -> Optional[PythonKernel]:
+        kernel = self.kernels.get(editor)
+        if kernel is not None:
+            return kernel
+        version_data = self.python_version_combo.currentData()
+        if not version_data:
+            self.output_text.appendPlainText("No Python interpreter selected.\n")
+            return None
+        path = getattr(editor, 'file_path', None)
+        kernel = PythonKernel(version_data['path'], self.current_working_dir,
+                              os.path.dirname(path) if path else None, self)
+        # Definitions count as run once the session starts; later edits are pushed as changes
+        kernel.definitions = HotReloader.definitions(editor.toPlainText()) or {}
+        kernel.output_received.connect(self.append_output)
+        kernel.error_received.connect(self.append_error)
+        kernel.execution_finished.connect(self.on_kernel_execution_finished)
+        kernel.finished_signal.connect(lambda code, k=kernel: self.on_kernel_exited(k, code))
+        self.kernels[editor] = kernel
+        self.append_output(f"--- Kernel started with {version_data['version']} ---\n")
+        kernel.start()
+        return kernel
+
+    def _execute_in_kernel(self, editor: CodeEditor, code: str, first_line: int, what: str):
+        if not code.strip():
+            return
+        kernel = self._kernel_for(editor)
+        if kernel is None:
+            return
+        source = editor.toPlainText()
+        self.append_output(f"\n>>> {what}\n")
+        kernel.execute(code, self._kernel_filename(editor), first_line, source)
+        last_line = first_line + code.count('\n')
+        for name, (start, text) in (HotReloader.definitions(source) or {}).items():
+            if first_line <= start <= last_line:
+                kernel.definitions[name] = (start, text)
+        self.status_label.setText(f"Kernel: running {what}...")
+
+    def _kernel_filename(self, editor: CodeEditor) -> str:
+        return getattr(editor, 'file_path', None) or self.tab_widget.tabText(self.tab_widget.indexOf(editor))
+
+    def push_changes(self):
+        """Recompile the functions and classes edited since they last ran, in the
+        debug session or kernel of the current tab, without restarting it"""
+        editor = self.get_current_editor()
+        if not editor:
+            return
+        if self.debugger and self.debugger.is_running() and self.debug_editor is editor:
+            target, filename, where = self.debugger, self.debugger.debug_filename(), "debug session"
+        elif editor in self.kernels and self.kernels[editor].is_running():
+            target = self.kernels[editor]
+            filename, where = self._kernel_filename(editor), "kernel"
+        else:
+            self.status_label.setText("Push Changes: no kernel or debug session for this tab")
+            return
+        source = editor.toPlainText()
+        current = HotReloader.definitions(source)
+        if current is None:
+            self.status_label.setText("Push Changes: fix the syntax errors first")
+            return
+        names = HotReloader.changed(target.definitions, current)
+        if not names:
+            self.status_label.setText("Push Changes: no changed functions or classes")
+            return
+        target.push(HotReloader.command(current, names, filename, source))
+        for name in names:
+            target.definitions[name] = current[name]
+        self.status_label.setText(f"Pushed {len(names)} definition(s) to the {where}")
+
+    def run_cell(self, advance: bool = False):
+        editor = self.get_current_editor()
+        if not editor:
+            return
+        lines = editor.toPlainText().split('\n')
+        start, end = PythonKernel.cell_range(lines, editor.textCursor().blockNumber() + 1)
+        self._execute_in_kernel(editor, '\n'.join(lines[start - 1:end]), start, f"cell, lines {start}-{end}")
+        if advance and end < len(lines):
+            # To the first line of the next cell, past its marker
+            self.go_to_line(editor, min(end + 2, len(lines)))
+
+    def run_selection_in_kernel(self):
+        editor = self.get_current_editor()
+        if not editor:
+            return
+        cursor = editor.textCursor()
+        doc = editor.document()
+        first = doc.findBlock(cursor.selectionStart())
+        last = doc.findBlock(cursor.selectionEnd())
+        if cursor.hasSelection() and cursor.selectionEnd() == last.position() and last != first:
+            last = last.previous()  # a selection ending at the start of a line leaves that line out
+        # Whole lines, so a selection starting mid-line still dedents cleanly
+        text = '\n'.join(doc.findBlockByNumber(n).text() for n in range(first.blockNumber(), last.blockNumber() + 1))
+        self._execute_in_kernel(editor, textwrap.dedent(text), first.blockNumber() + 1,
+                                f"lines {first.blockNumber() + 1}-{last.blockNumber() + 1}")
+
+    def run_definition_in_kernel(self):
+        """Run the top-level function or class around the cursor, redefining it in the kernel"""
+        editor = self.get_current_editor()
+        if not editor:
+            return
+        code = editor.toPlainText()
+        try:
+            tree = ast.parse(code)
+        except SyntaxError as e:
+            self.status_label.setText(f"Cannot find the definition: {e.msg} (line {e.lineno})")
+            return
+        line = editor.textCursor().blockNumber() + 1
+        for node in tree.body:
+            if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+                start, end = IncrementalStructureParser._span(node)
+                if start <= line <= end:
+                    lines = code.split('\n')
+                    self._execute_in_kernel(editor, '\n'.join(lines[start - 1:end]), start,
+                                            f"{'class' if isinstance(node, ast.ClassDef) else 'def'} {node.name}")
+                    return
+        self.status_label.setText("The cursor is not in a top-level function or class")
+
+    def interrupt_kernel(self):
+        kernel = self.kernels.get(self.get_current_editor())
+        if kernel is not None:
+            kernel.interrupt()
+
+    def restart_kernel(self):
+        editor = self.get_current_editor()
+        kernel = self.kernels.pop(editor, None)
+        if kernel is not None:
+            kernel.shutdown()
+            kernel.deleteLater()
+        if editor is not None and self._kernel_for(editor) is not None:
+            self.status_label.setText("Kernel restarted")
+
+    def shutdown_kernel(self, editor: CodeEditor):
+        kernel = self.kernels.pop(editor, None)
+        if kernel is not None:
+            kernel.shutdown()
+            kernel.deleteLater()
+
+    def on_kernel_execution_finished(self, _request_id: int, ok: bool, seconds: float):
+        self.status_label.setText(f"Kernel: {'done' if ok else 'failed'} in {seconds * 1000:.0f} ms")
+
+    def on_kernel_exited(self, kernel: PythonKernel, exit_code: int):
+        for editor, k in list(self.kernels.items()):
+            if k is kernel:
+                del self.kernels[editor]
+        kernel.deleteLater()
+        self.append_output(f"\n--- Kernel exited (code {exit_code}) ---\n")
+
+    def prepare_warm_pool(self, during_discovery: Optional[bool] = None):
+        version_data = self.python_version_combo.currentData()
+        if not (self.warm_run_action.isChecked() and version_data):
+            self.warm_pool.shutdown()
+            return
+        if during_discovery is None:
+            during_discovery = self.interpreter_discovery is not None and self.interpreter_discovery.isRunning()
+        if during_discovery and not self._python_chosen:
+            return  # discovery may still select a newer interpreter; it prepares the pool when done
+        try:
+            self.warm_pool.prepare(version_data['path'], self.current_working_dir, self.warm_modules)
+        except OSError as e:
+            self.status_label.setText(f"Starting warm interpreter failed: {e}")
+
+    def on_warm_run_toggled(self, _checked: bool):
+        self.prepare_warm_pool()
+
+    def edit_warm_modules(self):
+        text, ok = QInputDialog.getText(
+            self, "Warm Interpreter Modules", "Modules to import in advance (comma-separated):",
+            text=", ".join(self.warm_modules))
+        if not ok:
+            return
+        self.warm_modules = [m for m in (part.strip() for part in text.split(','))
+                             if m and all(p.isidentifier() for p in m.split('.'))]
+        self.prepare_warm_pool()
+
     def code_started(self):
         self.run_button.setEnabled(False)
         #self.stop_button.setEnabled(True)
@@ -3186,6 +7571,7 @@ class ProfessionalPythonIDE(QMainWindow):
             status_msg = "Execution completed successfully" if exit_code == 0 else f"Execution failed (exit code: {exit_code})"
         self.append_output(f"\n--- {status_msg} ---\n")
         self.status_label.setText(status_msg)
+        self.prepare_warm_pool()
         # Clean up runner thread object
         if self.code_runner:
             try:
@@ -3225,6 +7611,7 @@ class ProfessionalPythonIDE(QMainWindow):
 
         # Create debugger
         self.debugger = SimplePdbDebugger(python_path, self.current_working_dir, self)
+        self.debug_editor = editor
 
         # Wire signals
         self.debugger.output_received.connect(self._append_debug_text)
@@ -3389,9 +7776,8 @@ class ProfessionalPythonIDE(QMainWindow):
         for i in range(self.tab_widget.count()):
             w = self.tab_widget.widget(i)
             if isinstance(w, CodeEditor):
-                w.highlighter.theme = theme_name
-                w.highlighter.setup_highlighting_rules()
-                w.highlighter.rehighlight()
+                w.highlighter.set_theme(theme_name)
+                w.rehighlight_progressive()
                 w.set_click_highlight_color(ThemeManager.word_click_color(theme_name))
 
     def show_preferences(self):
@@ -3453,6 +7839,11 @@ class ProfessionalPythonIDE(QMainWindow):
         working_dir = self.settings.value("workingDirectory")
         if working_dir and os.path.exists(str(working_dir)):
             self.current_working_dir = str(working_dir)
+        project_root = self.settings.value("projectRoot")
+        if project_root and os.path.isdir(str(project_root)):
+            self.project_root = str(project_root)
+        self.warm_modules = [str(m) for m in self.settings.value("warmModules", [], type=list) if m]
+        self.warm_run_action.setChecked(self.settings.value("warmInterpreter", False, type=bool))
         # Refresh recent menu after load
         if hasattr(self, 'recent_menu'):
             self.update_recent_menu()
@@ -3463,6 +7854,10 @@ class ProfessionalPythonIDE(QMainWindow):
         self.settings.setValue("theme", self.current_theme)
         self.settings.setValue("recentFiles", self.recent_files)
         self.settings.setValue("workingDirectory", self.current_working_dir)
+        if self.project_root:
+            self.settings.setValue("projectRoot", self.project_root)
+        self.settings.setValue("warmInterpreter", self.warm_run_action.isChecked())
+        self.settings.setValue("warmModules", self.warm_modules)
 
     def closeEvent(self, event):
         # Stop processes safely
@@ -3491,6 +7886,15 @@ class ProfessionalPythonIDE(QMainWindow):
                         return
                     break
         self.save_settings()
+        self.warm_pool.shutdown()
+        for editor in list(self.kernels):
+            self.shutdown_kernel(editor)
+        self.interpreter_discovery.requestInterruption()
+        # Running probes are killed within STOP_POLL of the request, so this does not wait for them
+        self.interpreter_discovery.wait()
+        CodeAnalysisService.shutdown()
+        self._close_project_lookup()
+        ProjectIndexService.shutdown()
         event.accept()
 
 # =============================